@@ -2,6 +2,7 @@
 Claude Platform Core - Integrates kernels with modules for complete experience orchestration
 """
 from typing import Dict, Any, Optional, List
+from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
 from bson import ObjectId
@@ -14,6 +15,13 @@ from modules import BaseModule
 from modules.module_registry import load_tenant_module
 
 
+# Module dashboard metrics answered by the booking kernel's utilization engine
+UTILIZATION_METRICS = {
+    "space_utilization", "studio_utilization", "facility_utilization",
+    "venue_utilization", "amenity_utilization"
+}
+
+
 def convert_objectid_to_str(obj):
     """Convert MongoDB ObjectId to string recursively"""
     if isinstance(obj, ObjectId):
@@ -46,12 +54,31 @@ class ClaudePlatformCore:
             'cms': CMSKernel(self.db),
             'communication': CommunicationKernel(self.db)
         }
+        # Module-defined workflows feed the communication kernel's routing tables
+        self.kernels['communication'].router.set_module_source(self._module_workflows)
+    
+    async def _module_workflows(self, tenant_id: str) -> List[Dict[str, Any]]:
+        module = await self.load_tenant_module(tenant_id)
+        return module.get_active_workflows()
     
     async def initialize(self):
         """Initialize the platform and all kernels"""
         for kernel_name, kernel in self.kernels.items():
             await kernel.initialize()
             print(f"✅ Initialized {kernel_name} kernel")
+        await self.kernels['communication'].events.start()
+        await self.kernels['communication'].timers.start()
+        await self.kernels['communication'].automation_logs.start()
+        await self.kernels['communication'].broadcasts.start()
+        await self.kernels['communication'].notifications.start()
+    
+    async def shutdown(self):
+        """Flush pending workflow events before the process exits"""
+        await self.kernels['communication'].broadcasts.stop()
+        await self.kernels['communication'].notifications.stop()
+        await self.kernels['communication'].events.stop()
+        await self.kernels['communication'].timers.stop()
+        await self.kernels['communication'].automation_logs.stop()
     
     async def load_tenant_module(self, tenant_id: str) -> BaseModule:
         """Load and cache module for tenant"""
@@ -117,11 +144,40 @@ class ClaudePlatformCore:
             
         return await identity_kernel.check_permission(user_id, permission)
     
+    async def search_priced_availability(self, tenant_id: str, **search) -> Dict[str, Any]:
+        """Search free slots priced with the tenant module's tiers and the tenant's rate settings"""
+        module = await self.load_tenant_module(tenant_id)
+        booking_kernel = self.kernels['booking']
+        return await booking_kernel.search_priced_availability(
+            tenant_id,
+            booking_rules=module.get_booking_rules(),
+            resource_types=module.get_resource_types(),
+            pricing_settings=module.settings.get("pricing", {}),
+            **search
+        )
+    
+    async def quote_bookings(self, tenant_id: str, items: List[Dict[str, Any]], **options) -> Dict[str, Any]:
+        """Price explicit booking combinations for a tenant"""
+        module = await self.load_tenant_module(tenant_id)
+        booking_kernel = self.kernels['booking']
+        return await booking_kernel.quote_bookings(
+            tenant_id, items,
+            booking_rules=module.get_booking_rules(),
+            resource_types=module.get_resource_types(),
+            pricing_settings=module.settings.get("pricing", {}),
+            **options
+        )
+    
     async def trigger_workflow(self, tenant_id: str, event: str, context: Dict[str, Any]):
         """Trigger workflows via communication kernel"""
         communication_kernel = self.kernels['communication']
         await communication_kernel.trigger_event(tenant_id, event, context)
     
+    async def publish_event(self, tenant_id: str, event: str, context: Dict[str, Any]):
+        """Trigger workflows in the background so request handlers do not wait for them"""
+        communication_kernel = self.kernels['communication']
+        await communication_kernel.publish_event(tenant_id, event, context)
+    
     async def get_dashboard_data(self, tenant_id: str, user_id: str) -> Dict[str, Any]:
         """Get dashboard data with module-specific metrics"""
         module = await self.load_tenant_module(tenant_id)
@@ -142,6 +198,7 @@ class ClaudePlatformCore:
         
         # Get metrics based on module configuration
         metrics = {}
+        utilization = None
         for metric_config in module.get_dashboard_metrics():
             metric_name = metric_config["name"]
             
@@ -165,6 +222,13 @@ class ClaudePlatformCore:
                 metrics[metric_name] = await self.db.leads.count_documents({
                     "tenant_id": tenant_id
                 })
+            elif metric_name in UTILIZATION_METRICS:
+                if utilization is None:
+                    now = datetime.utcnow()
+                    utilization = await booking_kernel.get_resource_utilization(
+                        tenant_id, now - timedelta(days=30), now
+                    )
+                metrics[metric_name] = utilization["occupancy_percentage"]
             # Add more metric calculations as needed
         
         return {
@@ -196,6 +260,7 @@ class ClaudePlatformCore:
         """Reload module for tenant (useful after configuration changes)"""
         if tenant_id in self.active_modules:
             del self.active_modules[tenant_id]
+        self.kernels['communication'].router.invalidate(tenant_id)
         return await self.load_tenant_module(tenant_id)
 
 
@@ -0,0 +1,229 @@
+"""
+Action Scheduler
+Delayed workflow actions: persisted in scheduled_actions, fired in-process from a timer wheel
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import time
+import uuid
+from pymongo import ReturnDocument
+from kernels.timer_wheel import TimerWheel
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _seconds(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+def entity_refs(context: Dict[str, Any]) -> List[str]:
+    """"lead:<id>"-style references for every *_id in the context, used to cancel pending actions"""
+    return [
+        f"{key[:-3]}:{value}" for key, value in context.items()
+        if key.endswith("_id") and isinstance(value, str) and value
+    ]
+
+
+class ActionScheduler:
+    """Runs delayed workflow actions when they come due, surviving restarts"""
+
+    # Every pending action lives in scheduled_actions; only those due within the horizon are held
+    # in the wheel, so memory follows the next hour of timers rather than all of them
+    HORIZON_SECONDS = 3600
+    LOAD_INTERVAL_SECONDS = 60
+    # Pending actions this overdue are picked up even if another process scheduled them
+    ORPHAN_GRACE_SECONDS = 30
+    LEASE_SECONDS = 300
+    MAX_ATTEMPTS = 3
+    CONCURRENCY = 32
+
+    def __init__(self, communication_kernel):
+        self.kernel = communication_kernel
+        self.db = communication_kernel.db
+        self.wheel: Optional[TimerWheel] = None
+        self._loaded_until: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()
+        self._semaphore = asyncio.Semaphore(self.CONCURRENCY)
+        self.metrics = {"scheduled": 0, "fired": 0, "failed": 0, "skipped": 0}
+
+    # Scheduling
+    async def schedule(self, tenant_id: str, workflow: Dict[str, Any], actions: List[Dict[str, Any]],
+                       context: Dict[str, Any], now: Optional[datetime] = None,
+                       triggered_at: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Persist actions with a delay_minutes, each due that many minutes from now"""
+        now = now or datetime.utcnow()
+        refs = entity_refs(context)
+        docs = [
+            {
+                "id": str(uuid.uuid4()),
+                "tenant_id": tenant_id,
+                "workflow_id": workflow.get("id"),
+                "trigger_event": workflow.get("trigger_event"),
+                "action": action,
+                "context": context,
+                "entity_refs": refs,
+                # When the triggering event happened; a cancel after it wins even if the workflow ran later
+                "triggered_at": triggered_at or now,
+                "due_at": now + timedelta(minutes=action["delay_minutes"]),
+                "status": "pending",
+                "attempts": 0,
+                "created_at": now
+            }
+            for action in actions
+        ]
+        if not docs:
+            return []
+        await self.db.scheduled_actions.insert_many(docs)
+        self.metrics["scheduled"] += len(docs)
+        if self.wheel is not None and self._loaded_until is not None:
+            for doc in docs:
+                # Later ones are read by the loader when they enter the horizon
+                if doc["due_at"] <= self._loaded_until:
+                    self.wheel.add(doc["id"], _seconds(doc["due_at"]))
+        return docs
+
+    async def cancel(self, tenant_id: str, entity_type: str, entity_id: str) -> int:
+        """Cancel pending actions triggered for an entity, e.g. follow-ups for a lead that converted"""
+        ref = f"{entity_type}:{entity_id}"
+        now = datetime.utcnow()
+        # Workflows for events published before the cancel may still be waiting on the event bus; the
+        # watermark cancels the actions they schedule when those come due
+        await self.db.scheduled_action_cancellations.update_one(
+            {"_id": f"{tenant_id}:{ref}"},
+            {"$max": {"cancelled_at": now}, "$setOnInsert": {"tenant_id": tenant_id}},
+            upsert=True
+        )
+        cancelled = await self.db.scheduled_actions.find(
+            {"tenant_id": tenant_id, "entity_refs": ref, "status": "pending"}, {"_id": 0, "id": 1}
+        ).to_list(None)
+        if not cancelled:
+            return 0
+        result = await self.db.scheduled_actions.update_many(
+            {"id": {"$in": [doc["id"] for doc in cancelled]}, "status": "pending"},
+            {"$set": {"status": "cancelled", "completed_at": now, "updated_at": now}}
+        )
+        if self.wheel is not None:
+            for doc in cancelled:
+                self.wheel.remove(doc["id"])
+        return result.modified_count
+
+    # Lifecycle
+    async def start(self):
+        if self._task:
+            return
+        self.wheel = TimerWheel(_seconds(datetime.utcnow()))
+        self._loaded_until = None
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if not self._task:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Actions already claimed get to finish; anything else stays pending for the next start
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        self.wheel = None
+
+    async def _run(self):
+        next_load = 0.0
+        while True:
+            try:
+                if time.monotonic() >= next_load:
+                    await self.load()
+                    next_load = time.monotonic() + self.LOAD_INTERVAL_SECONDS
+                for action_id, _ in self.wheel.advance(_seconds(datetime.utcnow())):
+                    task = asyncio.create_task(self._fire(action_id))
+                    self._running.add(task)
+                    task.add_done_callback(self._running.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Scheduled action loop error: {e}")
+            await asyncio.sleep(self.wheel.tick)
+
+    async def load(self) -> int:
+        """Put pending actions entering the horizon (plus orphaned overdue ones) on the wheel"""
+        now = datetime.utcnow()
+        horizon = now + timedelta(seconds=min(self.HORIZON_SECONDS, self.wheel.span))
+        await self._reclaim_expired_leases(now)
+
+        windows = [{"$lte": horizon, **({"$gt": self._loaded_until} if self._loaded_until else {})}]
+        if self._loaded_until:
+            windows.append({"$lte": now - timedelta(seconds=self.ORPHAN_GRACE_SECONDS)})
+        loaded = 0
+        for window in windows:
+            async for doc in self.db.scheduled_actions.find(
+                {"status": "pending", "due_at": window}, {"_id": 0, "id": 1, "due_at": 1}
+            ):
+                if doc["id"] not in self.wheel:
+                    self.wheel.add(doc["id"], _seconds(doc["due_at"]))
+                    loaded += 1
+        self._loaded_until = horizon
+        return loaded
+
+    async def _reclaim_expired_leases(self, now: datetime):
+        await self.db.scheduled_actions.update_many(
+            {"status": "running", "lease_expires_at": {"$lte": now}},
+            {"$set": {"status": "pending", "due_at": now, "updated_at": now}}
+        )
+
+    async def _fire(self, action_id: str):
+        async with self._semaphore:
+            now = datetime.utcnow()
+            # Several processes may hold the same timer; only the one that claims it runs the action
+            scheduled = await self.db.scheduled_actions.find_one_and_update(
+                {"id": action_id, "status": "pending", "due_at": {"$lte": now}},
+                {"$set": {"status": "running", "lease_expires_at": now + timedelta(seconds=self.LEASE_SECONDS),
+                          "updated_at": now},
+                 "$inc": {"attempts": 1}},
+                return_document=ReturnDocument.AFTER
+            )
+            if not scheduled:
+                self.metrics["skipped"] += 1
+                return
+            if await self._cancelled_after_trigger(scheduled):
+                await self.db.scheduled_actions.update_one(
+                    {"id": action_id},
+                    {"$set": {"status": "cancelled", "completed_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+                )
+                self.metrics["skipped"] += 1
+                return
+            try:
+                await self.kernel._execute_action(scheduled["tenant_id"], scheduled["action"], scheduled["context"])
+            except Exception as e:
+                self.metrics["failed"] += 1
+                retry = scheduled["attempts"] < self.MAX_ATTEMPTS
+                due_at = datetime.utcnow() + timedelta(minutes=2 ** scheduled["attempts"])
+                await self.db.scheduled_actions.update_one(
+                    {"id": action_id},
+                    {"$set": {"status": "pending" if retry else "failed", "last_error": str(e),
+                              "updated_at": datetime.utcnow(),
+                              **({"due_at": due_at} if retry else {"completed_at": datetime.utcnow()})}}
+                )
+                if retry and self.wheel is not None and due_at <= (self._loaded_until or due_at):
+                    self.wheel.add(action_id, _seconds(due_at))
+                return
+            await self.db.scheduled_actions.update_one(
+                {"id": action_id},
+                {"$set": {"status": "completed", "completed_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+            )
+            self.metrics["fired"] += 1
+
+    async def _cancelled_after_trigger(self, scheduled: Dict[str, Any]) -> bool:
+        """Whether one of the action's entities was cancelled after the event that scheduled it"""
+        if not scheduled.get("entity_refs"):
+            return False
+        watermark = await self.db.scheduled_action_cancellations.find_one({
+            "_id": {"$in": [f"{scheduled['tenant_id']}:{ref}" for ref in scheduled["entity_refs"]]},
+            "cancelled_at": {"$gte": scheduled.get("triggered_at") or scheduled["created_at"]}
+        })
+        return watermark is not None
+
+    async def get_stats(self) -> Dict[str, Any]:
+        pending = await self.db.scheduled_actions.count_documents({"status": "pending"})
+        return {**self.metrics, "pending": pending, "in_wheel": len(self.wheel) if self.wheel else 0}
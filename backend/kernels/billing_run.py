@@ -0,0 +1,255 @@
+"""
+Billing Run Engine
+Bills due subscriptions in chunks: transactional invoice writes, bulk transactions, catch-up of missed periods, idempotent date advances
+"""
+from typing import Dict, Any, List, Optional
+from calendar import monthrange
+from datetime import datetime, timedelta
+import asyncio
+import time
+import uuid
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+# Billing interval -> months (or days for the weekly/daily plans)
+INTERVAL_MONTHS = {"monthly": 1, "quarterly": 3, "semiannual": 6, "yearly": 12, "annual": 12}
+INTERVAL_DAYS = {"daily": 1, "weekly": 7, "biweekly": 14}
+
+
+def advance_billing_date(current: datetime, interval: str, anchor_day: Optional[int] = None) -> datetime:
+    """Next billing date after current; monthly plans stay on their anchor day, clamped to short months"""
+    if interval in INTERVAL_DAYS:
+        return current + timedelta(days=INTERVAL_DAYS[interval])
+    if interval not in INTERVAL_MONTHS:
+        raise ValueError(f"Unsupported billing interval: {interval}")
+    month_index = current.month - 1 + INTERVAL_MONTHS[interval]
+    year, month = current.year + month_index // 12, month_index % 12 + 1
+    day = min(anchor_day or current.day, monthrange(year, month)[1])
+    return current.replace(year=year, month=month, day=day)
+
+
+class BillingRunEngine:
+    """Nightly subscription billing across all tenants"""
+
+    CHUNK_SIZE = 1000
+    CONCURRENCY = 4
+    MAX_CATCH_UP_PERIODS = 36
+
+    def __init__(self, financial_kernel):
+        self.kernel = financial_kernel
+        self.db = financial_kernel.db
+
+    async def run(self, as_of: Optional[datetime] = None, tenant_id: Optional[str] = None,
+                  run_id: Optional[str] = None, chunk_size: Optional[int] = None,
+                  concurrency: Optional[int] = None) -> Dict[str, Any]:
+        """Bill every active subscription due by as_of; pass a previous run_id to resume that run"""
+        as_of = as_of or datetime.utcnow()
+        run_id = run_id or str(uuid.uuid4())
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        started = time.perf_counter()
+        report = {"run_id": run_id, "as_of": as_of, "subscriptions": 0, "invoices": 0,
+                  "already_billed": 0, "skipped": 0, "failed_chunks": 0, "errors": []}
+        await self.db.billing_runs.update_one(
+            {"id": run_id},
+            {"$set": {"status": "running", "as_of": as_of, "tenant_id": tenant_id, "started_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+        query = {
+            "status": "active",
+            "next_billing_date": {"$lte": as_of},
+            # Subscriptions this run already advanced are skipped when a run is resumed
+            "last_billing_run_id": {"$ne": run_id}
+        }
+        if tenant_id:
+            query["tenant_id"] = tenant_id
+        projection = {"_id": 0, "id": 1, "tenant_id": 1, "customer_id": 1, "name": 1, "amount_minor": 1,
+                      "currency": 1, "quantity": 1, "line_items": 1, "billing_interval": 1,
+                      "billing_anchor_day": 1, "next_billing_date": 1}
+
+        semaphore = asyncio.Semaphore(concurrency or self.CONCURRENCY)
+        pending = set()
+
+        async def bill(chunk):
+            async with semaphore:
+                try:
+                    counts = await self._bill_chunk(run_id, chunk, as_of)
+                except Exception as e:
+                    # A failed chunk is retried by resuming the run; keep a sample of errors for the report
+                    report["failed_chunks"] += 1
+                    if len(report["errors"]) < 10:
+                        report["errors"].append(str(e))
+                    return
+                for key, value in counts.items():
+                    report[key] += value
+
+        chunk = []
+        async for subscription in self.db.subscriptions.find(query, projection).sort("next_billing_date", 1):
+            chunk.append(subscription)
+            if len(chunk) >= chunk_size:
+                # Bound memory as well as concurrency: wait for a slot before reading further
+                while len(pending) >= (concurrency or self.CONCURRENCY):
+                    _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                pending.add(asyncio.create_task(bill(chunk)))
+                chunk = []
+        if chunk:
+            pending.add(asyncio.create_task(bill(chunk)))
+        if pending:
+            await asyncio.wait(pending)
+
+        elapsed = time.perf_counter() - started
+        report["elapsed_seconds"] = round(elapsed, 3)
+        report["subscriptions_per_second"] = round(report["subscriptions"] / elapsed, 1) if elapsed else 0
+        await self.db.billing_runs.update_one(
+            {"id": run_id},
+            {"$set": {**report, "status": "failed" if report["failed_chunks"] else "completed",
+                      "completed_at": datetime.utcnow()}}
+        )
+        return report
+
+    async def _bill_chunk(self, run_id: str, subscriptions: List[Dict[str, Any]],
+                          as_of: datetime) -> Dict[str, int]:
+        """Invoice, record and advance one chunk of due subscriptions"""
+        counts = {"subscriptions": 0, "invoices": 0, "already_billed": 0, "skipped": 0}
+        requests: Dict[str, List[Dict[str, Any]]] = {}
+        billable = []
+        for subscription in subscriptions:
+            line_items = subscription.get("line_items") or (
+                [{
+                    "description": subscription.get("name") or "Subscription",
+                    "quantity": subscription.get("quantity", 1),
+                    "unit_price_minor": subscription["amount_minor"]
+                }] if subscription.get("amount_minor") is not None else None
+            )
+            interval = subscription.get("billing_interval", "monthly")
+            if (not subscription.get("id") or not line_items
+                    or interval not in INTERVAL_MONTHS and interval not in INTERVAL_DAYS):
+                counts["skipped"] += 1
+                continue
+            # Bill every period that fell due, so a subscription that is behind catches up in one run;
+            # past the cap the rest is left for the next run
+            period_start = subscription["next_billing_date"]
+            for _ in range(self.MAX_CATCH_UP_PERIODS):
+                if period_start > as_of:
+                    break
+                period_end = advance_billing_date(period_start, interval, subscription.get("billing_anchor_day"))
+                requests.setdefault(subscription["tenant_id"], []).append({
+                    "customer_id": subscription["customer_id"],
+                    "currency": subscription.get("currency"),
+                    "line_items": line_items,
+                    "subscription_id": subscription["id"],
+                    # One invoice per subscription period - the unique index makes reruns no-ops
+                    "billing_key": f"{subscription['id']}:{period_start.isoformat()}",
+                    "billing_period_start": period_start,
+                    "billing_period_end": period_end,
+                    "billing_run_id": run_id
+                })
+                period_start = period_end
+            billable.append(subscription)
+
+        invoice_docs, line_item_docs = [], []
+        for tenant_id, tenant_requests in requests.items():
+            first_number = await self.kernel._allocate_invoice_numbers(tenant_id, len(tenant_requests))
+            tenant_invoices, tenant_line_items = self.kernel._build_invoice_docs(
+                tenant_id, tenant_requests, first_number
+            )
+            invoice_docs.extend(tenant_invoices)
+            line_item_docs.extend(tenant_line_items)
+        if not invoice_docs:
+            return counts
+
+        # Periods billed by an interrupted earlier run keep their invoice; the rest are written with their
+        # line items in one transaction, so an invoice never lands without its items
+        existing = await self._existing_invoices(invoice_docs)
+        fresh = [invoice_doc for invoice_doc in invoice_docs if invoice_doc["billing_key"] not in existing]
+        fresh_ids = {invoice_doc["id"] for invoice_doc in fresh}
+        if fresh:
+            await self.kernel._insert_invoice_batch(
+                fresh, [item for item in line_item_docs if item["invoice_id"] in fresh_ids]
+            )
+        await self._backfill_line_items(invoice_docs, line_item_docs, existing)
+        counts["invoices"] = len(fresh)
+        counts["already_billed"] = len(invoice_docs) - len(fresh)
+
+        await self._record_charges(invoice_docs, existing)
+        # An interrupted earlier run may have inserted invoices without posting them; reposting is a no-op
+        await self.kernel.ledger.post_invoices([
+            existing.get(invoice_doc["billing_key"], invoice_doc) for invoice_doc in invoice_docs
+        ])
+
+        # Advance only if the date is still the one we billed from, so a concurrent or repeated run cannot skip a period
+        advances: Dict[str, Dict[str, Any]] = {}
+        for invoice_doc in invoice_docs:
+            advance = advances.setdefault(invoice_doc["subscription_id"], {
+                "tenant_id": invoice_doc["tenant_id"], "from": invoice_doc["billing_period_start"]
+            })
+            advance["to"] = invoice_doc["billing_period_end"]
+            advance["invoice_id"] = existing.get(invoice_doc["billing_key"], invoice_doc)["id"]
+        now = datetime.utcnow()
+        await self.db.subscriptions.bulk_write([
+            UpdateOne(
+                {"id": subscription_id, "tenant_id": advance["tenant_id"], "next_billing_date": advance["from"]},
+                {"$set": {
+                    "next_billing_date": advance["to"],
+                    "last_billing_run_id": run_id,
+                    "last_invoice_id": advance["invoice_id"],
+                    "last_billed_at": now
+                }}
+            )
+            for subscription_id, advance in advances.items()
+        ], ordered=False)
+        counts["subscriptions"] = len(billable)
+        return counts
+
+    async def _existing_invoices(self, invoice_docs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """Invoices already written for these billing periods, keyed by billing_key"""
+        existing = {}
+        projection = {"_id": 0, "id": 1, "tenant_id": 1, "customer_id": 1, "billing_key": 1,
+                      "total_minor": 1, "currency": 1, "created_at": 1}
+        keys = [invoice_doc["billing_key"] for invoice_doc in invoice_docs]
+        async for invoice in self.db.invoices.find({"billing_key": {"$in": keys}}, projection):
+            existing[invoice["billing_key"]] = invoice
+        return existing
+
+    async def _backfill_line_items(self, invoice_docs: List[Dict[str, Any]], line_item_docs: List[Dict[str, Any]],
+                                   existing: Dict[str, Dict[str, Any]]):
+        """Give existing invoices that have no line items (a crash between writes without transactions) theirs"""
+        if not existing:
+            return
+        existing_ids = [invoice["id"] for invoice in existing.values()]
+        with_items = set(await self.db.line_items.distinct("invoice_id", {"invoice_id": {"$in": existing_ids}}))
+        built_for = {invoice_doc["id"]: existing[invoice_doc["billing_key"]]["id"]
+                     for invoice_doc in invoice_docs if invoice_doc["billing_key"] in existing}
+        missing = [
+            {**item, "invoice_id": built_for[item["invoice_id"]]}
+            for item in line_item_docs
+            if item["invoice_id"] in built_for and built_for[item["invoice_id"]] not in with_items
+        ]
+        if missing:
+            await self.db.line_items.insert_many(missing)
+
+    async def _record_charges(self, invoice_docs: List[Dict[str, Any]], existing: Dict[str, Dict[str, Any]]):
+        """Insert one charge transaction per billed period, including periods whose invoice already existed"""
+        now = datetime.utcnow()
+        transactions = []
+        for invoice_doc in invoice_docs:
+            invoice = existing.get(invoice_doc["billing_key"], invoice_doc)
+            transactions.append({
+                "id": str(uuid.uuid4()),
+                "tenant_id": invoice_doc["tenant_id"],
+                "type": "subscription_charge",
+                "customer_id": invoice_doc["customer_id"],
+                "subscription_id": invoice_doc["subscription_id"],
+                "invoice_id": invoice["id"],
+                "billing_key": invoice_doc["billing_key"],
+                "currency": invoice_doc["currency"],
+                "amount_minor": invoice["total_minor"],
+                "transaction_date": now,
+                "created_at": now
+            })
+        try:
+            await self.db.transactions.insert_many(transactions, ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
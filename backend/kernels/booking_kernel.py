@@ -2,20 +2,74 @@
 Resource & Booking Kernel (The "Scheduler")
 Universal scheduling engine for any type of resource
 """
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta, time
+import uuid
+from bisect import bisect_left
+import heapq
+from pymongo import ReplaceOne, DeleteMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from kernels.base_kernel import BaseKernel
+from kernels.utilization_engine import UtilizationEngine
+from kernels.calendar_feeds import CalendarFeeds
+from kernels.calendar_spans import CalendarSpans
+from kernels.pricing_engine import PricingEngine
+import numpy as np
 
 
 class BookingKernel(BaseKernel):
     """Universal resource booking and scheduling engine"""
     
+    # Granularity of the per-resource guard documents that make commits atomic
+    SLOT_MINUTES = 15
+    # How long an in-process schedule copy may be served before re-reading it
+    SCHEDULE_CACHE_SECONDS = 60
+    # How often the shared schedule version is read to pick up changes made by other processes
+    SCHEDULE_VERSION_CHECK_SECONDS = 5
+    # Booking statuses that count as busy / that give their slots back
+    ACTIVE_STATUSES = ["confirmed", "pending"]
+    RELEASED_STATUSES = ["cancelled", "rejected"]
+    # Allowed status changes; moving a released booking back to an active status re-reserves its slots
+    STATUS_TRANSITIONS = {
+        "pending": ["confirmed", "cancelled", "rejected"],
+        "confirmed": ["completed", "cancelled"],
+        "cancelled": ["confirmed"],
+        "rejected": ["pending"],
+        "completed": []
+    }
+    # Checkout holds: default and maximum lifetime, and how many may be live per tenant
+    HOLD_SECONDS = 300
+    MAX_HOLD_SECONDS = 900
+    MAX_HOLDS_PER_TENANT = 100
+    
+    def __init__(self, db):
+        super().__init__(db)
+        self._schedule_cache = {}  # resource_id -> (loaded_at, {day_of_week: [(start_minute, end_minute)]})
+        self._schedule_version = None
+        self._schedule_version_checked_at = None
+        self._hold_heap = []  # (expires_at, hold_id) for holds placed by this process
+        self.utilization = UtilizationEngine(self)
+        self.feeds = CalendarFeeds(self)
+        self.spans = CalendarSpans(self)
+        self.pricing = PricingEngine(self)
+    
     async def _initialize_kernel(self):
         """Initialize booking kernel"""
         # Ensure indexes exist
         await self.db.resources.create_index([("tenant_id", 1), ("is_active", 1)])
         await self.db.bookings.create_index([("tenant_id", 1), ("resource_id", 1), ("start_time", 1)])
+        await self.db.bookings.create_index("id")
+        await self.db.bookings.create_index([("tenant_id", 1), ("start_time", 1)])
         await self.db.availability_schedules.create_index([("resource_id", 1), ("day_of_week", 1)])
+        # One guard per (resource, slot) - the unique index is what rejects double bookings
+        await self.db.booking_guards.create_index([("resource_id", 1), ("slot_start", 1)], unique=True)
+        await self.db.booking_guards.create_index("booking_id")
+        await self.db.booking_utilization_daily.create_index([("tenant_id", 1), ("date", 1)], unique=True)
+        # Holds and their guards carry expires_at; MongoDB's TTL monitor removes whatever the heap misses
+        await self.db.booking_holds.create_index("expires_at", expireAfterSeconds=0)
+        await self.db.booking_holds.create_index([("resource_ids", 1), ("start_time", 1)])
+        await self.db.booking_holds.create_index([("tenant_id", 1), ("expires_at", 1)])
+        await self.db.booking_guards.create_index("expires_at", expireAfterSeconds=0)
     
     async def validate_tenant_access(self, tenant_id: str, user_id: str) -> bool:
         """Validate user belongs to tenant"""
@@ -32,6 +86,7 @@ class BookingKernel(BaseKernel):
             "created_at": datetime.utcnow()
         }
         await self.db.resources.insert_one(resource_doc)
+        self.pricing.invalidate(tenant_id)
         return resource_doc
     
     async def get_resources(self, tenant_id: str, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
@@ -45,17 +100,166 @@ class BookingKernel(BaseKernel):
     
     async def set_resource_availability(self, resource_id: str, availability_schedule: List[Dict[str, Any]]):
         """Set availability schedule for a resource"""
-        # Clear existing schedule
-        await self.db.availability_schedules.delete_many({"resource_id": resource_id})
+        resource = await self.db.resources.find_one({"id": resource_id}, {"_id": 0, "tenant_id": 1})
+        await self.set_availability_schedules(
+            resource["tenant_id"] if resource else None, {resource_id: availability_schedule}
+        )
+    
+    async def set_availability_schedules(self, tenant_id: Optional[str],
+                                         schedules: Dict[str, List[Dict[str, Any]]]) -> Dict[str, int]:
+        """Replace the weekly schedules of many resources in one bulk write"""
+        # Validate everything before touching the database
+        normalized = {
+            resource_id: self._normalize_schedule(rows) for resource_id, rows in schedules.items()
+        }
         
-        # Insert new schedule
-        for schedule in availability_schedule:
-            schedule_doc = {
-                **schedule,
-                "resource_id": resource_id,
-                "created_at": datetime.utcnow()
-            }
-            await self.db.availability_schedules.insert_one(schedule_doc)
+        # One document per (resource, day) is replaced in place, so readers never see an empty day
+        operations = []
+        for resource_id, by_day in normalized.items():
+            for day_of_week, windows in by_day.items():
+                operations.append(ReplaceOne(
+                    {"resource_id": resource_id, "day_of_week": day_of_week},
+                    {
+                        "resource_id": resource_id,
+                        "tenant_id": tenant_id,
+                        "day_of_week": day_of_week,
+                        "windows": [{"start_minute": start, "end_minute": end} for start, end in windows],
+                        "updated_at": datetime.utcnow()
+                    },
+                    upsert=True
+                ))
+            operations.append(DeleteMany({"resource_id": resource_id, "day_of_week": {"$nin": list(by_day)}}))
+        
+        if operations:
+            await self._write_schedules(operations, list(normalized))
+            # Every process, this one included, drops its cached schedules when it sees the new version
+            await self._bump_schedule_version()
+            # Past utilization rollups were computed against the old opening hours
+            tenant_ids = [tenant_id] if tenant_id else await self.db.resources.distinct(
+                "tenant_id", {"id": {"$in": list(normalized)}}
+            )
+            for schedule_tenant_id in tenant_ids:
+                await self.utilization.invalidate_rollups(schedule_tenant_id)
+        self._invalidate_schedules(normalized.keys())
+        
+        return {
+            "resources": len(normalized),
+            "days": sum(len(by_day) for by_day in normalized.values())
+        }
+    
+    async def _write_schedules(self, operations: List[Any], resource_ids: List[str]):
+        """Apply schedule replacements all or nothing, in a transaction where the server supports one"""
+        try:
+            async with await self.db.client.start_session() as session:
+                async with session.start_transaction():
+                    await self.db.availability_schedules.bulk_write(operations, ordered=False, session=session)
+            return
+        except OperationFailure as e:
+            # Standalone servers reject transactions (IllegalOperation); anything else is a real failure
+            if e.code != 20:
+                raise
+        
+        previous = await self.db.availability_schedules.find({"resource_id": {"$in": resource_ids}}).to_list(None)
+        try:
+            await self.db.availability_schedules.bulk_write(operations, ordered=True)
+        except Exception:
+            # Without a transaction, put the previous schedules back
+            await self.db.availability_schedules.delete_many({"resource_id": {"$in": resource_ids}})
+            if previous:
+                await self.db.availability_schedules.insert_many(previous)
+            raise
+    
+    async def _bump_schedule_version(self):
+        await self.db.booking_versions.update_one(
+            {"_id": "schedules"},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+    
+    def _normalize_schedule(self, rows: List[Dict[str, Any]]) -> Dict[int, List[Tuple[int, int]]]:
+        """Validate schedule rows and group them as sorted minute windows per weekday"""
+        by_day = {}
+        for row in rows:
+            day_of_week = row.get("day_of_week")
+            if day_of_week not in range(7):
+                raise ValueError(f"Invalid day_of_week: {day_of_week}")
+            start = self._to_minute(row.get("start_minute", row.get("start_time")))
+            end = self._to_minute(row.get("end_minute", row.get("end_time")))
+            if start >= end:
+                raise ValueError(f"Schedule window must end after it starts (day {day_of_week})")
+            by_day.setdefault(day_of_week, []).append((start, end))
+        
+        for day_of_week, windows in by_day.items():
+            windows.sort()
+            for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+                if next_start < previous_end:
+                    raise ValueError(f"Overlapping schedule windows on day {day_of_week}")
+        return by_day
+    
+    @staticmethod
+    def _to_minute(value: Any) -> int:
+        """Convert minutes, 'HH:MM' strings or time objects to minutes since midnight"""
+        if isinstance(value, time):
+            minute = value.hour * 60 + value.minute
+        elif isinstance(value, str):
+            try:
+                hours, minutes = value.split(":")[:2]
+                minute = int(hours) * 60 + int(minutes)
+            except ValueError:
+                raise ValueError(f"Invalid schedule time: {value}")
+        elif isinstance(value, int) and not isinstance(value, bool):
+            minute = value
+        else:
+            raise ValueError(f"Invalid schedule time: {value}")
+        
+        if not 0 <= minute <= 24 * 60:
+            raise ValueError(f"Schedule time out of range: {value}")
+        return minute
+    
+    async def _get_schedules(self, resource_ids: List[str]) -> Dict[str, Dict[int, List[Tuple[int, int]]]]:
+        """Load weekly schedules for resources, reading only the ones not cached"""
+        now = datetime.utcnow()
+        await self._check_schedule_version(now)
+        schedules = {}
+        missing = []
+        for resource_id in resource_ids:
+            cached = self._schedule_cache.get(resource_id)
+            if cached and (now - cached[0]).total_seconds() < self.SCHEDULE_CACHE_SECONDS:
+                schedules[resource_id] = cached[1]
+            else:
+                missing.append(resource_id)
+        
+        if missing:
+            loaded = {resource_id: {} for resource_id in missing}
+            rows = await self.db.availability_schedules.find(
+                {"resource_id": {"$in": missing}},
+                {"_id": 0, "resource_id": 1, "day_of_week": 1, "windows": 1}
+            ).to_list(None)
+            for row in rows:
+                loaded[row["resource_id"]][row["day_of_week"]] = [
+                    (window["start_minute"], window["end_minute"]) for window in row.get("windows", [])
+                ]
+            for resource_id, by_day in loaded.items():
+                self._schedule_cache[resource_id] = (now, by_day)
+            schedules.update(loaded)
+        return schedules
+    
+    async def _check_schedule_version(self, now: datetime):
+        """Drop the whole cache when another process has changed schedules since the last check"""
+        checked_at = self._schedule_version_checked_at
+        if checked_at and (now - checked_at).total_seconds() < self.SCHEDULE_VERSION_CHECK_SECONDS:
+            return
+        self._schedule_version_checked_at = now
+        doc = await self.db.booking_versions.find_one({"_id": "schedules"}, {"version": 1})
+        version = doc["version"] if doc else 0
+        if version != self._schedule_version:
+            self._schedule_cache.clear()
+            self._schedule_version = version
+    
+    def _invalidate_schedules(self, resource_ids):
+        """Drop cached schedules for the given resources"""
+        for resource_id in resource_ids:
+            self._schedule_cache.pop(resource_id, None)
     
     # Booking Engine
     async def check_availability(self, resource_id: str, start_time: datetime, end_time: datetime) -> bool:
@@ -63,7 +267,7 @@ class BookingKernel(BaseKernel):
         # Check for existing bookings
         existing_booking = await self.db.bookings.find_one({
             "resource_id": resource_id,
-            "status": {"$in": ["confirmed", "pending"]},
+            "status": {"$in": self.ACTIVE_STATUSES},
             "$or": [
                 {
                     "start_time": {"$lt": end_time},
@@ -75,36 +279,534 @@ class BookingKernel(BaseKernel):
         if existing_booking:
             return False
         
-        # Check availability schedule
-        day_of_week = start_time.weekday()  # 0=Monday, 6=Sunday
-        availability = await self.db.availability_schedules.find_one({
-            "resource_id": resource_id,
-            "day_of_week": day_of_week,
-            "start_time": {"$lte": start_time.time()},
-            "end_time": {"$gte": end_time.time()}
-        })
+        # Live checkout holds block the slot just like bookings
+        if await self._find_live_hold(resource_id, start_time, end_time):
+            return False
         
-        return availability is not None
+        # Check availability schedule
+        schedules = await self._get_schedules([resource_id])
+        return self._fits_schedule(schedules[resource_id], start_time, end_time)
     
     async def create_booking(self, tenant_id: str, booking_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new booking"""
-        resource_id = booking_data["resource_id"]
+        bookings = await self.create_multi_resource_booking(
+            tenant_id, booking_data, [booking_data["resource_id"]]
+        )
+        return bookings[0]
+    
+    async def create_multi_resource_booking(self, tenant_id: str, booking_data: Dict[str, Any],
+                                            resource_ids: List[str]) -> List[Dict[str, Any]]:
+        """Book several resources (e.g. a room plus equipment) for the same slot, all or nothing"""
         start_time = booking_data["start_time"]
         end_time = booking_data["end_time"]
+        if end_time <= start_time:
+            raise ValueError("Booking end time must be after start time")
+        if len(set(resource_ids)) != len(resource_ids):
+            raise ValueError("Duplicate resource in booking request")
+        self._check_slot_alignment(start_time, end_time)
+        
+        # Validate availability up front so obvious conflicts fail without any writes
+        for resource_id in resource_ids:
+            if not await self.check_availability(resource_id, start_time, end_time):
+                raise ValueError("Resource not available for requested time slot")
         
-        # Validate availability
-        if not await self.check_availability(resource_id, start_time, end_time):
-            raise ValueError("Resource not available for requested time slot")
+        return await self.commit_bookings(
+            tenant_id, self._build_booking_docs(tenant_id, booking_data, resource_ids)
+        )
+    
+    def _build_booking_docs(self, tenant_id: str, booking_data: Dict[str, Any],
+                            resource_ids: List[str]) -> List[Dict[str, Any]]:
+        """Build the confirmed booking documents for one slot across resources"""
+        group_id = str(uuid.uuid4()) if len(resource_ids) > 1 else None
+        booking_docs = []
+        for index, resource_id in enumerate(resource_ids):
+            # The first booking keeps a caller-supplied id; the rest of the group get fresh ones
+            booking_id = booking_data.get("id") if index == 0 and booking_data.get("id") else str(uuid.uuid4())
+            booking_doc = {
+                **booking_data,
+                "id": booking_id,
+                "resource_id": resource_id,
+                "tenant_id": tenant_id,
+                "status": "confirmed",
+                "created_at": datetime.utcnow()
+            }
+            if group_id:
+                booking_doc["group_id"] = group_id
+            booking_docs.append(booking_doc)
+        return booking_docs
+    
+    async def commit_bookings(self, tenant_id: str, booking_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Atomically reserve slot guards for the bookings and insert them"""
+        guards = self._build_guards(tenant_id, booking_docs)
+        await self._reserve_guards(guards, [booking_doc["id"] for booking_doc in booking_docs])
+        await self._insert_guarded_bookings(booking_docs)
+        return booking_docs
+    
+    async def _reserve_guards(self, guards: List[Dict[str, Any]], owner_ids: List[str]):
+        """Insert guards all or nothing, reclaiming slots from expired holds once before giving up"""
+        await self.expire_holds()
+        for attempt in range(2):
+            try:
+                # Ordered insert stops at the first taken slot; anything written before it is ours to undo
+                await self.db.booking_guards.insert_many(guards, ordered=True)
+                return
+            except (BulkWriteError, DuplicateKeyError):
+                await self._release_guards(owner_ids)
+                # Another process's hold may have lapsed before the TTL monitor got to it
+                if attempt or not await self._purge_expired_hold_guards(
+                    list({guard["resource_id"] for guard in guards})
+                ):
+                    raise ValueError("Resource not available for requested time slot")
+    
+    def _check_slot_alignment(self, start_time: datetime, end_time: datetime):
+        """Guards lock whole slots, so only slot-aligned times can be booked back to back exactly"""
+        for value in (start_time, end_time):
+            if value.minute % self.SLOT_MINUTES or value.second or value.microsecond:
+                raise ValueError(
+                    f"Booking times must be on a {self.SLOT_MINUTES}-minute boundary (e.g. 9:00, 9:15, 9:30)"
+                )
+    
+    def _build_guards(self, tenant_id: str, booking_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Build one guard document per resource slot covered by the bookings"""
+        guards = []
+        for booking_doc in booking_docs:
+            self._check_slot_alignment(booking_doc["start_time"], booking_doc["end_time"])
+            for slot_start in self._iter_slots(booking_doc["start_time"], booking_doc["end_time"]):
+                guard = {
+                    "resource_id": booking_doc["resource_id"],
+                    "slot_start": slot_start,
+                    "booking_id": booking_doc["id"],
+                    "tenant_id": tenant_id,
+                    "created_at": datetime.utcnow()
+                }
+                if booking_doc.get("series_id"):
+                    guard["series_id"] = booking_doc["series_id"]
+                guards.append(guard)
+        return guards
+    
+    async def _insert_guarded_bookings(self, booking_docs: List[Dict[str, Any]]):
+        """Insert bookings whose guards are held, releasing the guards if the write fails"""
+        booking_ids = [booking_doc["id"] for booking_doc in booking_docs]
+        try:
+            await self.db.bookings.insert_many(booking_docs, ordered=True)
+        except Exception:
+            await self.db.bookings.delete_many({"id": {"$in": booking_ids}})
+            await self._release_guards(booking_ids)
+            raise
+        
+        await self._bookings_changed(booking_docs[0]["tenant_id"], booking_docs)
+    
+    async def _bookings_changed(self, tenant_id: str, booking_docs: List[Dict[str, Any]]):
+        """Invalidate everything derived from these bookings: feed versions and past-day utilization rollups"""
+        await self._touch_booking_versions(tenant_id, [booking_doc["resource_id"] for booking_doc in booking_docs])
+        await self.utilization.invalidate_rollups(
+            tenant_id, [(booking_doc["start_time"], booking_doc["end_time"]) for booking_doc in booking_docs]
+        )
+    
+    async def _touch_booking_versions(self, tenant_id: str, resource_ids: List[str]):
+        """Bump the change counters that calendar feeds use to decide whether to regenerate"""
+        now = datetime.utcnow()
+        keys = [f"tenant:{tenant_id}"] + [f"resource:{resource_id}" for resource_id in set(resource_ids)]
+        await self.db.booking_versions.bulk_write([
+            UpdateOne({"_id": key}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+            for key in keys
+        ], ordered=False)
+    
+    def _iter_slots(self, start_time: datetime, end_time: datetime):
+        """Yield the guard slot starts covering [start_time, end_time)"""
+        slot = start_time.replace(
+            minute=start_time.minute - start_time.minute % self.SLOT_MINUTES, second=0, microsecond=0
+        )
+        step = timedelta(minutes=self.SLOT_MINUTES)
+        while slot < end_time:
+            yield slot
+            slot += step
+    
+    async def _release_guards(self, booking_ids: List[str]):
+        """Free the slots held by the given bookings"""
+        await self.db.booking_guards.delete_many({"booking_id": {"$in": booking_ids}})
+    
+    # Checkout Holds
+    async def create_hold(self, tenant_id: str, booking_data: Dict[str, Any], resource_ids: List[str],
+                          hold_seconds: Optional[int] = None) -> Dict[str, Any]:
+        """Reserve a slot for a short checkout window without creating a booking"""
+        start_time = booking_data["start_time"]
+        end_time = booking_data["end_time"]
+        if end_time <= start_time:
+            raise ValueError("Booking end time must be after start time")
+        if len(set(resource_ids)) != len(resource_ids):
+            raise ValueError("Duplicate resource in booking request")
+        self._check_slot_alignment(start_time, end_time)
+        hold_seconds = min(hold_seconds or self.HOLD_SECONDS, self.MAX_HOLD_SECONDS)
         
-        # Create booking
-        booking_doc = {
+        now = datetime.utcnow()
+        hold_doc = {
             **booking_data,
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "resource_ids": resource_ids,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=hold_seconds)
+        }
+        await self._reserve_hold_quota(tenant_id, hold_doc["id"], hold_doc["expires_at"])
+        try:
+            for resource_id in resource_ids:
+                if not await self.check_availability(resource_id, start_time, end_time):
+                    raise ValueError("Resource not available for requested time slot")
+            
+            # Hold guards occupy the same unique slots as booking guards, so holds and bookings exclude each other
+            guards = self._build_guards(tenant_id, [
+                {"id": hold_doc["id"], "resource_id": resource_id, "start_time": start_time, "end_time": end_time}
+                for resource_id in resource_ids
+            ])
+            for guard in guards:
+                guard["expires_at"] = hold_doc["expires_at"]
+            await self._reserve_guards(guards, [hold_doc["id"]])
+            
+            await self.db.booking_holds.insert_one(hold_doc)
+        except Exception:
+            await self._release_hold_quota(tenant_id, hold_doc["id"])
+            raise
+        heapq.heappush(self._hold_heap, (hold_doc["expires_at"], hold_doc["id"]))
+        return hold_doc
+    
+    async def confirm_hold(self, tenant_id: str, hold_id: str,
+                           booking_data: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Turn a live hold into confirmed bookings, reusing the slots it already holds"""
+        # Deleting the hold is the claim: a second confirm, a release or the expiry sweep all find nothing
+        hold = await self.db.booking_holds.find_one_and_delete({
+            "id": hold_id,
             "tenant_id": tenant_id,
-            "status": "confirmed",
+            "expires_at": {"$gt": datetime.utcnow()}
+        })
+        if not hold:
+            raise ValueError("Hold not found or expired")
+        await self._release_hold_quota(tenant_id, hold_id)
+        
+        resource_ids = hold.pop("resource_ids")
+        for field in ("_id", "id", "expires_at", "created_at"):
+            hold.pop(field, None)
+        booking_docs = self._build_booking_docs(tenant_id, {**hold, **(booking_data or {}),
+                                                            "start_time": hold["start_time"],
+                                                            "end_time": hold["end_time"]}, resource_ids)
+        
+        # Hand each resource's guards from the hold to its booking and make them permanent
+        expected = self._build_guards(tenant_id, booking_docs)
+        moved = 0
+        for booking_doc in booking_docs:
+            result = await self.db.booking_guards.update_many(
+                {"booking_id": hold_id, "resource_id": booking_doc["resource_id"]},
+                {"$set": {"booking_id": booking_doc["id"]}, "$unset": {"expires_at": ""}}
+            )
+            moved += result.modified_count
+        
+        if moved != len(expected):
+            # The TTL monitor took some guards at the last moment - fall back to a normal commit
+            await self._release_guards([hold_id] + [booking_doc["id"] for booking_doc in booking_docs])
+            return await self.commit_bookings(tenant_id, booking_docs)
+        
+        await self._insert_guarded_bookings(booking_docs)
+        return booking_docs
+    
+    async def release_hold(self, tenant_id: str, hold_id: str) -> bool:
+        """Give a held slot back before it expires"""
+        hold = await self.db.booking_holds.find_one_and_delete({"id": hold_id, "tenant_id": tenant_id})
+        if hold:
+            await self._release_guards([hold_id])
+            await self._release_hold_quota(tenant_id, hold_id)
+        return hold is not None
+    
+    async def _reserve_hold_quota(self, tenant_id: str, hold_id: str, expires_at: datetime):
+        """Take one of the tenant's MAX_HOLDS_PER_TENANT hold slots, atomically"""
+        # Entries lapse with their holds, so the quota heals even when a hold is never confirmed or released
+        await self.db.booking_hold_quotas.update_one(
+            {"_id": tenant_id}, {"$pull": {"holds": {"expires_at": {"$lte": datetime.utcnow()}}}}
+        )
+        try:
+            # Only matches while the list has room; on a full list the upsert collides with the existing _id
+            await self.db.booking_hold_quotas.update_one(
+                {"_id": tenant_id, f"holds.{self.MAX_HOLDS_PER_TENANT - 1}": {"$exists": False}},
+                {"$push": {"holds": {"id": hold_id, "expires_at": expires_at}}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            raise ValueError("Too many bookings in progress, please try again shortly")
+    
+    async def _release_hold_quota(self, tenant_id: str, hold_id: str):
+        await self.db.booking_hold_quotas.update_one({"_id": tenant_id}, {"$pull": {"holds": {"id": hold_id}}})
+    
+    async def expire_holds(self) -> int:
+        """Release holds from this process whose time is up, ahead of the TTL monitor"""
+        now = datetime.utcnow()
+        expired = []
+        while self._hold_heap and self._hold_heap[0][0] <= now:
+            expired.append(heapq.heappop(self._hold_heap)[1])
+        if not expired:
+            return 0
+        
+        # Confirmed or released holds are already gone, so only lapsed ones match
+        lapsed = await self.db.booking_holds.distinct("id", {"id": {"$in": expired}, "expires_at": {"$lte": now}})
+        await self.db.booking_holds.delete_many({"id": {"$in": lapsed}})
+        await self.db.booking_guards.delete_many({"booking_id": {"$in": lapsed}, "expires_at": {"$lte": now}})
+        return len(lapsed)
+    
+    async def _purge_expired_hold_guards(self, resource_ids: List[str]) -> int:
+        """Delete lapsed hold guards on the given resources, whichever process placed them"""
+        now = datetime.utcnow()
+        result = await self.db.booking_guards.delete_many(
+            {"resource_id": {"$in": resource_ids}, "expires_at": {"$lte": now}}
+        )
+        if result.deleted_count:
+            await self.db.booking_holds.delete_many(
+                {"resource_ids": {"$in": resource_ids}, "expires_at": {"$lte": now}}
+            )
+        return result.deleted_count
+    
+    async def _find_live_hold(self, resource_id: str, start_time: datetime, end_time: datetime):
+        return await self.db.booking_holds.find_one({
+            "resource_ids": resource_id,
+            "start_time": {"$lt": end_time},
+            "end_time": {"$gt": start_time},
+            "expires_at": {"$gt": datetime.utcnow()}
+        }, {"_id": 0, "id": 1})
+    
+    # Recurring Bookings
+    MAX_SERIES_OCCURRENCES = 520
+    
+    def expand_recurrence(self, start_time: datetime, end_time: datetime,
+                          rule: Dict[str, Any]) -> List[Dict[str, datetime]]:
+        """Expand a recurrence rule into concrete occurrence windows"""
+        frequency = rule.get("frequency", "weekly")
+        interval = max(int(rule.get("interval", 1)), 1)
+        count = rule.get("count")
+        until = rule.get("until")
+        if not count and not until:
+            raise ValueError("Recurrence rule needs either 'count' or 'until'")
+        if count and int(count) > self.MAX_SERIES_OCCURRENCES:
+            raise ValueError(f"A series can have at most {self.MAX_SERIES_OCCURRENCES} occurrences")
+        by_weekday = rule.get("by_weekday") or []
+        if any(not isinstance(weekday, int) or not 0 <= weekday <= 6 for weekday in by_weekday):
+            raise ValueError("by_weekday values must be integers from 0 (Monday) to 6 (Sunday)")
+        duration = end_time - start_time
+        
+        def candidates():
+            if frequency == "daily":
+                step = 0
+                while True:
+                    yield start_time + timedelta(days=step * interval)
+                    step += 1
+            elif frequency == "weekly":
+                weekdays = sorted(set(by_weekday or [start_time.weekday()]))
+                week_start = start_time - timedelta(days=start_time.weekday())
+                step = 0
+                while True:
+                    for weekday in weekdays:
+                        candidate = week_start + timedelta(weeks=step * interval, days=weekday)
+                        if candidate >= start_time:
+                            yield candidate
+                    step += 1
+            elif frequency == "monthly":
+                step = 0
+                while True:
+                    month_index = start_time.month - 1 + step * interval
+                    try:
+                        yield start_time.replace(year=start_time.year + month_index // 12, month=month_index % 12 + 1)
+                    except ValueError:
+                        pass  # Month without this day (e.g. the 31st)
+                    step += 1
+            else:
+                raise ValueError(f"Unsupported recurrence frequency: {frequency}")
+        
+        occurrences = []
+        for candidate in candidates():
+            if until and candidate > until:
+                break
+            if count and len(occurrences) >= int(count):
+                break
+            if len(occurrences) >= self.MAX_SERIES_OCCURRENCES:
+                raise ValueError(f"A series can have at most {self.MAX_SERIES_OCCURRENCES} occurrences; "
+                                 "use an earlier 'until' or a 'count'")
+            occurrences.append({"start_time": candidate, "end_time": candidate + duration})
+        if not occurrences:
+            raise ValueError("Recurrence rule produces no occurrences")
+        return occurrences
+    
+    async def create_recurring_booking(self, tenant_id: str, booking_data: Dict[str, Any],
+                                       rule: Dict[str, Any],
+                                       resource_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Create a booking series, committing every conflict-free occurrence in one batch"""
+        resource_ids = resource_ids or [booking_data["resource_id"]]
+        if booking_data["end_time"] <= booking_data["start_time"]:
+            raise ValueError("Booking end time must be after start time")
+        self._check_slot_alignment(booking_data["start_time"], booking_data["end_time"])
+        occurrences = self.expand_recurrence(booking_data["start_time"], booking_data["end_time"], rule)
+        series_id = str(uuid.uuid4())
+        
+        # Expand in memory, then check every occurrence with one range query per resource
+        schedules = await self._get_schedules(resource_ids)
+        range_start = occurrences[0]["start_time"]
+        range_end = occurrences[-1]["end_time"]
+        report = [
+            {"index": index, "start_time": occ["start_time"], "end_time": occ["end_time"], "conflicts": []}
+            for index, occ in enumerate(occurrences)
+        ]
+        for resource_id in resource_ids:
+            busy = await self.db.bookings.find(
+                {
+                    "resource_id": resource_id,
+                    "status": {"$in": self.ACTIVE_STATUSES},
+                    "start_time": {"$lt": range_end},
+                    "end_time": {"$gt": range_start}
+                },
+                {"_id": 0, "id": 1, "start_time": 1, "end_time": 1}
+            ).sort("start_time", 1).to_list(None)
+            schedule = schedules[resource_id]
+            
+            busy_starts = [booking["start_time"] for booking in busy]
+            for entry in report:
+                if not self._fits_schedule(schedule, entry["start_time"], entry["end_time"]):
+                    entry["conflicts"].append({"resource_id": resource_id, "reason": "outside_availability"})
+                    continue
+                # Only bookings starting before this occurrence ends can overlap it
+                for booking in busy[:bisect_left(busy_starts, entry["end_time"])]:
+                    if booking["end_time"] > entry["start_time"]:
+                        entry["conflicts"].append({
+                            "resource_id": resource_id,
+                            "reason": "booked",
+                            "booking_id": booking.get("id")
+                        })
+                        break
+        
+        group_ids = {}
+        booking_docs = []
+        for entry in report:
+            if entry["conflicts"]:
+                continue
+            group_id = str(uuid.uuid4()) if len(resource_ids) > 1 else None
+            group_ids[entry["index"]] = group_id
+            for resource_id in resource_ids:
+                booking_doc = {
+                    **booking_data,
+                    "id": str(uuid.uuid4()),
+                    "resource_id": resource_id,
+                    "start_time": entry["start_time"],
+                    "end_time": entry["end_time"],
+                    "tenant_id": tenant_id,
+                    "series_id": series_id,
+                    "occurrence_index": entry["index"],
+                    "status": "confirmed",
+                    "created_at": datetime.utcnow()
+                }
+                if group_id:
+                    booking_doc["group_id"] = group_id
+                booking_docs.append(booking_doc)
+        
+        if booking_docs:
+            booking_docs = await self._reserve_series_guards(tenant_id, booking_docs, report)
+        if booking_docs:
+            await self._insert_guarded_bookings(booking_docs)
+        
+        series_doc = {
+            **{key: value for key, value in booking_data.items() if key not in ("id", "_id")},
+            "id": series_id,
+            "tenant_id": tenant_id,
+            "resource_ids": resource_ids,
+            "rule": rule,
+            "occurrence_count": len(occurrences),
+            "booked_count": len({doc["occurrence_index"] for doc in booking_docs}),
+            "status": "active",
             "created_at": datetime.utcnow()
         }
-        await self.db.bookings.insert_one(booking_doc)
-        return booking_doc
+        await self.db.booking_series.insert_one(series_doc)
+        
+        for entry in report:
+            entry["status"] = "conflict" if entry["conflicts"] else "booked"
+        return {"series": series_doc, "bookings": booking_docs, "occurrences": report}
+    
+    async def _reserve_series_guards(self, tenant_id: str, booking_docs: List[Dict[str, Any]],
+                                     report: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Reserve guards for a whole series at once, dropping occurrences lost to a race"""
+        guards = self._build_guards(tenant_id, booking_docs)
+        try:
+            await self.db.booking_guards.insert_many(guards, ordered=False)
+            return booking_docs
+        except (BulkWriteError, DuplicateKeyError) as e:
+            failed_indexes = [error["index"] for error in getattr(e, "details", {}).get("writeErrors", [])]
+            lost_booking_ids = {guards[index]["booking_id"] for index in failed_indexes}
+        
+        # An occurrence is all-or-nothing across its resources
+        by_id = {doc["id"]: doc for doc in booking_docs}
+        lost_occurrences = {by_id[booking_id]["occurrence_index"] for booking_id in lost_booking_ids}
+        dropped = [doc["id"] for doc in booking_docs if doc["occurrence_index"] in lost_occurrences]
+        await self._release_guards(dropped)
+        for index in lost_occurrences:
+            report[index]["conflicts"].append({"resource_id": None, "reason": "booked"})
+        return [doc for doc in booking_docs if doc["occurrence_index"] not in lost_occurrences]
+    
+    async def update_series(self, tenant_id: str, series_id: str, from_time: datetime,
+                            changes: Dict[str, Any]) -> int:
+        """Apply changes to an occurrence and all following ones in a single bulk update"""
+        if {"start_time", "end_time", "resource_id"} & set(changes):
+            raise ValueError("Moving a series is not supported; cancel the following occurrences and create a new series")
+        
+        query = {"tenant_id": tenant_id, "series_id": series_id, "start_time": {"$gte": from_time}}
+        status = changes.get("status")
+        if not status:
+            result = await self.db.bookings.update_many(query, {"$set": {**changes, "updated_at": datetime.utcnow()}})
+            if result.modified_count:
+                series = await self.db.booking_series.find_one({"id": series_id}, {"_id": 0, "resource_ids": 1})
+                await self._touch_booking_versions(tenant_id, series["resource_ids"] if series else [])
+            return result.modified_count
+        
+        bookings = await self.db.bookings.find({**query, "status": {"$ne": status}}, {"_id": 0}).to_list(None)
+        for booking in bookings:
+            self._check_status_transition(booking["status"], status)
+        
+        # Occurrences coming back from a release must win their slots again, all resources or none
+        reactivated = [
+            booking for booking in bookings
+            if booking["status"] in self.RELEASED_STATUSES and status in self.ACTIVE_STATUSES
+        ]
+        if reactivated:
+            report = {booking["occurrence_index"]: {"conflicts": []} for booking in reactivated}
+            kept = {booking["id"] for booking in await self._reserve_series_guards(tenant_id, reactivated, report)}
+            lost = {booking["id"] for booking in reactivated} - kept
+            bookings = [booking for booking in bookings if booking["id"] not in lost]
+        
+        booking_ids = [booking["id"] for booking in bookings]
+        result = await self.db.bookings.update_many(
+            {"id": {"$in": booking_ids}}, {"$set": {**changes, "updated_at": datetime.utcnow()}}
+        )
+        other_changes = {key: value for key, value in changes.items() if key != "status"}
+        if other_changes:
+            await self.db.bookings.update_many(
+                {**query, "id": {"$nin": booking_ids}}, {"$set": {**other_changes, "updated_at": datetime.utcnow()}}
+            )
+        
+        if status in self.RELEASED_STATUSES:
+            await self._release_guards(booking_ids)
+            await self.db.booking_series.update_one(
+                {"id": series_id, "tenant_id": tenant_id},
+                {"$set": {"rule.until": from_time, "updated_at": datetime.utcnow()}}
+            )
+        if result.modified_count:
+            await self._bookings_changed(tenant_id, bookings)
+        return result.modified_count
+    
+    def _check_status_transition(self, current: str, status: str):
+        if status not in self.STATUS_TRANSITIONS.get(current, []):
+            raise ValueError(f"Cannot change a {current} booking to {status}")
+    
+    def _fits_schedule(self, schedule: Dict[int, List[Tuple[int, int]]], start_time: datetime,
+                       end_time: datetime) -> bool:
+        """Check whether a window lies inside one of the day's availability windows"""
+        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        start_minute = (start_time - day_start).total_seconds() / 60
+        end_minute = (end_time - day_start).total_seconds() / 60
+        return any(
+            window_start <= start_minute and window_end >= end_minute
+            for window_start, window_end in schedule.get(start_time.weekday(), [])
+        )
     
     async def get_bookings(self, tenant_id: str, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Get bookings for tenant with optional filters"""
@@ -115,8 +817,181 @@ class BookingKernel(BaseKernel):
         bookings = await self.db.bookings.find(query).sort("start_time", 1).to_list(1000)
         return bookings
     
+    # Priced Availability Search
+    async def search_priced_availability(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                                         duration_minutes: int, booking_rules: Dict[str, Any],
+                                         resource_types: List[Dict[str, Any]], pricing_settings: Dict[str, Any],
+                                         resource_ids: Optional[List[str]] = None,
+                                         resource_type: Optional[str] = None, step_minutes: int = 30,
+                                         attendees: int = 1, add_ons: Optional[List[str]] = None,
+                                         limit: int = 1000) -> Dict[str, Any]:
+        """Find free slots across resources and price them all in one vectorized pass"""
+        if duration_minutes <= 0 or step_minutes <= 0:
+            raise ValueError("Duration and step must be positive")
+        if duration_minutes % self.SLOT_MINUTES:
+            raise ValueError(f"Duration must be a multiple of {self.SLOT_MINUTES} minutes")
+        table = await self.pricing.get_rate_table(tenant_id, booking_rules, resource_types, pricing_settings)
+        
+        resources = await self.db.resources.find(
+            {"tenant_id": tenant_id, "is_active": True, **({"type": resource_type} if resource_type else {}),
+             **({"id": {"$in": resource_ids}} if resource_ids else {})},
+            {"_id": 0, "id": 1}
+        ).to_list(None)
+        candidate_resources = [resource["id"] for resource in resources if resource["id"] in table.index]
+        if not candidate_resources:
+            return {"options": [], "total_options": 0, "currency": table.currency}
+        schedules = await self._get_schedules(candidate_resources)
+        
+        # Candidate starts as minutes from start_date, on one timeline per resource
+        origin = start_date.replace(second=0, microsecond=0)
+        span = int((end_date - origin).total_seconds() // 60)
+        stride = span + 2 * 24 * 60
+        first_day = origin.replace(hour=0, minute=0)
+        day_count = (end_date - first_day).days + 1
+        day_offsets = np.arange(day_count) * 1440 - int((origin - first_day).total_seconds() // 60)
+        day_weekdays = (first_day.weekday() + np.arange(day_count)) % 7
+        earliest = max(0, int((datetime.utcnow() - origin).total_seconds() // 60))
+        
+        owners, starts = [], []
+        for position, resource_id in enumerate(candidate_resources):
+            for day_of_week, windows in schedules[resource_id].items():
+                offsets = day_offsets[day_weekdays == day_of_week]
+                for window_start, window_end in windows:
+                    slot_starts = np.arange(window_start, window_end - duration_minutes + 1, step_minutes)
+                    if len(offsets) and len(slot_starts):
+                        minutes = (offsets[:, None] + slot_starts[None, :]).ravel()
+                        starts.append(minutes)
+                        owners.append(np.full(len(minutes), position))
+        if not starts:
+            return {"options": [], "total_options": 0, "currency": table.currency}
+        owners = np.concatenate(owners)
+        starts = np.concatenate(starts)
+        # Only slot-aligned starts can be booked
+        origin_minute = origin.hour * 60 + origin.minute
+        in_window = (starts >= earliest) & (starts + duration_minutes <= span) & \
+            ((origin_minute + starts) % self.SLOT_MINUTES == 0)
+        owners, starts = owners[in_window], starts[in_window]
+        
+        # Drop candidates overlapping existing bookings and live holds (one projected query each)
+        position_of = {resource_id: position for position, resource_id in enumerate(candidate_resources)}
+        busy_owner, busy_start, busy_end = [], [], []
+        async for booking in self.db.bookings.find(
+            {
+                "resource_id": {"$in": candidate_resources},
+                "status": {"$in": self.ACTIVE_STATUSES},
+                "start_time": {"$lt": end_date},
+                "end_time": {"$gt": origin}
+            },
+            {"_id": 0, "resource_id": 1, "start_time": 1, "end_time": 1}
+        ):
+            busy_owner.append(position_of[booking["resource_id"]])
+            busy_start.append(booking["start_time"])
+            busy_end.append(booking["end_time"])
+        async for hold in self.db.booking_holds.find(
+            {
+                "resource_ids": {"$in": candidate_resources},
+                "start_time": {"$lt": end_date},
+                "end_time": {"$gt": origin},
+                "expires_at": {"$gt": datetime.utcnow()}
+            },
+            {"_id": 0, "resource_ids": 1, "start_time": 1, "end_time": 1}
+        ):
+            for resource_id in hold["resource_ids"]:
+                if resource_id in position_of:
+                    busy_owner.append(position_of[resource_id])
+                    busy_start.append(hold["start_time"])
+                    busy_end.append(hold["end_time"])
+        if busy_owner:
+            origin64 = np.datetime64(origin, "m")
+            busy_owner = np.array(busy_owner, dtype=np.int64)
+            # Clip to the window so a long booking cannot spill into a neighbouring resource's timeline
+            busy_start = np.clip(
+                (np.array(busy_start, dtype="datetime64[m]") - origin64).astype(np.int64), 0, span
+            ) + busy_owner * stride
+            busy_end = np.clip(
+                (np.array(busy_end, dtype="datetime64[m]") - origin64).astype(np.int64), 0, span
+            ) + busy_owner * stride
+            order = np.argsort(busy_start)
+            busy_start = busy_start[order]
+            latest_end = np.maximum.accumulate(busy_end[order])
+            positions = owners * stride + starts
+            last_before = np.searchsorted(busy_start, positions + duration_minutes, side="left") - 1
+            clash = (last_before >= 0) & (latest_end[np.maximum(last_before, 0)] > positions)
+            owners, starts = owners[~clash], starts[~clash]
+        
+        table_index = np.array([table.index[resource_id] for resource_id in candidate_resources])[owners]
+        start_values = np.datetime64(origin, "m") + starts
+        prices = table.price(
+            table_index, start_values, np.full(len(starts), duration_minutes),
+            np.full(len(starts), attendees), add_ons
+        )
+        
+        order = np.lexsort((prices["total_price"], starts))[:limit]
+        start_datetimes = start_values[order].astype(datetime)
+        duration = timedelta(minutes=duration_minutes)
+        options = [
+            {
+                "resource_id": candidate_resources[owners[i]],
+                "resource_name": table.resource_names[table_index[i]],
+                "start_time": start_time,
+                "end_time": start_time + duration,
+                "base_price": float(prices["base_price"][i]),
+                "add_ons_price": float(prices["add_ons_price"][i]),
+                "total_price": float(prices["total_price"][i])
+            }
+            for i, start_time in zip(order.tolist(), start_datetimes.tolist())
+        ]
+        return {
+            "options": options,
+            "total_options": int(len(starts)),
+            "currency": table.currency,
+            "cancellation_policy": table.cancellation_policy
+        }
+    
+    async def quote_bookings(self, tenant_id: str, items: List[Dict[str, Any]], booking_rules: Dict[str, Any],
+                             resource_types: List[Dict[str, Any]], pricing_settings: Dict[str, Any],
+                             attendees: int = 1, add_ons: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Price explicit (resource, start, end) combinations, e.g. a multi-day event across venues"""
+        table = await self.pricing.get_rate_table(tenant_id, booking_rules, resource_types, pricing_settings)
+        unknown = [item["resource_id"] for item in items if item["resource_id"] not in table.index]
+        if unknown:
+            raise ValueError(f"Unknown resources: {', '.join(unknown)}")
+        
+        resource_index = np.array([table.index[item["resource_id"]] for item in items], dtype=np.int64)
+        starts = np.array([item["start_time"] for item in items], dtype="datetime64[m]")
+        durations = np.array(
+            [(item["end_time"] - item["start_time"]).total_seconds() // 60 for item in items], dtype=np.int64
+        )
+        prices = table.price(resource_index, starts, durations, np.full(len(items), attendees), add_ons)
+        
+        lines = [
+            {
+                **item,
+                "base_price": float(prices["base_price"][i]),
+                "add_ons_price": float(prices["add_ons_price"][i]),
+                "total_price": float(prices["total_price"][i])
+            }
+            for i, item in enumerate(items)
+        ]
+        return {
+            "items": lines,
+            "total_price": round(float(prices["total_price"].sum()), 2),
+            "currency": table.currency,
+            "cancellation_policy": table.cancellation_policy
+        }
+    
     async def update_booking_status(self, booking_id: str, status: str, notes: Optional[str] = None) -> bool:
         """Update booking status"""
+        booking = await self.db.bookings.find_one({"id": booking_id}, {"_id": 0})
+        if not booking:
+            return False
+        if status != booking["status"]:
+            self._check_status_transition(booking["status"], status)
+        
+        reactivated = booking["status"] in self.RELEASED_STATUSES and status in self.ACTIVE_STATUSES
+        if reactivated:
+            await self._reserve_guards(self._build_guards(booking["tenant_id"], [booking]), [booking_id])
+        
         update_data = {
             "status": status,
             "updated_at": datetime.utcnow()
@@ -124,31 +999,38 @@ class BookingKernel(BaseKernel):
         if notes:
             update_data["notes"] = notes
         
+        # Matching on the status read above keeps a concurrent change from being overwritten
         result = await self.db.bookings.update_one(
-            {"id": booking_id},
+            {"id": booking_id, "status": booking["status"]},
             {"$set": update_data}
         )
+        if not result.matched_count:
+            if reactivated:
+                await self._release_guards([booking_id])
+            raise ValueError("Booking was changed by another request, please retry")
+        if status in self.RELEASED_STATUSES:
+            await self._release_guards([booking_id])
+        if result.modified_count:
+            await self._bookings_changed(booking["tenant_id"], [booking])
         return result.modified_count > 0
     
-    async def get_resource_utilization(self, tenant_id: str, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Get resource utilization statistics"""
-        # This is a simplified version - real implementation would be more complex
-        total_bookings = await self.db.bookings.count_documents({
-            "tenant_id": tenant_id,
-            "start_time": {"$gte": start_date, "$lte": end_date},
-            "status": "confirmed"
-        })
-        
-        total_resources = await self.db.resources.count_documents({
-            "tenant_id": tenant_id,
-            "is_active": True
-        })
-        
-        return {
-            "total_bookings": total_bookings,
-            "total_resources": total_resources,
-            "period": {
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat()
-            }
-        }
\ No newline at end of file
+    async def get_resource_utilization(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                                       use_rollups: bool = True) -> Dict[str, Any]:
+        """Get occupancy per resource, per resource type and per hour of week"""
+        return await self.utilization.report(tenant_id, start_date, end_date, use_rollups)
+    
+    async def get_calendar_feed(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                                resource_id: Optional[str] = None, feed_format: str = "ics",
+                                if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """Get a cached iCalendar or free/busy feed for a resource or the whole tenant"""
+        return await self.feeds.get_feed(tenant_id, start_date, end_date, resource_id, feed_format, if_none_match)
+    
+    async def get_calendar_spans(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                                 resource_ids: Optional[List[str]] = None, encoding: str = "json",
+                                 if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """Get run-length encoded busy/free timelines for many resources"""
+        return await self.spans.get_spans(tenant_id, start_date, end_date, resource_ids, encoding, if_none_match)
+    
+    async def refresh_utilization_rollups(self, tenant_id: str, start_date: datetime, end_date: datetime) -> int:
+        """Rebuild the persisted daily utilization rollups for a date range"""
+        return await self.utilization.refresh_rollups(tenant_id, start_date, end_date)
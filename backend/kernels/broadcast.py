@@ -0,0 +1,257 @@
+"""
+Broadcast Pipeline
+Newsletter-style sends: stream a segment of leads or users, render in bulk, enqueue in chunks
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import uuid
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+
+AUDIENCES = {"leads": "leads", "users": "users"}
+# Segment keys per audience and the document field each one filters on
+SEGMENT_FIELDS = {
+    "leads": {"status": "status", "source": "source", "assigned_to": "assigned_to"},
+    "users": {"role": "role", "is_active": "is_active", "company_id": "company_id"}
+}
+RECIPIENT_FIELDS = {"email": "email", "sms": "phone"}
+ACTIVE_STATUSES = ("pending", "running")
+
+
+class BroadcastPipeline:
+    """Runs broadcasts in the background; progress is checkpointed per chunk so a restart resumes them"""
+
+    CHUNK_SIZE = 1000
+    POLL_SECONDS = 5.0
+    LEASE_SECONDS = 120
+
+    def __init__(self, communication_kernel):
+        self.kernel = communication_kernel
+        self.db = communication_kernel.db
+        self.worker_id = str(uuid.uuid4())
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    # Broadcasts
+    async def create(self, tenant_id: str, template_id: str, audience: str, segment: Optional[Dict[str, Any]] = None,
+                     context: Optional[Dict[str, Any]] = None, scheduled_for: Optional[datetime] = None,
+                     created_by: Optional[str] = None) -> Dict[str, Any]:
+        template = await self.kernel._get_template(template_id)
+        channel = str(getattr(template.get("channel"), "value", template.get("channel") or "email"))
+        if channel not in RECIPIENT_FIELDS:
+            raise ValueError(f"Broadcasts support channels: {list(RECIPIENT_FIELDS)}")
+        query = self.segment_query(tenant_id, audience, segment or {})
+        now = datetime.utcnow()
+        broadcast = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "template_id": template_id,
+            "channel": channel,
+            "audience": audience,
+            "segment": segment or {},
+            "context": context or {},
+            "scheduled_for": scheduled_for or now,
+            "status": "pending",
+            "recipients": await self.db[AUDIENCES[audience]].count_documents(query),
+            "processed": 0,
+            "queued": 0,
+            "skipped": 0,
+            "last_recipient": None,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now
+        }
+        await self.db.broadcasts.insert_one(dict(broadcast))
+        self._wake.set()
+        return broadcast
+
+    @staticmethod
+    def segment_query(tenant_id: str, audience: str, segment: Dict[str, Any]) -> Dict[str, Any]:
+        """Translate a segment ({field: value or [values], created_after, created_before}) into a query"""
+        if audience not in AUDIENCES:
+            raise ValueError(f"Invalid audience. Must be one of: {list(AUDIENCES)}")
+        query: Dict[str, Any] = {"tenant_id": tenant_id}
+        fields = SEGMENT_FIELDS[audience]
+        for key, value in segment.items():
+            if key in ("created_after", "created_before"):
+                bound = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+                query.setdefault("created_at", {})["$gte" if key == "created_after" else "$lt"] = bound
+            elif key in fields:
+                query[fields[key]] = {"$in": value} if isinstance(value, list) else value
+            else:
+                raise ValueError(f"Unsupported segment field for {audience}: {key}")
+        return query
+
+    async def get(self, tenant_id: str, broadcast_id: str) -> Optional[Dict[str, Any]]:
+        """The broadcast with enqueue progress and delivery counts of the messages queued so far"""
+        broadcast = await self.db.broadcasts.find_one(
+            {"id": broadcast_id, "tenant_id": tenant_id}, {"_id": 0, "lease_owner": 0, "last_recipient": 0}
+        )
+        if not broadcast:
+            return None
+        rows = await self.db.message_queue.aggregate([
+            {"$match": {"broadcast_id": broadcast_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        broadcast["delivery"] = {row["_id"]: row["count"] for row in rows}
+        broadcast["progress"] = round(broadcast["processed"] / broadcast["recipients"] * 100, 1) \
+            if broadcast["recipients"] else 100.0
+        return broadcast
+
+    async def recent(self, tenant_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        return await self.db.broadcasts.find(
+            {"tenant_id": tenant_id}, {"_id": 0, "lease_owner": 0, "last_recipient": 0}
+        ).sort("created_at", -1).limit(limit).to_list(limit)
+
+    async def set_status(self, tenant_id: str, broadcast_id: str, action: str) -> bool:
+        """pause or cancel a broadcast that has not finished, or resume a paused one"""
+        transitions = {
+            "pause": (list(ACTIVE_STATUSES), "paused"),
+            "resume": (["paused"], "pending"),
+            "cancel": (list(ACTIVE_STATUSES) + ["paused"], "cancelled")
+        }
+        if action not in transitions:
+            raise ValueError(f"Invalid action. Must be one of: {list(transitions)}")
+        allowed, status = transitions[action]
+        # A running chunk notices on its next checkpoint, which only succeeds while the status is running
+        result = await self.db.broadcasts.update_one(
+            {"id": broadcast_id, "tenant_id": tenant_id, "status": {"$in": allowed}},
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}, "$unset": {"lease_expires_at": ""}}
+        )
+        if result.modified_count and status == "pending":
+            self._wake.set()
+        return bool(result.modified_count)
+
+    # Lifecycle
+    async def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop after the current chunk; the lease lapses and the broadcast resumes from its checkpoint"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                while await self.run_next():
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Broadcast loop error: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_next(self) -> bool:
+        """Claim one due broadcast (new, or running under an expired lease) and send it to completion"""
+        now = datetime.utcnow()
+        broadcast = await self.db.broadcasts.find_one_and_update(
+            {"status": {"$in": list(ACTIVE_STATUSES)}, "scheduled_for": {"$lte": now},
+             "$or": [{"lease_expires_at": {"$exists": False}}, {"lease_expires_at": {"$lte": now}}]},
+            {"$set": {"status": "running", "lease_owner": self.worker_id, "started_at": now,
+                      "lease_expires_at": now + timedelta(seconds=self.LEASE_SECONDS), "updated_at": now}},
+            sort=[("scheduled_for", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if not broadcast:
+            return False
+        try:
+            await self._send(broadcast)
+        except Exception as e:
+            await self.db.broadcasts.update_one(
+                {"id": broadcast["id"], "lease_owner": self.worker_id, "status": "running"},
+                {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()},
+                 "$unset": {"lease_expires_at": ""}}
+            )
+        return True
+
+    async def _send(self, broadcast: Dict[str, Any]):
+        query = self.segment_query(broadcast["tenant_id"], broadcast["audience"], broadcast["segment"])
+        if broadcast.get("last_recipient") is not None:
+            query["_id"] = {"$gt": broadcast["last_recipient"]}
+        cursor = self.db[AUDIENCES[broadcast["audience"]]].find(query).sort("_id", 1).batch_size(self.CHUNK_SIZE)
+
+        chunk = []
+        async for recipient in cursor:
+            chunk.append(recipient)
+            if len(chunk) >= self.CHUNK_SIZE:
+                if not await self._enqueue_chunk(broadcast, chunk):
+                    return
+                chunk = []
+        if chunk and not await self._enqueue_chunk(broadcast, chunk):
+            return
+        await self.db.broadcasts.update_one(
+            {"id": broadcast["id"], "lease_owner": self.worker_id, "status": "running"},
+            {"$set": {"status": "completed", "completed_at": datetime.utcnow(), "updated_at": datetime.utcnow()},
+             "$unset": {"lease_expires_at": ""}}
+        )
+
+    async def _enqueue_chunk(self, broadcast: Dict[str, Any], recipients: List[Dict[str, Any]]) -> bool:
+        """Render and enqueue one chunk, then checkpoint; False when the broadcast was paused, cancelled or lost"""
+        address_field = RECIPIENT_FIELDS[broadcast["channel"]]
+        addressed = [recipient for recipient in recipients if recipient.get(address_field)]
+        contexts = [
+            {**broadcast["context"], **recipient.get("custom_fields", {}), **recipient.get("profile", {}),
+             **{key: recipient.get(key) for key in ("id", "first_name", "last_name", "email", "phone", "company")}}
+            for recipient in addressed
+        ]
+        rendered = await self.kernel.render_template_bulk(broadcast["template_id"], contexts)
+        now = datetime.utcnow()
+        messages = [
+            {
+                "id": str(uuid.uuid4()),
+                "tenant_id": broadcast["tenant_id"],
+                "channel": broadcast["channel"],
+                "recipient": recipient[address_field],
+                "subject": content["subject"],
+                "body": content["body"],
+                "broadcast_id": broadcast["id"],
+                # Unique per broadcast and address: a chunk replayed after a crash, or an address that
+                # appears twice in the segment, is only queued once
+                "dedupe_key": f"{broadcast['id']}:{str(recipient[address_field]).strip().lower()}",
+                "priority": "bulk",
+                "status": "queued",
+                "scheduled_for": now,
+                "attempts": 0,
+                "max_attempts": 3,
+                "created_at": now
+            }
+            for recipient, content in zip(addressed, rendered)
+        ]
+        queued = 0
+        if messages:
+            try:
+                result = await self.db.message_queue.insert_many(messages, ordered=False)
+                queued = len(result.inserted_ids)
+            except BulkWriteError as e:
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+                queued = e.details["nInserted"]
+            await self.kernel.dispatcher.scheduler.touch_lanes(messages[:1])
+            await self.kernel.rollups.increment(messages[:1], "messages_total", queued)
+
+        now = datetime.utcnow()
+        progress = {"last_recipient": recipients[-1]["_id"], "updated_at": now}
+        counters = {"processed": len(recipients), "queued": queued, "skipped": len(recipients) - queued}
+        checkpoint = await self.db.broadcasts.update_one(
+            {"id": broadcast["id"], "lease_owner": self.worker_id, "status": "running"},
+            {"$set": {**progress, "lease_expires_at": now + timedelta(seconds=self.LEASE_SECONDS)},
+             "$inc": counters}
+        )
+        if checkpoint.modified_count:
+            return True
+        # Paused or cancelled while this chunk was enqueued: its messages are in the queue, so record them
+        # without renewing the lease; otherwise a resume replays the chunk and counts it as skipped
+        await self.db.broadcasts.update_one(
+            {"id": broadcast["id"], "lease_owner": self.worker_id}, {"$set": progress, "$inc": counters}
+        )
+        return False
@@ -0,0 +1,143 @@
+"""
+Calendar Feeds
+Cached iCalendar and free/busy feeds per resource and per tenant
+"""
+from typing import Dict, Any, List, Optional
+from collections import OrderedDict
+from datetime import datetime
+import hashlib
+import json
+
+
+class CalendarFeeds:
+    """Builds calendar feeds from bookings and caches them until the bookings change"""
+
+    CACHE_SIZE = 512
+
+    def __init__(self, booking_kernel):
+        self.kernel = booking_kernel
+        self.db = booking_kernel.db
+        self._cache = OrderedDict()  # (scope, window, format) -> feed
+
+    async def get_feed(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                       resource_id: Optional[str] = None, feed_format: str = "ics",
+                       if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """Return a feed, its validators, or not_modified when the client copy is current"""
+        if feed_format not in ("ics", "json"):
+            raise ValueError(f"Unsupported feed format: {feed_format}")
+
+        # The version counter is bumped on every booking write, so one read tells us if anything changed
+        version_key = f"resource:{resource_id}" if resource_id else f"tenant:{tenant_id}"
+        version = await self.db.booking_versions.find_one({"_id": version_key}) or {}
+        cache_key = (tenant_id, version_key, start_date, end_date, feed_format)
+        etag = '"{}"'.format(hashlib.sha1(
+            repr((*cache_key, version.get("version", 0))).encode()
+        ).hexdigest())
+        last_modified = version.get("updated_at") or start_date
+
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return {"not_modified": True, "etag": etag, "last_modified": last_modified}
+
+        cached = self._cache.get(cache_key)
+        if cached and cached["etag"] == etag:
+            self._cache.move_to_end(cache_key)
+            return cached
+
+        if feed_format == "ics":
+            content = await self._render_ics(tenant_id, resource_id, start_date, end_date)
+            media_type = "text/calendar; charset=utf-8"
+        else:
+            content = await self._render_free_busy(tenant_id, resource_id, start_date, end_date)
+            media_type = "application/json"
+
+        feed = {
+            "not_modified": False,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content": content,
+            "media_type": media_type
+        }
+        self._cache[cache_key] = feed
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return feed
+
+    def _cursor(self, tenant_id: str, resource_id: Optional[str], start_date: datetime, end_date: datetime):
+        """Projected cursor over the busy bookings in the window"""
+        query = {
+            "tenant_id": tenant_id,
+            "status": {"$in": self.kernel.ACTIVE_STATUSES},
+            "start_time": {"$lt": end_date},
+            "end_time": {"$gt": start_date}
+        }
+        if resource_id:
+            query["resource_id"] = resource_id
+        return self.db.bookings.find(
+            query, {"_id": 0, "id": 1, "resource_id": 1, "start_time": 1, "end_time": 1}
+        ).sort("start_time", 1)
+
+    async def _resource_names(self, tenant_id: str, resource_id: Optional[str]) -> Dict[str, str]:
+        query = {"tenant_id": tenant_id}
+        if resource_id:
+            query["id"] = resource_id
+        resources = await self.db.resources.find(query, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+        return {resource["id"]: resource.get("name") or "Resource" for resource in resources}
+
+    async def _render_ics(self, tenant_id: str, resource_id: Optional[str],
+                          start_date: datetime, end_date: datetime) -> bytes:
+        """Render bookings as an iCalendar document (busy blocks only, no booking details)"""
+        names = await self._resource_names(tenant_id, resource_id)
+        stamp = self._ics_time(datetime.utcnow())
+        chunks = [
+            "BEGIN:VCALENDAR",
+            "VERSION:2.0",
+            "PRODID:-//Claude Platform//Booking Calendar//EN",
+            "CALSCALE:GREGORIAN",
+            "METHOD:PUBLISH",
+            f"X-WR-CALNAME:{self._ics_escape(names.get(resource_id, 'Bookings') if resource_id else 'Bookings')}"
+        ]
+        async for booking in self._cursor(tenant_id, resource_id, start_date, end_date):
+            chunks.extend([
+                "BEGIN:VEVENT",
+                f"UID:{booking.get('id')}@claude-platform",
+                f"DTSTAMP:{stamp}",
+                f"DTSTART:{self._ics_time(booking['start_time'])}",
+                f"DTEND:{self._ics_time(booking['end_time'])}",
+                f"SUMMARY:{self._ics_escape('Booked - ' + names.get(booking.get('resource_id'), 'Resource'))}",
+                "TRANSP:OPAQUE",
+                "END:VEVENT"
+            ])
+        chunks.append("END:VCALENDAR")
+        return ("\r\n".join(chunks) + "\r\n").encode("utf-8")
+
+    async def _render_free_busy(self, tenant_id: str, resource_id: Optional[str],
+                                start_date: datetime, end_date: datetime) -> bytes:
+        """Render merged busy intervals per resource as JSON"""
+        busy: Dict[str, List[List[datetime]]] = {}
+        async for booking in self._cursor(tenant_id, resource_id, start_date, end_date):
+            intervals = busy.setdefault(booking["resource_id"], [])
+            start = max(booking["start_time"], start_date)
+            end = min(booking["end_time"], end_date)
+            # Cursor is sorted by start, so overlapping or touching blocks only need the last interval
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1][1] = max(intervals[-1][1], end)
+            else:
+                intervals.append([start, end])
+
+        return json.dumps({
+            "start": start_date.isoformat(),
+            "end": end_date.isoformat(),
+            "resources": {
+                rid: [[start.isoformat(), end.isoformat()] for start, end in intervals]
+                for rid, intervals in busy.items()
+            }
+        }, separators=(",", ":")).encode("utf-8")
+
+    @staticmethod
+    def _ics_time(value: datetime) -> str:
+        return value.strftime("%Y%m%dT%H%M%SZ")
+
+    @staticmethod
+    def _ics_escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
@@ -0,0 +1,169 @@
+"""
+Calendar Spans
+Run-length encoded busy/free timelines per resource, cached per (resource, week)
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import msgpack
+
+
+WEEK_MINUTES = 7 * 24 * 60
+
+
+class CalendarSpans:
+    """Compact calendar payloads for month and week views"""
+
+    CACHE_SIZE = 8192
+
+    def __init__(self, booking_kernel):
+        self.kernel = booking_kernel
+        self.db = booking_kernel.db
+        self._weeks = OrderedDict()  # (resource_id, week_start) -> (version, [(start_minute, end_minute)])
+
+    async def get_spans(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                        resource_ids: Optional[List[str]] = None, encoding: str = "json",
+                        if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """Return alternating free/busy run lengths in minutes per resource, starting with free"""
+        if encoding not in ("json", "msgpack"):
+            raise ValueError(f"Unsupported encoding: {encoding}")
+        start_date = start_date.replace(second=0, microsecond=0)
+        end_date = end_date.replace(second=0, microsecond=0)
+
+        query = {"tenant_id": tenant_id, "is_active": True}
+        if resource_ids:
+            query["id"] = {"$in": resource_ids}
+        resources = sorted(await self.db.resources.distinct("id", query))
+
+        # One read of the change counters decides both the ETag and which cached weeks are stale
+        versions = {
+            doc["_id"][len("resource:"):]: doc
+            async for doc in self.db.booking_versions.find(
+                {"_id": {"$in": [f"resource:{resource_id}" for resource_id in resources]}}
+            )
+        }
+        resource_versions = [(rid, versions.get(rid, {}).get("version", 0)) for rid in resources]
+        etag = '"{}"'.format(hashlib.sha1(
+            repr((tenant_id, start_date, end_date, encoding, resource_versions)).encode()
+        ).hexdigest())
+        last_modified = max(
+            [doc["updated_at"] for doc in versions.values() if doc.get("updated_at")], default=start_date
+        )
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return {"not_modified": True, "etag": etag, "last_modified": last_modified}
+
+        weeks = self._week_starts(start_date, end_date)
+        # Read from this request's own copy: the cache may already have evicted part of a large request
+        loaded = await self._load_weeks(resource_versions, weeks)
+
+        origin = weeks[0]
+        offset = int((start_date - origin).total_seconds() // 60)
+        span = int((end_date - start_date).total_seconds() // 60)
+        runs = {}
+        for resource_id, version in resource_versions:
+            busy = []
+            for index, week_start in enumerate(weeks):
+                week_offset = index * WEEK_MINUTES - offset
+                for start, end in loaded[(resource_id, week_start)]:
+                    start, end = max(start + week_offset, 0), min(end + week_offset, span)
+                    if start >= end:
+                        continue
+                    # Bookings crossing midnight Monday are split by the week cache; join them again
+                    if busy and start <= busy[-1][1]:
+                        busy[-1][1] = max(busy[-1][1], end)
+                    else:
+                        busy.append([start, end])
+            runs[resource_id] = self._run_lengths(busy, span)
+
+        payload = {"start": start_date.isoformat(), "end": end_date.isoformat(), "unit": "minute", "resources": runs}
+        if encoding == "msgpack":
+            content, media_type = msgpack.packb(payload), "application/x-msgpack"
+        else:
+            content, media_type = json.dumps(payload, separators=(",", ":")).encode("utf-8"), "application/json"
+        return {
+            "not_modified": False,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content": content,
+            "media_type": media_type
+        }
+
+    async def _load_weeks(self, resource_versions: List[Tuple[str, int]],
+                          weeks: List[datetime]) -> Dict[Tuple[str, datetime], List[Tuple[int, int]]]:
+        """Busy intervals for every (resource, week), filling stale or missing cache entries with one query"""
+        loaded = {}
+        missing = {}
+        for resource_id, version in resource_versions:
+            for week_start in weeks:
+                cached = self._weeks.get((resource_id, week_start))
+                if cached and cached[0] == version:
+                    self._weeks.move_to_end((resource_id, week_start))
+                    loaded[(resource_id, week_start)] = cached[1]
+                else:
+                    missing.setdefault(resource_id, set()).add(week_start)
+        if not missing:
+            return loaded
+
+        first_week = min(min(starts) for starts in missing.values())
+        last_week = max(max(starts) for starts in missing.values())
+        intervals = {(resource_id, week_start): [] for resource_id, starts in missing.items() for week_start in starts}
+        async for booking in self.db.bookings.find(
+            {
+                "resource_id": {"$in": list(missing)},
+                "status": {"$in": self.kernel.ACTIVE_STATUSES},
+                "start_time": {"$lt": last_week + timedelta(days=7)},
+                "end_time": {"$gt": first_week}
+            },
+            {"_id": 0, "resource_id": 1, "start_time": 1, "end_time": 1}
+        ):
+            week_start = self._week_start(booking["start_time"])
+            while week_start < booking["end_time"]:
+                week = intervals.get((booking["resource_id"], week_start))
+                if week is not None:
+                    week.append((
+                        max(int((booking["start_time"] - week_start).total_seconds() // 60), 0),
+                        min(int((booking["end_time"] - week_start).total_seconds() // 60), WEEK_MINUTES)
+                    ))
+                week_start += timedelta(days=7)
+
+        versions = dict(resource_versions)
+        for (resource_id, week_start), week in intervals.items():
+            loaded[(resource_id, week_start)] = self._merge(week)
+            self._weeks[(resource_id, week_start)] = (versions[resource_id], loaded[(resource_id, week_start)])
+            self._weeks.move_to_end((resource_id, week_start))
+        while len(self._weeks) > self.CACHE_SIZE:
+            self._weeks.popitem(last=False)
+        return loaded
+
+    @staticmethod
+    def _week_start(value: datetime) -> datetime:
+        return (value - timedelta(days=value.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _week_starts(self, start_date: datetime, end_date: datetime) -> List[datetime]:
+        weeks = [self._week_start(start_date)]
+        while weeks[-1] + timedelta(days=7) < end_date:
+            weeks.append(weeks[-1] + timedelta(days=7))
+        return weeks
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    @staticmethod
+    def _run_lengths(busy: List[List[int]], span: int) -> List[int]:
+        """Alternating free/busy run lengths covering [0, span); the first run is free and may be 0"""
+        runs, cursor = [], 0
+        for start, end in busy:
+            runs.extend([start - cursor, end - start])
+            cursor = end
+        if cursor < span:
+            runs.append(span - cursor)
+        return runs
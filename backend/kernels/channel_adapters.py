@@ -0,0 +1,252 @@
+"""
+Channel Adapters
+Delivery backends for the message dispatcher: SMTP, webhooks and a local file sink
+"""
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import random
+import smtplib
+import time
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class DeliveryError(Exception):
+    """A delivery attempt failed and may be retried"""
+
+
+class PermanentDeliveryError(DeliveryError):
+    """A delivery attempt failed in a way retrying cannot fix"""
+
+
+class ChannelAdapter:
+    """Delivers a batch of messages for one channel, returning None or an exception per message"""
+
+    async def send(self, messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class FileSinkAdapter(ChannelAdapter):
+    """Appends messages as JSON lines; stands in for channels with no provider configured"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    async def send(self, messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        lines = "".join(
+            json.dumps({**message, "sent_at": datetime.utcnow()}, default=str) + "\n" for message in messages
+        )
+        await asyncio.to_thread(self._write, lines)
+        return [None] * len(messages)
+
+    def _write(self, lines: str):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as sink:
+            sink.write(lines)
+
+
+class SMTPAdapter(ChannelAdapter):
+    """Sends a batch of emails over one SMTP connection"""
+
+    def __init__(self, host: str, port: int = 587, username: Optional[str] = None,
+                 password: Optional[str] = None, sender: Optional[str] = None, starttls: bool = True,
+                 timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.starttls = starttls
+        self.timeout = timeout
+
+    async def send(self, messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        return await asyncio.to_thread(self._send_batch, messages)
+
+    def _send_batch(self, messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        try:
+            connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except (OSError, smtplib.SMTPException) as e:
+            return [DeliveryError(f"SMTP connect failed: {e}")] * len(messages)
+        results = []
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.username:
+                connection.login(self.username, self.password or "")
+            for message in messages:
+                results.append(self._send_one(connection, message))
+        except (OSError, smtplib.SMTPException) as e:
+            # The connection itself failed; everything not yet sent is retried
+            results.extend([DeliveryError(f"SMTP session failed: {e}")] * (len(messages) - len(results)))
+        finally:
+            try:
+                connection.quit()
+            except (OSError, smtplib.SMTPException):
+                pass
+        return results
+
+    def _send_one(self, connection: smtplib.SMTP, message: Dict[str, Any]) -> Optional[Exception]:
+        if not message.get("recipient"):
+            return PermanentDeliveryError("Message has no recipient")
+        email = EmailMessage()
+        email["From"] = message.get("sender") or self.sender
+        email["To"] = message["recipient"]
+        email["Subject"] = message.get("subject", "")
+        email.set_content(message.get("body", ""))
+        try:
+            connection.send_message(email)
+        except smtplib.SMTPRecipientsRefused as e:
+            return PermanentDeliveryError(f"Recipient refused: {e.recipients}")
+        except smtplib.SMTPResponseException as e:
+            # 5xx replies are permanent, 4xx are worth retrying
+            error_class = PermanentDeliveryError if e.smtp_code >= 500 else DeliveryError
+            return error_class(f"SMTP {e.smtp_code}: {e.smtp_error!r}")
+        return None
+
+
+class WebhookAdapter(ChannelAdapter):
+    """Posts webhooks over a shared keep-alive connection pool, with a concurrency limit per destination host"""
+
+    MAX_CONNECTIONS = 200
+    PER_HOST = 20
+    CONNECT_TIMEOUT = 3.0
+    READ_TIMEOUT = 10.0
+    # Attempts within one send; after that the dispatcher requeues the message with its own backoff
+    ATTEMPTS = 3
+    RETRY_BASE_SECONDS = 0.25
+    RETRY_MAX_SECONDS = 5.0
+    MAX_BATCH_EVENTS = 100
+
+    def __init__(self, secret: Optional[str] = None, max_connections: Optional[int] = None,
+                 per_host: Optional[int] = None):
+        self.secret = secret
+        self.per_host = per_host or self.PER_HOST
+        self.session = requests.Session()
+        # pool_block keeps each host at per_host sockets, all reused across requests and batches
+        pool = HTTPAdapter(pool_connections=64, pool_maxsize=self.per_host, pool_block=True, max_retries=0)
+        self.session.mount("http://", pool)
+        self.session.mount("https://", pool)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections or self.MAX_CONNECTIONS,
+                                            thread_name_prefix="webhook")
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self.metrics = {"requests": 0, "events": 0, "retries": 0}
+
+    async def send(self, messages: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        results: List[Optional[Exception]] = [None] * len(messages)
+        pending, indices = [], []
+        for request, positions in self._build_requests(messages, results):
+            pending.append(request)
+            indices.append(positions)
+        errors = await asyncio.gather(*[self._deliver(request) for request in pending])
+        for positions, error in zip(indices, errors):
+            for position in positions:
+                results[position] = error
+        return results
+
+    def _build_requests(self, messages: List[Dict[str, Any]], results: List[Optional[Exception]]):
+        """One request per message, except batch-enabled POSTs to the same endpoint, which share one"""
+        batches: Dict[tuple, List[int]] = {}
+        for position, message in enumerate(messages):
+            url = message.get("url")
+            if not url or not urlsplit(url).netloc:
+                results[position] = PermanentDeliveryError("Webhook has no valid url")
+                continue
+            method = str(message.get("method") or "POST").upper()
+            secret = message.get("signing_secret") or self.secret
+            if message.get("batch") and method == "POST":
+                batches.setdefault((url, secret), []).append(position)
+                continue
+            yield {"id": message.get("id") or str(uuid.uuid4()), "method": method, "url": url, "secret": secret,
+                   "body": message.get("payload"), "events": 1}, [position]
+
+        for (url, secret), positions in batches.items():
+            for offset in range(0, len(positions), self.MAX_BATCH_EVENTS):
+                chunk = positions[offset:offset + self.MAX_BATCH_EVENTS]
+                events = [{"id": messages[position].get("id"), "payload": messages[position].get("payload")}
+                          for position in chunk]
+                yield {"id": str(uuid.uuid4()), "method": "POST", "url": url, "secret": secret,
+                       "body": {"events": events}, "events": len(chunk)}, chunk
+
+    async def _deliver(self, request: Dict[str, Any]) -> Optional[Exception]:
+        request["data"] = json.dumps(request.pop("body"), default=str, separators=(",", ":")).encode()
+        host = urlsplit(request["url"]).netloc
+        semaphore = self._hosts.setdefault(host, asyncio.Semaphore(self.per_host))
+        loop = asyncio.get_running_loop()
+        error = None
+        for attempt in range(1, self.ATTEMPTS + 1):
+            async with semaphore:
+                error, retry_after = await loop.run_in_executor(self._executor, self._post, request)
+            if error is None or isinstance(error, PermanentDeliveryError) or attempt == self.ATTEMPTS:
+                break
+            self.metrics["retries"] += 1
+            # Full jitter so a recovering endpoint is not hit by every retry at once
+            delay = retry_after if retry_after is not None else random.uniform(
+                0, self.RETRY_BASE_SECONDS * 2 ** attempt
+            )
+            await asyncio.sleep(min(delay, self.RETRY_MAX_SECONDS))
+        if error is None:
+            self.metrics["events"] += request["events"]
+        return error
+
+    def _post(self, request: Dict[str, Any]):
+        timestamp = str(int(time.time()))
+        headers = {
+            "Content-Type": "application/json",
+            "X-Webhook-Id": request["id"],
+            "X-Webhook-Timestamp": timestamp
+        }
+        if request["secret"]:
+            # Receivers verify HMAC-SHA256 of "<timestamp>.<body>" and reject stale timestamps
+            digest = hmac.new(request["secret"].encode(), timestamp.encode() + b"." + request["data"],
+                              hashlib.sha256).hexdigest()
+            headers["X-Webhook-Signature"] = f"sha256={digest}"
+        self.metrics["requests"] += 1
+        try:
+            response = self.session.request(
+                request["method"], request["url"], data=request["data"], headers=headers,
+                timeout=(self.CONNECT_TIMEOUT, self.READ_TIMEOUT)
+            )
+        except requests.RequestException as e:
+            return DeliveryError(f"Webhook request failed: {e}"), None
+        if response.status_code < 300:
+            return None, None
+        # Client errors other than timeouts and rate limiting will fail the same way every time
+        if 400 <= response.status_code < 500 and response.status_code not in (408, 429):
+            return PermanentDeliveryError(f"Webhook returned {response.status_code}"), None
+        retry_after = response.headers.get("Retry-After", "")
+        return (DeliveryError(f"Webhook returned {response.status_code}"),
+                float(retry_after) if retry_after.isdigit() else None)
+
+    async def close(self):
+        self.session.close()
+        self._executor.shutdown(wait=False)
+
+
+def adapters_from_env() -> Dict[str, ChannelAdapter]:
+    """Email goes over SMTP when SMTP_HOST is set; channels without a provider go to the file sink"""
+    sink = FileSinkAdapter(os.environ.get("MESSAGE_SINK_PATH", "message_sink.jsonl"))
+    adapters = {channel: sink for channel in ("email", "sms", "push_notification", "internal_notification")}
+    adapters["webhook"] = WebhookAdapter(os.environ.get("WEBHOOK_SIGNING_SECRET"))
+    if os.environ.get("SMTP_HOST"):
+        adapters["email"] = SMTPAdapter(
+            os.environ["SMTP_HOST"],
+            int(os.environ.get("SMTP_PORT", 587)),
+            os.environ.get("SMTP_USERNAME"),
+            os.environ.get("SMTP_PASSWORD"),
+            os.environ.get("SMTP_FROM"),
+            os.environ.get("SMTP_STARTTLS", "true").lower() != "false"
+        )
+    return adapters
@@ -3,9 +3,22 @@ Automation & Communication Kernel (The "Messenger")
 Universal communication and workflow automation engine
 """
 from typing import Dict, Any, List, Optional, Callable
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
+import asyncio
+import time
+import uuid
 from kernels.base_kernel import BaseKernel
+from kernels.message_dispatcher import MessageDispatcher
+from kernels.message_scheduler import PRIORITY_CLASSES, DEFAULT_PRIORITY
+from kernels.template_engine import TemplateCache, validate_template
+from kernels.workflow_router import WorkflowRouter, ENTITY_STATUSES
+from kernels.event_bus import EventBus
+from kernels.action_scheduler import ActionScheduler
+from kernels.log_sink import LogSink
+from kernels.stats_rollups import StatsRollups, day_of
+from kernels.broadcast import BroadcastPipeline
+from kernels.notification_outbox import NotificationOutbox
 
 
 class TriggerEvent(str, Enum):
@@ -32,19 +45,61 @@ class MessageChannel(str, Enum):
 class CommunicationKernel(BaseKernel):
     """Universal communication and automation system"""
     
+    # Template edits made through another process show up within this many seconds
+    TEMPLATE_REVALIDATE_SECONDS = 30
+    # Workflow execution logs are removed by a TTL index after this many days
+    AUTOMATION_LOG_RETENTION_DAYS = 30
+    
     def __init__(self, db):
         super().__init__(db)
         self.workflows = {}
         self.message_handlers = {}
         self.triggers = {}
+        self.dispatcher = MessageDispatcher(self)
+        self.compiled_templates = TemplateCache()
+        self._template_docs = {}  # template_id -> (fetched at, template document)
+        self.router = WorkflowRouter(self)
+        self.events = EventBus(self)
+        self.timers = ActionScheduler(self)
+        self.rollups = StatsRollups(self)
+        self.automation_logs = LogSink(db.automation_logs, on_flush=self.rollups.record_workflow_logs)
+        self.broadcasts = BroadcastPipeline(self)
+        self.notifications = NotificationOutbox(self)
     
     async def _initialize_kernel(self):
         """Initialize communication kernel"""
         # Ensure indexes exist
         await self.db.message_templates.create_index([("tenant_id", 1), ("template_type", 1)])
+        await self.db.message_templates.create_index("id")
         await self.db.workflows.create_index([("tenant_id", 1), ("trigger_event", 1)])
         await self.db.message_queue.create_index([("tenant_id", 1), ("status", 1), ("scheduled_for", 1)])
         await self.db.automation_logs.create_index([("tenant_id", 1), ("created_at", -1)])
+        await self.db.automation_logs.create_index(
+            "created_at", expireAfterSeconds=self.AUTOMATION_LOG_RETENTION_DAYS * 86400
+        )
+        # Dispatcher claims due messages across tenants, reclaims expired leases and measures throughput
+        await self.db.message_queue.create_index([("status", 1), ("scheduled_for", 1)])
+        await self.db.message_queue.create_index([("status", 1), ("lease_expires_at", 1)])
+        await self.db.message_queue.create_index([("status", 1), ("delivered_at", -1)])
+        # Workers pull each (tenant, priority) lane in due order; lanes and rate windows are small side collections
+        await self.db.message_queue.create_index([("tenant_id", 1), ("status", 1), ("priority", 1), ("scheduled_for", 1)])
+        await self.db.message_lanes.create_index("next_due")
+        await self.db.message_rate_windows.create_index("expires_at", expireAfterSeconds=0)
+        await self.db.message_dead_letters.create_index("id", unique=True)
+        await self.db.message_dead_letters.create_index([("tenant_id", 1), ("dead_lettered_at", -1)])
+        await self.db.event_outbox.create_index("available_at")
+        await self.db.communication_rollups.create_index([("tenant_id", 1), ("day", 1)], unique=True)
+        await self.db.broadcasts.create_index("id", unique=True)
+        await self.db.broadcasts.create_index([("status", 1), ("scheduled_for", 1)])
+        await self.db.broadcasts.create_index([("tenant_id", 1), ("created_at", -1)])
+        await self.db.message_queue.create_index("broadcast_id", sparse=True)
+        await self.db.message_queue.create_index("dedupe_key", unique=True, sparse=True)
+        await self.db.notification_outbox.create_index([("failed_at", 1), ("created_at", 1)])
+        await self.db.scheduled_actions.create_index("id", unique=True)
+        await self.db.scheduled_actions.create_index([("status", 1), ("due_at", 1)])
+        await self.db.scheduled_actions.create_index([("tenant_id", 1), ("entity_refs", 1), ("status", 1)])
+        # Finished and cancelled actions are kept for a week
+        await self.db.scheduled_actions.create_index("completed_at", expireAfterSeconds=7 * 24 * 3600)
     
     async def validate_tenant_access(self, tenant_id: str, user_id: str) -> bool:
         """Validate user belongs to tenant"""
@@ -54,15 +109,35 @@ class CommunicationKernel(BaseKernel):
     # Message Template Management
     async def create_message_template(self, tenant_id: str, template_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a new message template"""
+        validate_template(template_data)
+        now = datetime.utcnow()
         template_doc = {
             **template_data,
+            "id": template_data.get("id") or str(uuid.uuid4()),
             "tenant_id": tenant_id,
             "is_active": True,
-            "created_at": datetime.utcnow()
+            "created_at": now,
+            "updated_at": now
         }
         await self.db.message_templates.insert_one(template_doc)
+        if template_doc.get("template_type"):
+            # Module workflows find templates by type, so routing tables must pick up the new one
+            await self.router.bump_version(tenant_id)
         return template_doc
     
+    async def update_message_template(self, tenant_id: str, template_id: str, updates: Dict[str, Any]) -> bool:
+        """Update a message template; updated_at keys the compiled template cache"""
+        validate_template(updates)
+        result = await self.db.message_templates.update_one(
+            {"id": template_id, "tenant_id": tenant_id},
+            {"$set": {**updates, "updated_at": datetime.utcnow()}}
+        )
+        self._template_docs.pop(template_id, None)
+        self.compiled_templates.invalidate(template_id)
+        if result.matched_count and {"template_type", "is_active"} & set(updates):
+            await self.router.bump_version(tenant_id)
+        return result.matched_count > 0
+    
     async def get_message_templates(self, tenant_id: str, template_type: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get message templates for tenant"""
         query = {"tenant_id": tenant_id, "is_active": True}
@@ -74,37 +149,56 @@ class CommunicationKernel(BaseKernel):
     
     async def render_template(self, template_id: str, context: Dict[str, Any]) -> Dict[str, str]:
         """Render a message template with context data"""
-        template = await self.db.message_templates.find_one({"id": template_id})
+        return (await self.render_template_bulk(template_id, [context]))[0]
+    
+    async def render_template_bulk(self, template_id: str, contexts: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Render one template for many contexts, e.g. every recipient of a campaign"""
+        template = await self._get_template(template_id)
+        subject, body = self.compiled_templates.get(template)
+        channel = template.get("channel", MessageChannel.EMAIL)
+        return [
+            {"subject": subject.render(context), "body": body.render(context), "channel": channel}
+            for context in contexts
+        ]
+    
+    async def _get_template(self, template_id: str) -> Dict[str, Any]:
+        cached = self._template_docs.get(template_id)
+        if cached and time.monotonic() - cached[0] < self.TEMPLATE_REVALIDATE_SECONDS:
+            return cached[1]
+        template = await self.db.message_templates.find_one(
+            {"id": template_id},
+            {"_id": 0, "id": 1, "subject": 1, "body": 1, "channel": 1, "format": 1, "created_at": 1, "updated_at": 1}
+        )
         if not template:
             raise ValueError("Template not found")
-        
-        # Simple template rendering (in production, use a proper template engine)
-        subject = template.get("subject", "")
-        body = template.get("body", "")
-        
-        for key, value in context.items():
-            placeholder = f"{{{key}}}"
-            subject = subject.replace(placeholder, str(value))
-            body = body.replace(placeholder, str(value))
-        
-        return {
-            "subject": subject,
-            "body": body,
-            "channel": template.get("channel", MessageChannel.EMAIL)
-        }
+        if len(self._template_docs) >= self.compiled_templates.SIZE:
+            self._template_docs.clear()
+        self._template_docs[template_id] = (time.monotonic(), template)
+        return template
     
     # Workflow Management
     async def create_workflow(self, tenant_id: str, workflow_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create an automation workflow"""
         workflow_doc = {
             **workflow_data,
+            "id": workflow_data.get("id") or str(uuid.uuid4()),
             "tenant_id": tenant_id,
             "is_active": True,
             "created_at": datetime.utcnow()
         }
         await self.db.workflows.insert_one(workflow_doc)
+        await self.router.bump_version(tenant_id)
         return workflow_doc
     
+    async def update_workflow(self, tenant_id: str, workflow_id: str, updates: Dict[str, Any]) -> bool:
+        """Update (or with is_active=False, disable) a workflow and invalidate routing tables"""
+        result = await self.db.workflows.update_one(
+            {"id": workflow_id, "tenant_id": tenant_id},
+            {"$set": {**updates, "updated_at": datetime.utcnow()}}
+        )
+        await self.router.bump_version(tenant_id)
+        return result.matched_count > 0
+    
     async def get_workflows(self, tenant_id: str, trigger_event: Optional[str] = None) -> List[Dict[str, Any]]:
         """Get workflows for tenant"""
         query = {"tenant_id": tenant_id, "is_active": True}
@@ -118,9 +212,14 @@ class CommunicationKernel(BaseKernel):
     async def queue_message(self, tenant_id: str, message_data: Dict[str, Any], 
                           scheduled_for: Optional[datetime] = None) -> Dict[str, Any]:
         """Queue a message for delivery"""
+        priority = message_data.get("priority") or DEFAULT_PRIORITY
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Invalid priority. Must be one of: {PRIORITY_CLASSES}")
         message_doc = {
             **message_data,
+            "id": message_data.get("id") or str(uuid.uuid4()),
             "tenant_id": tenant_id,
+            "priority": priority,
             "status": "queued",
             "scheduled_for": scheduled_for or datetime.utcnow(),
             "attempts": 0,
@@ -128,6 +227,8 @@ class CommunicationKernel(BaseKernel):
             "created_at": datetime.utcnow()
         }
         await self.db.message_queue.insert_one(message_doc)
+        await self.dispatcher.scheduler.touch_lanes([message_doc])
+        await self.rollups.increment([message_doc], "messages_total")
         return message_doc
     
     async def get_queued_messages(self, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -146,57 +247,112 @@ class CommunicationKernel(BaseKernel):
         """Update message delivery status"""
         update_data = {
             "status": status,
-            "updated_at": datetime.utcnow(),
-            "$inc": {"attempts": 1}
+            "updated_at": datetime.utcnow()
         }
         if error:
             update_data["last_error"] = error
         
         await self.db.message_queue.update_one(
             {"id": message_id},
-            {"$set": update_data}
+            {"$set": update_data, "$inc": {"attempts": 1}}
         )
     
+    async def dispatch_messages(self, workers: int = 4, drain: bool = True) -> Dict[str, Any]:
+        """Deliver due messages; with drain=False, keep polling until cancelled"""
+        return await self.dispatcher.run(workers=workers, drain=drain)
+    
+    async def create_broadcast(self, tenant_id: str, broadcast_data: Dict[str, Any],
+                               created_by: Optional[str] = None) -> Dict[str, Any]:
+        """Send a template to every lead or user in a segment; runs in the background"""
+        return await self.broadcasts.create(
+            tenant_id, broadcast_data["template_id"], broadcast_data.get("audience", "leads"),
+            broadcast_data.get("segment"), broadcast_data.get("context"), broadcast_data.get("scheduled_for"),
+            created_by
+        )
+    
+    async def get_broadcast(self, tenant_id: str, broadcast_id: str) -> Optional[Dict[str, Any]]:
+        """Get a broadcast with its progress"""
+        return await self.broadcasts.get(tenant_id, broadcast_id)
+    
+    async def get_broadcasts(self, tenant_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get recent broadcasts"""
+        return await self.broadcasts.recent(tenant_id, limit)
+    
+    async def update_broadcast_status(self, tenant_id: str, broadcast_id: str, action: str) -> bool:
+        """Pause, resume or cancel a broadcast"""
+        return await self.broadcasts.set_status(tenant_id, broadcast_id, action)
+    
+    async def insert_with_notifications(self, tenant_id: str, collection: str, document: Dict[str, Any],
+                                        notifications: List[Dict[str, Any]]):
+        """Insert a record together with the notifications it triggers; they are sent in the background"""
+        await self.notifications.insert_with_notifications(tenant_id, collection, document, notifications)
+    
+    async def get_dispatch_stats(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get queue depth, delivery lag, throughput and dead-letter count"""
+        return await self.dispatcher.get_stats(tenant_id)
+    
+    async def get_dead_letters(self, tenant_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get messages that exhausted their retries or failed permanently"""
+        return await self.dispatcher.get_dead_letters(tenant_id, limit)
+    
+    async def requeue_dead_letter(self, tenant_id: str, dead_letter_id: str) -> bool:
+        """Retry a dead-lettered message from scratch"""
+        return await self.dispatcher.requeue_dead_letter(tenant_id, dead_letter_id)
+    
+    async def cancel_scheduled_actions(self, tenant_id: str, entity_type: str, entity_id: str) -> int:
+        """Cancel delayed workflow actions still pending for an entity"""
+        return await self.timers.cancel(tenant_id, entity_type, entity_id)
+    
     # Event Triggers
-    async def trigger_event(self, tenant_id: str, event: TriggerEvent, context: Dict[str, Any]):
-        """Trigger an event and execute associated workflows"""
-        # Get workflows for this event
-        workflows = await self.get_workflows(tenant_id, event.value)
+    async def publish_event(self, tenant_id: str, event: TriggerEvent, context: Dict[str, Any]):
+        """Queue an event for the background consumers; workflows run after the caller returns"""
+        await self.events.publish(tenant_id, event, context)
+    
+    async def trigger_event(self, tenant_id: str, event: TriggerEvent, context: Dict[str, Any],
+                            occurred_at: Optional[datetime] = None):
+        """Trigger an event and execute associated workflows; occurred_at is when a queued event was published"""
+        # Resolve workflows from the tenant's cached routing table
+        workflows = await self.router.route(tenant_id, getattr(event, "value", event), context)
         
         for workflow in workflows:
-            await self._execute_workflow(tenant_id, workflow, context)
+            await self._execute_workflow(tenant_id, workflow, context, occurred_at)
     
-    async def _execute_workflow(self, tenant_id: str, workflow: Dict[str, Any], context: Dict[str, Any]):
+    async def _execute_workflow(self, tenant_id: str, workflow: Dict[str, Any], context: Dict[str, Any],
+                                occurred_at: Optional[datetime] = None):
         """Execute a workflow"""
+        # One log document per run, written with its final state through the batching sink
+        started_at = datetime.utcnow()
+        log_entry = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "workflow_id": workflow["id"],
+            "trigger_event": workflow["trigger_event"],
+            "context": context,
+            "created_at": started_at
+        }
         try:
-            # Log workflow execution
-            log_entry = {
-                "id": f"log_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
-                "tenant_id": tenant_id,
-                "workflow_id": workflow["id"],
-                "trigger_event": workflow["trigger_event"],
-                "context": context,
-                "status": "started",
-                "created_at": datetime.utcnow()
-            }
-            await self.db.automation_logs.insert_one(log_entry)
-            
-            # Execute workflow actions
-            for action in workflow.get("actions", []):
-                await self._execute_action(tenant_id, action, context)
-            
-            # Update log status
-            await self.db.automation_logs.update_one(
-                {"id": log_entry["id"]},
-                {"$set": {"status": "completed", "completed_at": datetime.utcnow()}}
+            # Delayed actions wait in scheduled_actions; the rest are independent and run concurrently
+            actions = workflow.get("actions", [])
+            delayed = [action for action in actions if action.get("delay_minutes")]
+            await self.timers.schedule(tenant_id, workflow, delayed, context, triggered_at=occurred_at)
+            results = await asyncio.gather(
+                *[self._execute_action(tenant_id, action, context) for action in actions if action not in delayed],
+                return_exceptions=True
             )
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                raise errors[0]
+            log_entry["status"] = "completed"
+            log_entry["scheduled_actions"] = len(delayed)
             
         except Exception as e:
-            # Log error
-            await self.db.automation_logs.update_one(
-                {"id": log_entry["id"]},
-                {"$set": {"status": "failed", "error": str(e), "completed_at": datetime.utcnow()}}
-            )
+            log_entry["status"] = "failed"
+            log_entry["error"] = str(e)
+        
+        completed_at = datetime.utcnow()
+        log_entry["completed_at"] = completed_at
+        log_entry["duration_ms"] = int((completed_at - started_at).total_seconds() * 1000)
+        await self.automation_logs.record(log_entry)
     
     async def _execute_action(self, tenant_id: str, action: Dict[str, Any], context: Dict[str, Any]):
         """Execute a single workflow action"""
@@ -204,13 +360,13 @@ class CommunicationKernel(BaseKernel):
         
         if action_type == "send_message":
             template_id = action.get("template_id")
-            recipient = action.get("recipient", context.get("user_email"))
+            recipient = action.get("recipient") or context.get(action.get("recipient_field", "user_email"))
             
             if template_id and recipient:
                 rendered = await self.render_template(template_id, context)
                 
                 message_data = {
-                    "id": f"msg_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
+                    "id": str(uuid.uuid4()),
                     "channel": rendered["channel"],
                     "recipient": recipient,
                     "subject": rendered["subject"],
@@ -226,60 +382,62 @@ class CommunicationKernel(BaseKernel):
             entity_id = context.get(f"{entity_type}_id")
             new_status = action.get("status")
             
-            if entity_type and entity_id and new_status:
-                collection = getattr(self.db, f"{entity_type}s", None)
-                if collection:
-                    await collection.update_one(
-                        {"id": entity_id},
-                        {"$set": {"status": new_status, "updated_at": datetime.utcnow()}}
-                    )
+            if entity_id and new_status in ENTITY_STATUSES.get(entity_type, ()):
+                await self.db[f"{entity_type}s"].update_one(
+                    {"id": entity_id, "tenant_id": tenant_id},
+                    {"$set": {"status": new_status, "updated_at": datetime.utcnow()}}
+                )
         
         elif action_type == "webhook":
             # Queue webhook call
             webhook_url = action.get("url")
             if webhook_url:
                 webhook_data = {
-                    "id": f"hook_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}",
                     "channel": MessageChannel.WEBHOOK,
                     "url": webhook_url,
                     "payload": context,
-                    "method": action.get("method", "POST")
+                    "method": action.get("method", "POST"),
+                    # Batched webhooks to one endpoint are combined into a single {"events": [...]} POST
+                    "batch": bool(action.get("batch")),
+                    **({"signing_secret": action["secret"]} if action.get("secret") else {})
                 }
                 await self.queue_message(tenant_id, webhook_data)
     
     # Analytics and Reporting
     async def get_communication_stats(self, tenant_id: str, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
         """Get communication statistics"""
-        # Message delivery stats
-        total_messages = await self.db.message_queue.count_documents({
-            "tenant_id": tenant_id,
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        })
-        
-        delivered_messages = await self.db.message_queue.count_documents({
-            "tenant_id": tenant_id,
-            "created_at": {"$gte": start_date, "$lte": end_date},
-            "status": "delivered"
-        })
-        
-        failed_messages = await self.db.message_queue.count_documents({
-            "tenant_id": tenant_id,
-            "created_at": {"$gte": start_date, "$lte": end_date},
-            "status": "failed"
-        })
-        
-        # Workflow execution stats
-        workflow_executions = await self.db.automation_logs.count_documents({
-            "tenant_id": tenant_id,
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        })
-        
-        successful_workflows = await self.db.automation_logs.count_documents({
-            "tenant_id": tenant_id,
-            "created_at": {"$gte": start_date, "$lte": end_date},
-            "status": "completed"
+        # One grouped pass per collection instead of a count_documents scan per figure
+        match = {"tenant_id": tenant_id, "created_at": {"$gte": start_date, "$lte": end_date}}
+        group = [{"$match": match}, {"$group": {"_id": "$status", "count": {"$sum": 1}}}]
+        message_rows, workflow_rows = await asyncio.gather(
+            self.db.message_queue.aggregate(group).to_list(None),
+            self.db.automation_logs.aggregate(group).to_list(None)
+        )
+        messages = {row["_id"]: row["count"] for row in message_rows}
+        workflows = {row["_id"]: row["count"] for row in workflow_rows}
+        return self._stats_payload(start_date, end_date, {
+            "messages_total": sum(messages.values()),
+            "messages_delivered": messages.get("delivered", 0),
+            "messages_failed": messages.get("failed", 0),
+            "workflows_total": sum(workflows.values()),
+            "workflows_completed": workflows.get("completed", 0)
         })
-        
+    
+    async def get_communication_summary(self, tenant_id: str, days: int = 90) -> Dict[str, Any]:
+        """Statistics for the last `days` days (today included) read from the daily rollups"""
+        if days < 1 or days > 731:
+            raise ValueError("days must be between 1 and 731")
+        end_date = datetime.utcnow()
+        start_date = day_of(end_date) - timedelta(days=days - 1)
+        rollup = await self.rollups.read(tenant_id, start_date, end_date)
+        stats = self._stats_payload(start_date, end_date, rollup["totals"])
+        stats["daily"] = [{**doc, "day": doc["day"].date().isoformat()} for doc in rollup["daily"]]
+        return stats
+    
+    @staticmethod
+    def _stats_payload(start_date: datetime, end_date: datetime, counts: Dict[str, int]) -> Dict[str, Any]:
+        total_messages, delivered_messages = counts["messages_total"], counts["messages_delivered"]
+        workflow_executions, successful_workflows = counts["workflows_total"], counts["workflows_completed"]
         return {
             "period": {
                 "start_date": start_date.isoformat(),
@@ -288,7 +446,7 @@ class CommunicationKernel(BaseKernel):
             "messages": {
                 "total": total_messages,
                 "delivered": delivered_messages,
-                "failed": failed_messages,
+                "failed": counts["messages_failed"],
                 "delivery_rate": (delivered_messages / total_messages * 100) if total_messages > 0 else 0
             },
             "workflows": {
@@ -0,0 +1,163 @@
+"""
+Event Bus
+Non-blocking workflow triggers: a bounded in-process queue, a consumer pool and a durable outbox
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import uuid
+from pymongo import ReturnDocument
+
+
+class EventBus:
+    """Route handlers publish events; background consumers run the workflows"""
+
+    QUEUE_SIZE = 10000
+    CONSUMERS = 4
+    FLUSH_SECONDS = 10
+    RELAY_SECONDS = 2.0
+    RELAY_BATCH = 100
+    OUTBOX_LEASE_SECONDS = 300
+    MAX_ATTEMPTS = 5
+
+    def __init__(self, communication_kernel):
+        self.kernel = communication_kernel
+        self.db = communication_kernel.db
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: Dict[int, Dict[str, Any]] = {}
+        self._accepting = False
+        self.metrics = {"published": 0, "processed": 0, "failed": 0, "outboxed": 0, "relayed": 0}
+
+    # Publishing
+    async def publish(self, tenant_id: str, event: Any, context: Dict[str, Any]):
+        """Hand an event to the consumers without waiting for its workflows"""
+        envelope = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "event": getattr(event, "value", event),
+            "context": context,
+            "created_at": datetime.utcnow()
+        }
+        self.metrics["published"] += 1
+        if self._accepting:
+            try:
+                self._queue.put_nowait(envelope)
+                return
+            except asyncio.QueueFull:
+                pass
+        # Not running yet, shutting down, or overloaded: persist and let the relay deliver it
+        await self._to_outbox([envelope])
+
+    async def _to_outbox(self, envelopes: List[Dict[str, Any]], error: Optional[str] = None):
+        now = datetime.utcnow()
+        await self.db.event_outbox.insert_many([
+            {**envelope, "attempts": envelope.get("attempts", 0), "available_at": now,
+             **({"last_error": error} if error else {})}
+            for envelope in envelopes
+        ])
+        self.metrics["outboxed"] += len(envelopes)
+
+    # Lifecycle
+    async def start(self, consumers: Optional[int] = None):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._accepting = True
+        self._tasks = [asyncio.create_task(self._consume(index)) for index in range(consumers or self.CONSUMERS)]
+        self._tasks.append(asyncio.create_task(self._relay()))
+
+    async def stop(self):
+        """Stop accepting events, give queued ones FLUSH_SECONDS to run, then persist whatever is left"""
+        if not self._tasks:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), self.FLUSH_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        leftover = list(self._in_flight.values())
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait())
+        self._in_flight.clear()
+        if leftover:
+            await self._to_outbox(leftover, "Interrupted by shutdown")
+
+    # Consumers
+    async def _consume(self, index: int):
+        while True:
+            envelope = await self._queue.get()
+            self._in_flight[index] = envelope
+            try:
+                await self.kernel.trigger_event(envelope["tenant_id"], envelope["event"], envelope["context"],
+                                                envelope.get("created_at"))
+                self.metrics["processed"] += 1
+            except asyncio.CancelledError:
+                # Left in _in_flight so stop() persists it
+                raise
+            except Exception as e:
+                # Workflow failures are logged by the kernel; this is routing or database trouble, so retry later
+                self.metrics["failed"] += 1
+                print(f"⚠️  Event {envelope['event']} for tenant {envelope['tenant_id']} failed: {e}")
+                await self._to_outbox([{**envelope, "attempts": 1}], str(e))
+            self._in_flight.pop(index, None)
+            self._queue.task_done()
+
+    async def _relay(self):
+        """Run events from the durable outbox: overflow, failed attempts and events left by a shutdown"""
+        while True:
+            try:
+                if not await self.relay_once():
+                    await asyncio.sleep(self.RELAY_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Event outbox relay error: {e}")
+                await asyncio.sleep(self.RELAY_SECONDS)
+
+    async def relay_once(self) -> int:
+        """Claim and run one batch of outbox events; returns how many were claimed"""
+        claimed = []
+        for _ in range(self.RELAY_BATCH):
+            now = datetime.utcnow()
+            # Pushing available_at forward is the lease: a relay that dies leaves the event to be claimed again
+            envelope = await self.db.event_outbox.find_one_and_update(
+                {"available_at": {"$lte": now}, "attempts": {"$lt": self.MAX_ATTEMPTS}},
+                {"$set": {"available_at": now + timedelta(seconds=self.OUTBOX_LEASE_SECONDS)},
+                 "$inc": {"attempts": 1}},
+                sort=[("available_at", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not envelope:
+                break
+            claimed.append(envelope)
+
+        for envelope in claimed:
+            try:
+                await self.kernel.trigger_event(envelope["tenant_id"], envelope["event"], envelope["context"],
+                                                envelope.get("created_at"))
+            except Exception as e:
+                backoff = timedelta(seconds=30 * 2 ** (envelope["attempts"] - 1))
+                await self.db.event_outbox.update_one(
+                    {"_id": envelope["_id"]},
+                    {"$set": {"available_at": datetime.utcnow() + backoff, "last_error": str(e)}}
+                )
+                self.metrics["failed"] += 1
+                continue
+            await self.db.event_outbox.delete_one({"_id": envelope["_id"]})
+            self.metrics["relayed"] += 1
+        return len(claimed)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.metrics,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": bool(self._tasks),
+            "outbox_pending": await self.db.event_outbox.count_documents({"attempts": {"$lt": self.MAX_ATTEMPTS}}),
+            "outbox_dead": await self.db.event_outbox.count_documents({"attempts": {"$gte": self.MAX_ATTEMPTS}})
+        }
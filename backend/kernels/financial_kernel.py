@@ -4,21 +4,55 @@ Universal financial management and billing engine
 """
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
-from decimal import Decimal
+import uuid
+from bson.int64 import Int64
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import OperationFailure
 from kernels.base_kernel import BaseKernel
+from kernels.billing_run import BillingRunEngine, advance_billing_date
+from kernels.revenue_reports import RevenueReports
+from kernels.ledger import CustomerLedger
+from kernels.money import DEFAULT_CURRENCY, to_minor, multiply_minor
 
 
 class FinancialKernel(BaseKernel):
     """Universal financial management system"""
     
+    def __init__(self, db):
+        super().__init__(db)
+        self.billing = BillingRunEngine(self)
+        self.reports = RevenueReports(self)
+        self.ledger = CustomerLedger(self)
+    
     async def _initialize_kernel(self):
         """Initialize financial kernel"""
         # Ensure indexes exist
         await self.db.invoices.create_index([("tenant_id", 1), ("status", 1)])
+        await self.db.invoices.create_index([("tenant_id", 1), ("created_at", -1), ("id", -1)])
+        # Partial rather than sparse: a sparse compound index would still index legacy invoices by tenant_id
+        await self.db.invoices.create_index(
+            [("tenant_id", 1), ("invoice_number", 1)],
+            unique=True, partialFilterExpression={"invoice_number": {"$exists": True}}
+        )
+        await self.db.invoices.create_index([("tenant_id", 1), ("status", 1), ("created_at", -1)])
         await self.db.line_items.create_index([("tenant_id", 1), ("invoice_id", 1)])
+        await self.db.line_items.create_index("invoice_id")
         await self.db.transactions.create_index([("tenant_id", 1), ("transaction_date", -1)])
         await self.db.subscriptions.create_index([("tenant_id", 1), ("customer_id", 1)])
+        await self.db.subscriptions.create_index([("status", 1), ("next_billing_date", 1)])
+        # One invoice and one charge per subscription period, so billing reruns cannot double bill
+        await self.db.invoices.create_index("billing_key", unique=True, sparse=True)
+        await self.db.transactions.create_index("billing_key", unique=True, sparse=True)
+        await self.db.billing_runs.create_index("id", unique=True)
+        await self.db.invoices.create_index([("tenant_id", 1), ("status", 1), ("due_date", 1)])
+        await self.db.transactions.create_index([("tenant_id", 1), ("type", 1), ("transaction_date", 1)])
+        await self.db.revenue_daily.create_index([("tenant_id", 1), ("date", 1)], unique=True)
         await self.db.products.create_index([("tenant_id", 1), ("is_active", 1)])
+        # Statements stream a customer's entries in posting order; source_key makes reposting a no-op
+        await self.db.ledger_entries.create_index([("tenant_id", 1), ("customer_id", 1), ("ts", 1)])
+        await self.db.ledger_entries.create_index("ts")
+        await self.db.ledger_entries.create_index("source_key", unique=True, sparse=True)
+        await self.db.ledger_snapshots.create_index([("tenant_id", 1), ("customer_id", 1), ("as_of", -1)])
     
     async def validate_tenant_access(self, tenant_id: str, user_id: str) -> bool:
         """Validate user belongs to tenant"""
@@ -44,62 +78,177 @@ class FinancialKernel(BaseKernel):
         return products
     
     # Invoice Management
+    # Largest number of invoices accepted in one batch call
+    MAX_INVOICE_BATCH = 5000
+    
     async def create_invoice(self, tenant_id: str, customer_id: str, line_items: List[Dict[str, Any]], 
                            due_date: Optional[datetime] = None) -> Dict[str, Any]:
         """Create a new invoice"""
-        # Calculate totals
-        subtotal = sum(Decimal(str(item["quantity"])) * Decimal(str(item["unit_price"])) for item in line_items)
-        tax_amount = subtotal * Decimal("0.0")  # Default no tax, can be configured per tenant
-        total_amount = subtotal + tax_amount
-        
-        invoice_doc = {
-            "id": self._generate_invoice_id(),
-            "tenant_id": tenant_id,
-            "customer_id": customer_id,
-            "subtotal": float(subtotal),
-            "tax_amount": float(tax_amount),
-            "total_amount": float(total_amount),
-            "status": "draft",
-            "due_date": due_date or (datetime.utcnow() + timedelta(days=30)),
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        
-        await self.db.invoices.insert_one(invoice_doc)
+        invoices = await self.create_invoices(tenant_id, [
+            {"customer_id": customer_id, "line_items": line_items, "due_date": due_date}
+        ])
+        return invoices[0]
+    
+    async def create_invoices(self, tenant_id: str, invoices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Create many invoices with two bulk inserts and one block of invoice numbers"""
+        if not invoices:
+            return []
+        if len(invoices) > self.MAX_INVOICE_BATCH:
+            raise ValueError(f"At most {self.MAX_INVOICE_BATCH} invoices per batch")
         
-        # Create line items
-        for item in line_items:
-            line_item_doc = {
-                **item,
-                "id": f"li_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{len(line_items)}",
+        first_number = await self._allocate_invoice_numbers(tenant_id, len(invoices))
+        invoice_docs, line_item_docs = self._build_invoice_docs(tenant_id, invoices, first_number)
+        await self._insert_invoice_batch(invoice_docs, line_item_docs)
+        await self.ledger.post_invoices(invoice_docs)
+        return invoice_docs
+    
+    def _build_invoice_docs(self, tenant_id: str, invoices: List[Dict[str, Any]], first_number: int):
+        """Build invoice and line item documents, numbering invoices from first_number"""
+        now = datetime.utcnow()
+        invoice_docs, line_item_docs = [], []
+        for number, invoice in enumerate(invoices, start=first_number):
+            currency = invoice.get("currency") or DEFAULT_CURRENCY
+            # Calculate totals in integer minor units
+            unit_prices = [self._unit_price_minor(item, currency) for item in invoice["line_items"]]
+            line_totals = [
+                multiply_minor(unit_price, item.get("quantity", 1))
+                for item, unit_price in zip(invoice["line_items"], unit_prices)
+            ]
+            subtotal = sum(line_totals)
+            tax = 0  # Default no tax, can be configured per tenant
+            
+            invoice_doc = {
+                **{key: value for key, value in invoice.items() if key not in ("line_items", "due_date")},
+                "id": str(uuid.uuid4()),
+                "invoice_number": self._format_invoice_number(number),
                 "tenant_id": tenant_id,
-                "invoice_id": invoice_doc["id"],
-                "line_total": float(Decimal(str(item["quantity"])) * Decimal(str(item["unit_price"]))),
-                "created_at": datetime.utcnow()
+                "customer_id": invoice["customer_id"],
+                "currency": currency,
+                "subtotal_minor": Int64(subtotal),
+                "tax_minor": Int64(tax),
+                "total_minor": Int64(subtotal + tax),
+                "status": "draft",
+                "due_date": invoice.get("due_date") or (now + timedelta(days=30)),
+                "created_at": now,
+                "updated_at": now
             }
-            await self.db.line_items.insert_one(line_item_doc)
-        
-        return invoice_doc
+            invoice_docs.append(invoice_doc)
+            
+            for item, unit_price, line_total in zip(invoice["line_items"], unit_prices, line_totals):
+                line_item_docs.append({
+                    **{key: value for key, value in item.items() if key != "unit_price"},
+                    "id": str(uuid.uuid4()),
+                    "tenant_id": tenant_id,
+                    "invoice_id": invoice_doc["id"],
+                    "unit_price_minor": Int64(unit_price),
+                    "line_total_minor": Int64(line_total),
+                    "created_at": now
+                })
+        return invoice_docs, line_item_docs
     
-    def _generate_invoice_id(self) -> str:
-        """Generate unique invoice ID"""
-        timestamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
-        return f"INV-{timestamp}"
+    @staticmethod
+    def _unit_price_minor(item: Dict[str, Any], currency: str) -> int:
+        """Line item prices arrive either already in minor units or as major-unit amounts from the API"""
+        if item.get("unit_price_minor") is not None:
+            return int(item["unit_price_minor"])
+        return to_minor(item["unit_price"], currency)
     
-    async def get_invoices(self, tenant_id: str, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    async def _allocate_invoice_numbers(self, tenant_id: str, count: int) -> int:
+        """Reserve a contiguous block of per-tenant invoice numbers and return the first"""
+        counter = await self.db.counters.find_one_and_update(
+            {"_id": f"invoice:{tenant_id}"},
+            {"$inc": {"value": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return counter["value"] - count + 1
+    
+    @staticmethod
+    def _format_invoice_number(number: int) -> str:
+        return f"INV-{number:06d}"
+    
+    async def _insert_invoice_batch(self, invoice_docs: List[Dict[str, Any]], line_item_docs: List[Dict[str, Any]]):
+        """Write a batch of invoices and line items in one transaction where the server supports it"""
+        try:
+            async with await self.db.client.start_session() as session:
+                async with session.start_transaction():
+                    await self.db.invoices.insert_many(invoice_docs, session=session)
+                    if line_item_docs:
+                        await self.db.line_items.insert_many(line_item_docs, session=session)
+            return
+        except OperationFailure as e:
+            # Standalone servers reject transactions (IllegalOperation); anything else is a real failure
+            if e.code != 20:
+                raise
+        
+        invoice_ids = [invoice_doc["id"] for invoice_doc in invoice_docs]
+        try:
+            await self.db.invoices.insert_many(invoice_docs)
+            if line_item_docs:
+                await self.db.line_items.insert_many(line_item_docs)
+        except Exception:
+            # Without a transaction, undo whatever part of the batch landed
+            await self.db.line_items.delete_many({"invoice_id": {"$in": invoice_ids}})
+            await self.db.invoices.delete_many({"id": {"$in": invoice_ids}})
+            raise
+    
+    async def get_invoices(self, tenant_id: str, filters: Optional[Dict[str, Any]] = None,
+                           include_line_items: bool = True, limit: int = 1000) -> List[Dict[str, Any]]:
         """Get invoices for tenant"""
+        page = await self.get_invoice_page(tenant_id, filters, include_line_items=include_line_items, limit=limit)
+        return page["invoices"]
+    
+    async def get_invoice_page(self, tenant_id: str, filters: Optional[Dict[str, Any]] = None,
+                               status: Optional[str] = None, date_from: Optional[datetime] = None,
+                               date_to: Optional[datetime] = None, after: Optional[str] = None,
+                               include_line_items: bool = True, limit: int = 100) -> Dict[str, Any]:
+        """Get one page of invoices, newest first, with line items attached in a single batched query"""
         query = {"tenant_id": tenant_id}
         if filters:
             query.update(filters)
+        if status:
+            query["status"] = status
+        if date_from or date_to:
+            query["created_at"] = {
+                **({"$gte": date_from} if date_from else {}),
+                **({"$lt": date_to} if date_to else {})
+            }
+        if after:
+            # Keyset cursor: continue strictly after the last (created_at, id) already returned
+            created_at, invoice_id = self._decode_invoice_cursor(after)
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "id": {"$lt": invoice_id}}
+            ]
         
-        invoices = await self.db.invoices.find(query).sort("created_at", -1).to_list(1000)
+        invoices = await self.db.invoices.find(query, {"_id": 0}).sort(
+            [("created_at", -1), ("id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        has_more = len(invoices) > limit
+        invoices = invoices[:limit]
         
-        # Attach line items to each invoice
-        for invoice in invoices:
-            line_items = await self.db.line_items.find({"invoice_id": invoice["id"]}).to_list(100)
-            invoice["line_items"] = line_items
+        if include_line_items and invoices:
+            by_invoice = {invoice["id"]: [] for invoice in invoices}
+            async for line_item in self.db.line_items.find(
+                {"tenant_id": tenant_id, "invoice_id": {"$in": list(by_invoice)}}, {"_id": 0}
+            ):
+                by_invoice[line_item["invoice_id"]].append(line_item)
+            for invoice in invoices:
+                invoice["line_items"] = by_invoice[invoice["id"]]
         
-        return invoices
+        last = invoices[-1] if has_more else None
+        return {
+            "invoices": invoices,
+            "next_cursor": f"{last['created_at'].isoformat()}|{last['id']}" if last else None
+        }
+    
+    @staticmethod
+    def _decode_invoice_cursor(cursor: str):
+        created_at, _, invoice_id = cursor.partition("|")
+        try:
+            return datetime.fromisoformat(created_at), invoice_id
+        except ValueError:
+            raise ValueError("Invalid invoice cursor")
     
     async def update_invoice_status(self, invoice_id: str, status: str) -> bool:
         """Update invoice status"""
@@ -107,24 +256,47 @@ class FinancialKernel(BaseKernel):
         if status not in valid_statuses:
             raise ValueError(f"Invalid status. Must be one of: {valid_statuses}")
         
-        result = await self.db.invoices.update_one(
+        previous = await self.db.invoices.find_one_and_update(
             {"id": invoice_id},
-            {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+            projection={"_id": 0, "tenant_id": 1, "customer_id": 1, "status": 1, "total_minor": 1,
+                        "currency": 1, "created_at": 1}
         )
-        return result.modified_count > 0
+        if not previous:
+            return False
+        
+        await self.ledger.post_invoice_status({**previous, "id": invoice_id}, previous.get("status"), status)
+        
+        # Keep the daily revenue rollups in step with invoices entering or leaving "paid"
+        if (previous.get("status") == "paid") != (status == "paid"):
+            await self.reports.record_invoice_paid(previous["tenant_id"], previous, 1 if status == "paid" else -1)
+        return True
     
     # Transaction Management
     async def create_transaction(self, tenant_id: str, transaction_data: Dict[str, Any]) -> Dict[str, Any]:
         """Record a new transaction"""
+        currency = transaction_data.get("currency") or DEFAULT_CURRENCY
         transaction_doc = {
-            **transaction_data,
+            **{key: value for key, value in transaction_data.items() if key != "amount"},
             "tenant_id": tenant_id,
+            "currency": currency,
+            "amount_minor": self._amount_minor(transaction_data, currency),
             "transaction_date": transaction_data.get("transaction_date", datetime.utcnow()),
             "created_at": datetime.utcnow()
         }
         await self.db.transactions.insert_one(transaction_doc)
+        if transaction_doc.get("type") == "payment":
+            await self.reports.record_payment(tenant_id, transaction_doc)
+        await self.ledger.post_transaction(transaction_doc)
         return transaction_doc
     
+    @staticmethod
+    def _amount_minor(data: Dict[str, Any], currency: str) -> Int64:
+        """Accept amount_minor as given, or convert a major-unit amount at the edge"""
+        if data.get("amount_minor") is not None:
+            return Int64(data["amount_minor"])
+        return Int64(to_minor(data.get("amount", 0), currency))
+    
     async def get_transactions(self, tenant_id: str, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Get transactions for tenant"""
         query = {"tenant_id": tenant_id}
@@ -137,13 +309,24 @@ class FinancialKernel(BaseKernel):
     # Subscription Management
     async def create_subscription(self, tenant_id: str, subscription_data: Dict[str, Any]) -> Dict[str, Any]:
         """Create a recurring subscription"""
+        start_date = subscription_data.get("start_date", datetime.utcnow())
+        billing_interval = subscription_data.get("billing_interval", "monthly")
+        # Validates the interval before anything is stored
+        advance_billing_date(start_date, billing_interval)
+        currency = subscription_data.get("currency") or DEFAULT_CURRENCY
         subscription_doc = {
-            **subscription_data,
+            **{key: value for key, value in subscription_data.items() if key != "amount"},
+            "id": subscription_data.get("id") or str(uuid.uuid4()),
             "tenant_id": tenant_id,
+            "currency": currency,
             "status": "active",
+            "billing_interval": billing_interval,
+            "billing_anchor_day": start_date.day,
             "created_at": datetime.utcnow(),
-            "next_billing_date": subscription_data.get("start_date", datetime.utcnow())
+            "next_billing_date": start_date
         }
+        if "amount" in subscription_data or "amount_minor" in subscription_data:
+            subscription_doc["amount_minor"] = self._amount_minor(subscription_data, currency)
         await self.db.subscriptions.insert_one(subscription_doc)
         return subscription_doc
     
@@ -156,51 +339,94 @@ class FinancialKernel(BaseKernel):
         subscriptions = await self.db.subscriptions.find(query).to_list(1000)
         return subscriptions
     
-    # Financial Reports
-    async def get_revenue_report(self, tenant_id: str, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
-        """Generate revenue report"""
-        # Get paid invoices in date range
-        paid_invoices = await self.db.invoices.find({
-            "tenant_id": tenant_id,
-            "status": "paid",
-            "created_at": {"$gte": start_date, "$lte": end_date}
-        }).to_list(1000)
-        
-        total_revenue = sum(invoice["total_amount"] for invoice in paid_invoices)
-        invoice_count = len(paid_invoices)
-        
-        # Get transactions for the period
-        transactions = await self.db.transactions.find({
-            "tenant_id": tenant_id,
-            "transaction_date": {"$gte": start_date, "$lte": end_date},
-            "type": "payment"
-        }).to_list(1000)
+    async def run_subscription_billing(self, as_of: Optional[datetime] = None, tenant_id: Optional[str] = None,
+                                       run_id: Optional[str] = None) -> Dict[str, Any]:
+        """Invoice every subscription due by as_of and advance its next billing date"""
+        return await self.billing.run(as_of, tenant_id, run_id)
+    
+    # Money Migration
+    # Legacy float fields -> integer minor-unit fields, per collection
+    MONEY_FIELDS = {
+        "invoices": {"subtotal": "subtotal_minor", "tax_amount": "tax_minor", "total_amount": "total_minor"},
+        "line_items": {"unit_price": "unit_price_minor", "line_total": "line_total_minor"},
+        "transactions": {"amount": "amount_minor"},
+        "subscriptions": {"amount": "amount_minor"}
+    }
+    
+    async def migrate_money_to_minor_units(self, batch_size: int = 1000) -> Dict[str, int]:
+        """Rewrite float amounts stored by earlier versions as int64 minor units; safe to rerun"""
+        migrated = {}
+        for collection_name, fields in self.MONEY_FIELDS.items():
+            collection = self.db[collection_name]
+            query = {"$or": [{legacy: {"$exists": True}} for legacy in fields]}
+            projection = {"_id": 1, "currency": 1, "invoice_id": 1, "tenant_id": 1, **{legacy: 1 for legacy in fields}}
+            migrated[collection_name] = 0
+            while True:
+                # Migrated documents no longer match, so each pass reads the next batch from the start
+                documents = await collection.find(query, projection).limit(batch_size).to_list(batch_size)
+                if not documents:
+                    break
+                currencies = await self._legacy_currencies(collection_name, documents)
+                operations = []
+                for document in documents:
+                    currency = currencies.get(document["_id"]) or DEFAULT_CURRENCY
+                    converted = {
+                        minor: Int64(to_minor(document[legacy], currency))
+                        for legacy, minor in fields.items() if document.get(legacy) is not None
+                    }
+                    operations.append(UpdateOne(
+                        {"_id": document["_id"]},
+                        {"$set": {**converted, **({} if collection_name == "line_items" else {"currency": currency})},
+                         "$unset": {legacy: "" for legacy in fields}}
+                    ))
+                await collection.bulk_write(operations, ordered=False)
+                migrated[collection_name] += len(operations)
         
-        return {
-            "period": {
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat()
-            },
-            "total_revenue": total_revenue,
-            "invoice_count": invoice_count,
-            "average_invoice_value": total_revenue / invoice_count if invoice_count > 0 else 0,
-            "transaction_count": len(transactions)
+        # Rollups hold sums of the old fields; drop them so reports rebuild from the migrated documents
+        await self.db.revenue_daily.delete_many({})
+        await self.db.revenue_rollup_state.delete_many({})
+        # Invoices from before the ledger need their opening entries, or later status changes credit nothing
+        migrated["ledger_entries"] = await self.ledger.backfill_invoices(batch_size)
+        return migrated
+    
+    async def _legacy_currencies(self, collection_name: str, documents: List[Dict[str, Any]]) -> Dict[Any, str]:
+        """Currency per document; line items take their invoice's currency"""
+        if collection_name != "line_items":
+            return {document["_id"]: document.get("currency") for document in documents}
+        invoice_ids = list({document["invoice_id"] for document in documents if document.get("invoice_id")})
+        invoice_currencies = {
+            invoice["id"]: invoice.get("currency")
+            async for invoice in self.db.invoices.find(
+                {"id": {"$in": invoice_ids}}, {"_id": 0, "id": 1, "currency": 1}
+            )
         }
+        return {document["_id"]: invoice_currencies.get(document.get("invoice_id")) for document in documents}
     
-    async def get_outstanding_balance(self, tenant_id: str) -> Dict[str, Any]:
-        """Get outstanding balance from unpaid invoices"""
-        unpaid_invoices = await self.db.invoices.find({
-            "tenant_id": tenant_id,
-            "status": {"$in": ["sent", "overdue"]}
-        }).to_list(1000)
-        
-        total_outstanding = sum(invoice["total_amount"] for invoice in unpaid_invoices)
-        overdue_invoices = [inv for inv in unpaid_invoices if inv.get("due_date", datetime.utcnow()) < datetime.utcnow()]
-        overdue_amount = sum(invoice["total_amount"] for invoice in overdue_invoices)
-        
-        return {
-            "total_outstanding": total_outstanding,
-            "overdue_amount": overdue_amount,
-            "unpaid_invoice_count": len(unpaid_invoices),
-            "overdue_invoice_count": len(overdue_invoices)
-        }
\ No newline at end of file
+    # Financial Reports
+    async def get_revenue_report(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                                 group_by: str = "month") -> Dict[str, Any]:
+        """Generate revenue report"""
+        return await self.reports.revenue_report(tenant_id, start_date, end_date, group_by)
+    
+    async def get_outstanding_balance(self, tenant_id: str, as_of: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get outstanding balance from unpaid invoices, with aging buckets"""
+        return await self.reports.outstanding_balance(tenant_id, as_of)
+    
+    async def rebuild_revenue_rollups(self, tenant_id: str) -> int:
+        """Recompute a tenant's daily revenue rollups from scratch"""
+        return await self.reports.rebuild_rollups(tenant_id)
+    
+    # Customer Ledger
+    async def get_customer_balance(self, tenant_id: str, customer_id: str,
+                                   as_of: Optional[datetime] = None) -> Dict[str, Any]:
+        """Get a customer's balance from the latest snapshot plus newer ledger entries"""
+        return await self.ledger.balance(tenant_id, customer_id, as_of)
+    
+    async def get_customer_statement(self, tenant_id: str, customer_id: str, start_date: datetime,
+                                     end_date: datetime) -> Dict[str, Any]:
+        """Get a customer's ledger entries for a period with opening, running and closing balances"""
+        return await self.ledger.statement(tenant_id, customer_id, start_date, end_date)
+    
+    async def take_balance_snapshots(self) -> int:
+        """Snapshot the balance of every customer with new ledger entries"""
+        return await self.ledger.take_snapshots()
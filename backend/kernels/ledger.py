@@ -0,0 +1,236 @@
+"""
+Customer Ledger
+Append-only per-customer ledger with periodic balance snapshots
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import uuid
+from bson.int64 import Int64
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+
+# Amounts are signed minor units: positive means the customer owes more, negative means they owe less
+# Invoice statuses that take the invoice off the customer's balance, and the entry each one posts
+INVOICE_STATUS_ENTRIES = {
+    "paid": ("invoice_paid", -1),
+    "cancelled": ("invoice_cancelled", -1)
+}
+TRANSACTION_SIGNS = {"payment": -1, "credit": -1, "refund": 1}
+
+
+class CustomerLedger:
+    """Balances and statements without rescanning a customer's whole history"""
+
+    # Entries newer than this are left out of a snapshot so writes still in flight land in the next one
+    SNAPSHOT_LAG_SECONDS = 60
+
+    def __init__(self, financial_kernel):
+        self.kernel = financial_kernel
+        self.db = financial_kernel.db
+
+    # Posting
+    def invoice_entry(self, invoice_doc: Dict[str, Any]) -> Dict[str, Any]:
+        return self._entry(
+            invoice_doc["tenant_id"], invoice_doc["customer_id"], "invoice", invoice_doc["total_minor"],
+            invoice_doc.get("currency"), invoice_id=invoice_doc["id"],
+            source_key=f"invoice:{invoice_doc['id']}", effective_date=invoice_doc["created_at"]
+        )
+
+    async def post_invoices(self, invoice_docs: List[Dict[str, Any]]):
+        """Post new invoices; reposting an invoice that already has an entry is a no-op"""
+        await self.append([
+            self.invoice_entry(invoice_doc) for invoice_doc in invoice_docs if invoice_doc.get("customer_id")
+        ])
+
+    async def post_invoice_status(self, invoice: Dict[str, Any], previous_status: Optional[str], status: str):
+        """Post the balance effect of an invoice moving between statuses"""
+        entries = []
+        # Leaving paid/cancelled puts the amount back on the account; entering one takes it off
+        if previous_status in INVOICE_STATUS_ENTRIES and previous_status != status:
+            entry_type, sign = INVOICE_STATUS_ENTRIES[previous_status]
+            entries.append((f"{entry_type}_reversed", -sign))
+        if status in INVOICE_STATUS_ENTRIES and previous_status != status:
+            entries.append(INVOICE_STATUS_ENTRIES[status])
+        if entries and invoice.get("customer_id"):
+            # The invoice's own entry goes first: an invoice from before the ledger has none yet, and
+            # its source_key makes this a no-op for every other invoice
+            await self.append([self.invoice_entry(invoice)] + [
+                self._entry(invoice["tenant_id"], invoice["customer_id"], entry_type, sign * invoice["total_minor"],
+                            invoice.get("currency"), invoice_id=invoice["id"])
+                for entry_type, sign in entries
+            ])
+
+    async def backfill_invoices(self, batch_size: int = 1000) -> int:
+        """Post invoices created before the ledger, with the entry for their current paid/cancelled status"""
+        posted = 0
+        batch = []
+        cursor = self.db.invoices.find(
+            {"customer_id": {"$nin": [None, ""]}, "total_minor": {"$exists": True}},
+            {"_id": 0, "id": 1, "tenant_id": 1, "customer_id": 1, "status": 1, "total_minor": 1, "currency": 1,
+             "created_at": 1, "updated_at": 1}
+        ).batch_size(batch_size)
+        async for invoice in cursor:
+            batch.append(invoice)
+            if len(batch) >= batch_size:
+                posted += await self._backfill_batch(batch)
+                batch = []
+        if batch:
+            posted += await self._backfill_batch(batch)
+        return posted
+
+    async def _backfill_batch(self, invoices: List[Dict[str, Any]]) -> int:
+        # Invoices already on the ledger carry their status history there; only the rest are posted
+        posted_keys = set(await self.db.ledger_entries.distinct(
+            "source_key", {"source_key": {"$in": [f"invoice:{invoice['id']}" for invoice in invoices]}}
+        ))
+        entries = []
+        for invoice in invoices:
+            if f"invoice:{invoice['id']}" in posted_keys:
+                continue
+            entries.append(self.invoice_entry(invoice))
+            if invoice.get("status") in INVOICE_STATUS_ENTRIES:
+                entry_type, sign = INVOICE_STATUS_ENTRIES[invoice["status"]]
+                entries.append(self._entry(
+                    invoice["tenant_id"], invoice["customer_id"], entry_type, sign * invoice["total_minor"],
+                    invoice.get("currency"), source_key=f"{entry_type}:{invoice['id']}",
+                    effective_date=invoice.get("updated_at") or invoice["created_at"], invoice_id=invoice["id"]
+                ))
+        await self.append(entries)
+        return len(entries)
+
+    async def post_transaction(self, transaction_doc: Dict[str, Any]):
+        """Post payments, credits and refunds not tied to an invoice (invoice payments post via the invoice status)"""
+        sign = TRANSACTION_SIGNS.get(transaction_doc.get("type"))
+        if not sign or not transaction_doc.get("customer_id") or transaction_doc.get("invoice_id"):
+            return
+        await self.append([self._entry(
+            transaction_doc["tenant_id"], transaction_doc["customer_id"], transaction_doc["type"],
+            sign * transaction_doc["amount_minor"], transaction_doc.get("currency"),
+            transaction_id=transaction_doc.get("id"), effective_date=transaction_doc["transaction_date"]
+        )])
+
+    def _entry(self, tenant_id: str, customer_id: str, entry_type: str, amount_minor: int,
+               currency: Optional[str], source_key: Optional[str] = None,
+               effective_date: Optional[datetime] = None, **references) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        entry = {
+            "id": str(uuid.uuid4()),
+            "tenant_id": tenant_id,
+            "customer_id": customer_id,
+            # ts is the posting time, so entries only ever append to the end of a customer's history
+            "ts": now,
+            "effective_date": effective_date or now,
+            "type": entry_type,
+            "amount_minor": Int64(amount_minor),
+            "currency": currency,
+            **{key: value for key, value in references.items() if value}
+        }
+        if source_key:
+            entry["source_key"] = source_key
+        return entry
+
+    async def append(self, entries: List[Dict[str, Any]]):
+        """Insert entries, skipping any whose source_key was already posted"""
+        if not entries:
+            return
+        try:
+            await self.db.ledger_entries.bulk_write([InsertOne(entry) for entry in entries], ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+
+    # Balances
+    async def balance(self, tenant_id: str, customer_id: str, as_of: Optional[datetime] = None) -> Dict[str, Any]:
+        """Balance at as_of (default now): latest snapshot plus the entries posted since"""
+        as_of = as_of or datetime.utcnow()
+        snapshot = await self.db.ledger_snapshots.find_one(
+            {"tenant_id": tenant_id, "customer_id": customer_id, "as_of": {"$lte": as_of}},
+            {"_id": 0, "as_of": 1, "balance_minor": 1, "currency": 1},
+            sort=[("as_of", -1)]
+        )
+        since = snapshot["as_of"] if snapshot else None
+        delta = await self._sum_entries(tenant_id, customer_id, since, as_of)
+        return {
+            "customer_id": customer_id,
+            "as_of": as_of,
+            "balance_minor": (snapshot["balance_minor"] if snapshot else 0) + delta["amount_minor"],
+            "currency": (snapshot or {}).get("currency") or delta["currency"],
+            "entries_since_snapshot": delta["count"]
+        }
+
+    async def _sum_entries(self, tenant_id: str, customer_id: str, after: Optional[datetime],
+                           until: datetime) -> Dict[str, Any]:
+        ts = {"$lte": until, **({"$gt": after} if after else {})}
+        result = await self.db.ledger_entries.aggregate([
+            {"$match": {"tenant_id": tenant_id, "customer_id": customer_id, "ts": ts}},
+            {"$group": {"_id": None, "amount": {"$sum": "$amount_minor"}, "count": {"$sum": 1},
+                        "currency": {"$last": "$currency"}}}
+        ]).to_list(1)
+        row = result[0] if result else {"amount": 0, "count": 0, "currency": None}
+        return {"amount_minor": row["amount"], "count": row["count"], "currency": row["currency"]}
+
+    async def take_snapshots(self) -> int:
+        """Snapshot every customer with entries posted since the previous snapshot run"""
+        as_of = datetime.utcnow() - timedelta(seconds=self.SNAPSHOT_LAG_SECONDS)
+        state = await self.db.counters.find_one({"_id": "ledger_snapshots"}) or {}
+        since = state.get("as_of")
+
+        deltas = await self.db.ledger_entries.aggregate([
+            {"$match": {"ts": {"$lte": as_of, **({"$gt": since} if since else {})}}},
+            {"$group": {"_id": {"tenant_id": "$tenant_id", "customer_id": "$customer_id"},
+                        "amount": {"$sum": "$amount_minor"}, "currency": {"$last": "$currency"}}}
+        ]).to_list(None)
+
+        # A customer's latest snapshot is from the last run that saw activity for them, so it plus
+        # this run's delta is their balance; fetch all of them in one aggregation
+        previous = {}
+        if deltas:
+            async for row in self.db.ledger_snapshots.aggregate([
+                {"$match": {"customer_id": {"$in": list({delta["_id"]["customer_id"] for delta in deltas})}}},
+                {"$sort": {"as_of": -1}},
+                {"$group": {"_id": {"tenant_id": "$tenant_id", "customer_id": "$customer_id"},
+                            "balance": {"$first": "$balance_minor"}}}
+            ]):
+                previous[(row["_id"]["tenant_id"], row["_id"]["customer_id"])] = row["balance"]
+
+        now = datetime.utcnow()
+        snapshots = [
+            {
+                "tenant_id": delta["_id"]["tenant_id"],
+                "customer_id": delta["_id"]["customer_id"],
+                "as_of": as_of,
+                "balance_minor": Int64(
+                    previous.get((delta["_id"]["tenant_id"], delta["_id"]["customer_id"]), 0) + delta["amount"]
+                ),
+                "currency": delta["currency"],
+                "created_at": now
+            }
+            for delta in deltas
+        ]
+        if snapshots:
+            await self.db.ledger_snapshots.insert_many(snapshots, ordered=False)
+        await self.db.counters.update_one({"_id": "ledger_snapshots"}, {"$set": {"as_of": as_of}}, upsert=True)
+        return len(snapshots)
+
+    # Statements
+    async def statement(self, tenant_id: str, customer_id: str, start_date: datetime, end_date: datetime,
+                        limit: int = 500) -> Dict[str, Any]:
+        """Entries posted in [start_date, end_date) with running balances, streamed in ts order"""
+        opening = await self.balance(tenant_id, customer_id, start_date - timedelta(microseconds=1))
+        running = opening["balance_minor"]
+        entries = []
+        async for entry in self.db.ledger_entries.find(
+            {"tenant_id": tenant_id, "customer_id": customer_id, "ts": {"$gte": start_date, "$lt": end_date}},
+            {"_id": 0}
+        ).sort("ts", 1).limit(limit):
+            running += entry["amount_minor"]
+            entries.append({**entry, "balance_minor": running})
+        return {
+            "customer_id": customer_id,
+            "opening_balance_minor": opening["balance_minor"],
+            "closing_balance_minor": running,
+            "currency": opening["currency"],
+            "entries": entries,
+            "truncated": len(entries) == limit
+        }
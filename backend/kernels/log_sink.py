@@ -0,0 +1,71 @@
+"""
+Log Sink
+Buffered, batched writes for high-volume execution logs
+"""
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import asyncio
+
+
+class LogSink:
+    """Buffers log records and writes them with insert_many every FLUSH_MS or MAX_BATCH records"""
+
+    FLUSH_MS = 500
+    MAX_BATCH = 500
+    # Records kept while the database is unreachable; beyond this the oldest are dropped
+    MAX_PENDING = 20000
+
+    def __init__(self, collection, on_flush: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None):
+        self.collection = collection
+        self.on_flush = on_flush
+        self._buffer: List[Dict[str, Any]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.metrics = {"recorded": 0, "written": 0, "flushes": 0, "dropped": 0}
+
+    async def record(self, entry: Dict[str, Any]):
+        self._buffer.append(entry)
+        self.metrics["recorded"] += 1
+        # Without the background flusher (scripts, tests) records are written straight away
+        if self._task is None or len(self._buffer) >= self.MAX_BATCH:
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._buffer:
+                batch, self._buffer = self._buffer[:self.MAX_BATCH], self._buffer[self.MAX_BATCH:]
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+                except Exception as e:
+                    # Keep the batch for the next flush rather than fail the workflow that logged it
+                    self._buffer = batch + self._buffer
+                    overflow = len(self._buffer) - self.MAX_PENDING
+                    if overflow > 0:
+                        del self._buffer[:overflow]
+                        self.metrics["dropped"] += overflow
+                    print(f"⚠️  Log flush to {self.collection.name} failed: {e}")
+                    return
+                self.metrics["written"] += len(batch)
+                self.metrics["flushes"] += 1
+                if self.on_flush:
+                    try:
+                        await self.on_flush(batch)
+                    except Exception as e:
+                        print(f"⚠️  Log flush hook for {self.collection.name} failed: {e}")
+
+    async def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write everything still buffered"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_MS / 1000)
+            if self._buffer:
+                await self.flush()
@@ -0,0 +1,266 @@
+"""
+Message Dispatcher
+Drains message_queue: fair per-tenant lanes, atomic claims with leases, retries with backoff, dead letters
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from pymongo import ReturnDocument, UpdateOne
+from kernels.channel_adapters import ChannelAdapter, PermanentDeliveryError, adapters_from_env
+from kernels.message_scheduler import FairScheduler
+
+
+# Queue fields a dead letter does not copy: lease bookkeeping, and webhook secrets that the
+# dead-letter listing would otherwise hand to any tenant user (requeueing uses the queued original)
+DEAD_LETTER_OMIT = ("_id", "claimed_by", "lease_expires_at", "signing_secret")
+
+
+class MessageDispatcher:
+    """Delivers queued messages through pluggable channel adapters"""
+
+    BATCH_SIZE = 50
+    LEASE_SECONDS = 120
+    BACKOFF_SECONDS = 30
+    MAX_BACKOFF_SECONDS = 3600
+    IDLE_SECONDS = 1.0
+    # Leases of crashed workers are reclaimed this often while the dispatcher runs
+    RECLAIM_SECONDS = LEASE_SECONDS / 4
+    THROUGHPUT_WINDOW_SECONDS = 60
+
+    def __init__(self, communication_kernel, adapters: Optional[Dict[str, ChannelAdapter]] = None):
+        self.kernel = communication_kernel
+        self.db = communication_kernel.db
+        self.adapters = adapters
+        self.metrics = {"claimed": 0, "delivered": 0, "retried": 0, "dead_lettered": 0}
+        self._started = None
+        self._next_reclaim = 0.0
+        self.scheduler = FairScheduler(self)
+
+    def register_adapter(self, channel: str, adapter: ChannelAdapter):
+        if self.adapters is None:
+            self.adapters = {}
+        self.adapters[channel] = adapter
+
+    # Worker loop
+    async def run(self, workers: int = 4, stop: Optional[asyncio.Event] = None, drain: bool = False) -> Dict[str, Any]:
+        """Run workers until stop is set, or with drain=True until nothing is due"""
+        if self.adapters is None:
+            self.adapters = adapters_from_env()
+        self._started = self._started or time.perf_counter()
+        stop = stop or asyncio.Event()
+        worker_prefix = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        async def worker(index: int):
+            worker_id = f"{worker_prefix}:{index}"
+            while not stop.is_set():
+                if time.monotonic() >= self._next_reclaim:
+                    # Set before awaiting so only one worker reclaims per interval
+                    self._next_reclaim = time.monotonic() + self.RECLAIM_SECONDS
+                    await self.reclaim_expired_leases()
+                lane = await self.scheduler.next_lane()
+                if lane:
+                    await self.process_batch(worker_id, lane)
+                    continue
+                if drain:
+                    return
+                try:
+                    await asyncio.wait_for(stop.wait(), self.IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+
+        await self.scheduler.rebuild_lanes()
+        await asyncio.gather(*[worker(index) for index in range(workers)])
+        return await self.get_stats()
+
+    async def reclaim_expired_leases(self) -> int:
+        """Return messages held by crashed workers to the queue"""
+        now = datetime.utcnow()
+        expired = await self.db.message_queue.find(
+            {"status": "sending", "lease_expires_at": {"$lte": now}},
+            {"_id": 1, "tenant_id": 1, "priority": 1}
+        ).to_list(None)
+        if not expired:
+            return 0
+        result = await self.db.message_queue.update_many(
+            {"_id": {"$in": [message["_id"] for message in expired]}, "status": "sending",
+             "lease_expires_at": {"$lte": now}},
+            {"$set": {"status": "queued", "scheduled_for": now, "updated_at": now}, "$unset": {"claimed_by": ""}}
+        )
+        await self.scheduler.touch_lanes([{**message, "scheduled_for": now} for message in expired])
+        return result.modified_count
+
+    async def claim(self, worker_id: str, lane: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+        """Claim up to limit due messages from one lane; each claim is one atomic queued -> sending transition"""
+        claimed = []
+        for _ in range(limit):
+            now = datetime.utcnow()
+            message = await self.db.message_queue.find_one_and_update(
+                {"tenant_id": lane["tenant_id"], "status": "queued", "priority": lane["priority"],
+                 "scheduled_for": {"$lte": now}},
+                {
+                    "$set": {"status": "sending", "claimed_by": worker_id,
+                             "lease_expires_at": now + timedelta(seconds=self.LEASE_SECONDS), "updated_at": now},
+                    "$inc": {"attempts": 1}
+                },
+                sort=[("scheduled_for", 1)],
+                return_document=ReturnDocument.AFTER
+            )
+            if not message:
+                break
+            claimed.append(message)
+        self.metrics["claimed"] += len(claimed)
+        return claimed
+
+    async def process_batch(self, worker_id: str, lane: Dict[str, Any]) -> int:
+        """Claim one batch from a lane within its tenant's rate cap, deliver it and record the outcomes"""
+        granted = await self.scheduler.reserve(lane["tenant_id"], self.BATCH_SIZE, lane["rate_per_minute"],
+                                               lane["priority"])
+        if not granted:
+            self.scheduler.defer_lane(lane["tenant_id"], lane["priority"])
+            return 0
+        messages = await self.claim(worker_id, lane, granted)
+        if len(messages) < granted:
+            # The lane ran dry: hand back the unused budget and move the lane to its next due message
+            await self.scheduler.release(lane["tenant_id"], granted - len(messages))
+            await self.scheduler.refresh_lane(lane["tenant_id"], lane["priority"])
+        if not messages:
+            return 0
+
+        by_channel: Dict[str, List[Dict[str, Any]]] = {}
+        for message in messages:
+            by_channel.setdefault(str(message.get("channel") or "email"), []).append(message)
+
+        outcomes = []
+        for channel, channel_messages in by_channel.items():
+            adapter = self.adapters.get(channel)
+            if adapter is None:
+                results = [PermanentDeliveryError(f"No adapter for channel {channel}")] * len(channel_messages)
+            else:
+                try:
+                    results = await adapter.send(channel_messages)
+                except Exception as e:
+                    # An adapter bug or outage fails the whole batch, which is then retried
+                    results = [e] * len(channel_messages)
+            outcomes.extend(zip(channel_messages, results))
+
+        await self._record_outcomes(worker_id, outcomes)
+        return len(messages)
+
+    async def _record_outcomes(self, worker_id: str, outcomes: List[tuple]):
+        now = datetime.utcnow()
+        operations, failures, dead_letters, retries = [], [], [], []
+        for message, error in outcomes:
+            # Only the worker still holding the lease may settle a message
+            claim = {"_id": message["_id"], "claimed_by": worker_id}
+            if error is None:
+                operations.append(UpdateOne(claim, {
+                    "$set": {"status": "delivered", "delivered_at": now, "updated_at": now},
+                    "$unset": {"claimed_by": "", "lease_expires_at": ""}
+                }))
+                self.metrics["delivered"] += 1
+            elif isinstance(error, PermanentDeliveryError) or message["attempts"] >= message.get("max_attempts", 3):
+                failures.append((claim, message, error))
+            else:
+                retry_at = now + timedelta(seconds=self._backoff(message["attempts"]))
+                operations.append(UpdateOne(claim, {
+                    "$set": {"status": "queued", "last_error": str(error), "updated_at": now,
+                             "scheduled_for": retry_at},
+                    "$unset": {"claimed_by": "", "lease_expires_at": ""}
+                }))
+                retries.append({**message, "scheduled_for": retry_at})
+                self.metrics["retried"] += 1
+        if operations:
+            await self.db.message_queue.bulk_write(operations, ordered=False)
+        # Failures are settled one by one so a dead letter is written only when this worker's claim still held
+        for claim, message, error in failures:
+            result = await self.db.message_queue.update_one(claim, {
+                "$set": {"status": "failed", "last_error": str(error), "failed_at": now, "updated_at": now},
+                "$unset": {"claimed_by": "", "lease_expires_at": ""}
+            })
+            if not result.modified_count:
+                continue
+            dead_letters.append({
+                **{key: value for key, value in message.items() if key not in DEAD_LETTER_OMIT},
+                "id": str(uuid.uuid4()),
+                "message_id": message.get("id"),
+                "queue_object_id": message["_id"],
+                "status": "dead_lettered",
+                "last_error": str(error),
+                "dead_lettered_at": now
+            })
+        if dead_letters:
+            await self.db.message_dead_letters.insert_many(dead_letters)
+            self.metrics["dead_lettered"] += len(dead_letters)
+        await self.scheduler.touch_lanes(retries)
+        await self.kernel.rollups.increment([message for message, error in outcomes if error is None],
+                                            "messages_delivered")
+        await self.kernel.rollups.increment(dead_letters, "messages_failed")
+
+    def _backoff(self, attempts: int) -> float:
+        """Exponential backoff with jitter so retries of one failed batch spread out"""
+        delay = min(self.BACKOFF_SECONDS * 2 ** (attempts - 1), self.MAX_BACKOFF_SECONDS)
+        return delay * random.uniform(0.5, 1.0)
+
+    # Monitoring
+    async def get_stats(self, tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """Queue depth, lag overall and per (tenant, priority) lane, recent throughput and dead letters"""
+        now = datetime.utcnow()
+        scope = {"tenant_id": tenant_id} if tenant_id else {}
+        depth = {
+            row["_id"]: row["count"]
+            async for row in self.db.message_queue.aggregate([
+                {"$match": {**scope, "status": {"$in": ["queued", "sending"]}}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+            ])
+        }
+        oldest = await self.db.message_queue.find_one(
+            {**scope, "status": "queued", "scheduled_for": {"$lte": now}},
+            {"_id": 0, "scheduled_for": 1},
+            sort=[("scheduled_for", 1)]
+        )
+        window_start = now - timedelta(seconds=self.THROUGHPUT_WINDOW_SECONDS)
+        recent = await self.db.message_queue.count_documents(
+            {**scope, "status": "delivered", "delivered_at": {"$gte": window_start}}
+        )
+        elapsed = time.perf_counter() - self._started if self._started else 0
+        return {
+            "queued": depth.get("queued", 0),
+            "sending": depth.get("sending", 0),
+            "lag_seconds": round((now - oldest["scheduled_for"]).total_seconds(), 3) if oldest else 0,
+            "delivered_per_second": round(recent / self.THROUGHPUT_WINDOW_SECONDS, 2),
+            "dead_letters": await self.db.message_dead_letters.count_documents(scope),
+            "lanes": await self.scheduler.lane_stats(tenant_id),
+            "worker": {
+                **self.metrics,
+                "delivered_per_second": round(self.metrics["delivered"] / elapsed, 1) if elapsed else 0
+            }
+        }
+
+    # Dead letters
+    async def get_dead_letters(self, tenant_id: str, limit: int = 100) -> List[Dict[str, Any]]:
+        return await self.db.message_dead_letters.find(
+            {"tenant_id": tenant_id}, {"_id": 0, "queue_object_id": 0, "signing_secret": 0}
+        ).sort("dead_lettered_at", -1).limit(limit).to_list(limit)
+
+    async def requeue_dead_letter(self, tenant_id: str, dead_letter_id: str) -> bool:
+        """Put a dead-lettered message back on the queue with a fresh attempt budget"""
+        dead_letter = await self.db.message_dead_letters.find_one_and_delete(
+            {"id": dead_letter_id, "tenant_id": tenant_id}
+        )
+        if not dead_letter:
+            return False
+        now = datetime.utcnow()
+        await self.db.message_queue.update_one(
+            {"_id": dead_letter["queue_object_id"]},
+            {"$set": {"status": "queued", "attempts": 0, "scheduled_for": now, "updated_at": now},
+             "$unset": {"failed_at": ""}}
+        )
+        await self.scheduler.touch_lanes([{**dead_letter, "scheduled_for": now}])
+        # The message counts as failed again only if it dead-letters again
+        await self.kernel.rollups.increment([dead_letter], "messages_failed", -1)
+        return True
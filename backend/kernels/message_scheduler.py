@@ -0,0 +1,202 @@
+"""
+Message Scheduler
+Fair per-tenant scheduling for the message queue: priority lanes, weighted round-robin and rate caps
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from datetime import datetime, timedelta
+import asyncio
+from pymongo import ReturnDocument, UpdateOne
+
+
+# Served in this order within every round, so confirmations never wait behind anyone's bulk sends
+PRIORITY_CLASSES = ["transactional", "bulk"]
+DEFAULT_PRIORITY = "transactional"
+
+
+def lane_id(tenant_id: str, priority: str) -> str:
+    return f"{tenant_id}:{priority}"
+
+
+class FairScheduler:
+    """Hands out (tenant, priority) lanes to dispatcher workers"""
+
+    DEFAULT_WEIGHT = 1
+    DEFAULT_RATE_PER_MINUTE = 600
+    # Share of every tenant's per-minute budget that bulk sends may not use, kept for transactional messages
+    TRANSACTIONAL_RESERVE = 0.2
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.db = dispatcher.db
+        self._round: deque = deque()
+        self._round_lock = asyncio.Lock()
+        self._deferred: Dict[str, datetime] = {}  # lane id -> end of the minute whose budget it used up
+
+    # Lane bookkeeping
+    # Each (tenant, priority) lane document holds the due time of its oldest message,
+    # so finding due work reads the small lanes collection instead of scanning the queue
+    async def touch_lanes(self, messages: List[Dict[str, Any]]):
+        """Record that these (tenant, priority) lanes have messages due at their scheduled_for"""
+        earliest: Dict[Tuple[str, str], datetime] = {}
+        for message in messages:
+            key = (message["tenant_id"], message.get("priority") or DEFAULT_PRIORITY)
+            due = message["scheduled_for"]
+            if key not in earliest or due < earliest[key]:
+                earliest[key] = due
+        if not earliest:
+            return
+        # version lets refresh_lane detect a message queued while it was looking at the lane
+        await self.db.message_lanes.bulk_write([
+            UpdateOne(
+                {"_id": lane_id(tenant_id, priority)},
+                {"$min": {"next_due": due}, "$inc": {"version": 1},
+                 "$setOnInsert": {"tenant_id": tenant_id, "priority": priority}},
+                upsert=True
+            )
+            for (tenant_id, priority), due in earliest.items()
+        ], ordered=False)
+
+    async def refresh_lane(self, tenant_id: str, priority: str):
+        """Move a lane's next_due to its oldest remaining message, or clear it if the lane is empty"""
+        lane = await self.db.message_lanes.find_one({"_id": lane_id(tenant_id, priority)})
+        if not lane:
+            return
+        oldest = await self.db.message_queue.find_one(
+            {"tenant_id": tenant_id, "status": "queued", "priority": priority},
+            {"_id": 0, "scheduled_for": 1},
+            sort=[("scheduled_for", 1)]
+        )
+        # Unset rather than null: null sorts below every date, so a later $min would never replace it
+        await self.db.message_lanes.update_one(
+            {"_id": lane["_id"], "version": lane.get("version")},
+            {"$set": {"next_due": oldest["scheduled_for"]}} if oldest else {"$unset": {"next_due": ""}}
+        )
+
+    async def rebuild_lanes(self) -> int:
+        """Recreate lanes from the queue; needed once for messages queued before lanes existed"""
+        await self.db.message_queue.update_many(
+            {"status": "queued", "priority": {"$exists": False}}, {"$set": {"priority": DEFAULT_PRIORITY}}
+        )
+        rows = await self.db.message_queue.aggregate([
+            {"$match": {"status": "queued"}},
+            {"$group": {"_id": {"tenant_id": "$tenant_id", "priority": "$priority"},
+                        "next_due": {"$min": "$scheduled_for"}}}
+        ]).to_list(None)
+        await self.touch_lanes([
+            {"tenant_id": row["_id"]["tenant_id"], "priority": row["_id"]["priority"], "scheduled_for": row["next_due"]}
+            for row in rows
+        ])
+        return len(rows)
+
+    # Scheduling
+    async def next_lane(self) -> Optional[Dict[str, Any]]:
+        """Next lane to serve, starting a new weighted round when the current one is used up"""
+        async with self._round_lock:
+            if not self._round:
+                self._round = deque(await self._build_round())
+            return self._round.popleft() if self._round else None
+
+    async def _build_round(self) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        lanes = await self.db.message_lanes.find(
+            {"next_due": {"$lte": now}}, {"_id": 0, "tenant_id": 1, "priority": 1, "next_due": 1}
+        ).to_list(None)
+        self._deferred = {lane: until for lane, until in self._deferred.items() if until > now}
+        lanes = [lane for lane in lanes if lane_id(lane["tenant_id"], lane["priority"]) not in self._deferred]
+        if not lanes:
+            return []
+        settings = await self._tenant_settings({lane["tenant_id"] for lane in lanes})
+
+        # Weighted round-robin: a tenant with weight w gets w slots per round, interleaved with the others
+        rounds = []
+        for priority in PRIORITY_CLASSES:
+            tier = sorted(
+                [lane for lane in lanes if lane["priority"] == priority], key=lambda lane: lane["next_due"]
+            )
+            weights = [settings[lane["tenant_id"]]["weight"] for lane in tier]
+            for slot in range(max(weights, default=0)):
+                rounds.extend(
+                    {**lane, "rate_per_minute": settings[lane["tenant_id"]]["rate_per_minute"]}
+                    for lane, weight in zip(tier, weights) if weight > slot
+                )
+        return rounds
+
+    async def _tenant_settings(self, tenant_ids) -> Dict[str, Dict[str, int]]:
+        """Per-tenant weight and rate cap from tenants.settings, with defaults"""
+        settings = {
+            tenant_id: {"weight": self.DEFAULT_WEIGHT, "rate_per_minute": self.DEFAULT_RATE_PER_MINUTE}
+            for tenant_id in tenant_ids
+        }
+        async for tenant in self.db.tenants.find(
+            {"id": {"$in": list(tenant_ids)}},
+            {"_id": 0, "id": 1, "settings.message_weight": 1, "settings.message_rate_per_minute": 1}
+        ):
+            tenant_settings = tenant.get("settings") or {}
+            settings[tenant["id"]] = {
+                "weight": max(int(tenant_settings.get("message_weight") or self.DEFAULT_WEIGHT), 1),
+                "rate_per_minute": int(tenant_settings.get("message_rate_per_minute") or self.DEFAULT_RATE_PER_MINUTE)
+            }
+        return settings
+
+    # Rate caps
+    def defer_lane(self, tenant_id: str, priority: str):
+        """Leave a lane out of new rounds until its tenant's rate window resets"""
+        self._deferred[lane_id(tenant_id, priority)] = (
+            datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1)
+        )
+
+    def budget(self, priority: str, rate_per_minute: int) -> int:
+        """How much of the shared per-minute window a lane of this priority may fill"""
+        if priority == "transactional":
+            return rate_per_minute
+        # Bulk stops short of the cap, so a bulk backlog cannot hold confirmations until the next minute
+        return rate_per_minute - int(rate_per_minute * self.TRANSACTIONAL_RESERVE)
+
+    async def reserve(self, tenant_id: str, wanted: int, rate_per_minute: int,
+                      priority: str = DEFAULT_PRIORITY) -> int:
+        """Take up to wanted sends from the tenant's budget for the current minute"""
+        now = datetime.utcnow()
+        minute = now.replace(second=0, microsecond=0)
+        window = await self.db.message_rate_windows.find_one_and_update(
+            {"_id": f"{tenant_id}:{minute.isoformat()}"},
+            {"$inc": {"count": wanted}, "$setOnInsert": {"expires_at": minute + timedelta(minutes=2)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        granted = max(0, min(wanted, self.budget(priority, rate_per_minute) - (window["count"] - wanted)))
+        if granted < wanted:
+            await self.release(tenant_id, wanted - granted, minute)
+        return granted
+
+    async def release(self, tenant_id: str, unused: int, minute: Optional[datetime] = None):
+        """Give back budget reserved but not used"""
+        if unused <= 0:
+            return
+        minute = minute or datetime.utcnow().replace(second=0, microsecond=0)
+        await self.db.message_rate_windows.update_one(
+            {"_id": f"{tenant_id}:{minute.isoformat()}"}, {"$inc": {"count": -unused}}
+        )
+
+    # Monitoring
+    async def lane_stats(self, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Depth and lag of every lane, read from the lanes plus one grouped count over the queue"""
+        now = datetime.utcnow()
+        scope = {"tenant_id": tenant_id} if tenant_id else {}
+        depth = {
+            (row["_id"]["tenant_id"], row["_id"]["priority"]): row["count"]
+            async for row in self.db.message_queue.aggregate([
+                {"$match": {**scope, "status": "queued"}},
+                {"$group": {"_id": {"tenant_id": "$tenant_id", "priority": "$priority"}, "count": {"$sum": 1}}}
+            ])
+        }
+        return [
+            {
+                "tenant_id": lane["tenant_id"],
+                "priority": lane["priority"],
+                "queued": depth.get((lane["tenant_id"], lane["priority"]), 0),
+                "lag_seconds": round(max((now - lane["next_due"]).total_seconds(), 0), 3)
+                if lane.get("next_due") else 0
+            }
+            async for lane in self.db.message_lanes.find(scope, {"_id": 0}).sort([("tenant_id", 1), ("priority", 1)])
+        ]
@@ -0,0 +1,44 @@
+"""
+Money
+Amounts as integer minor units plus an ISO 4217 currency code; Decimal only at the edges
+"""
+from typing import Any
+from decimal import Decimal, ROUND_HALF_UP
+
+
+DEFAULT_CURRENCY = "USD"
+# Minor-unit exponent per currency; anything not listed uses 2 (cents)
+CURRENCY_EXPONENTS = {
+    "BHD": 3, "CLP": 0, "ISK": 0, "JOD": 3, "JPY": 0, "KRW": 0, "KWD": 3,
+    "OMR": 3, "TND": 3, "UGX": 0, "VND": 0, "XAF": 0, "XOF": 0
+}
+
+
+def currency_exponent(currency: str) -> int:
+    return CURRENCY_EXPONENTS.get(currency, 2)
+
+
+def to_minor(amount: Any, currency: str = DEFAULT_CURRENCY) -> int:
+    """Convert a major-unit amount (int, float, str or Decimal) to integer minor units, rounding half up"""
+    if isinstance(amount, Decimal):
+        value = amount
+    else:
+        # str() first so a float like 0.1 converts as written rather than as its binary expansion
+        value = Decimal(str(amount))
+    return int((value.scaleb(currency_exponent(currency))).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount_minor: int, currency: str = DEFAULT_CURRENCY) -> Decimal:
+    """Convert integer minor units back to a Decimal in major units"""
+    return Decimal(amount_minor).scaleb(-currency_exponent(currency))
+
+
+def multiply_minor(amount_minor: int, quantity: Any) -> int:
+    """Price times quantity in minor units; integer quantities never leave integer arithmetic"""
+    if isinstance(quantity, int):
+        return amount_minor * quantity
+    quantity = quantity if isinstance(quantity, Decimal) else Decimal(str(quantity))
+    if quantity == quantity.to_integral_value():
+        return amount_minor * int(quantity)
+    return int((quantity * amount_minor).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
@@ -0,0 +1,241 @@
+"""
+Notification Outbox
+Notification intents written with the record they describe, relayed into the message queue in batches
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import uuid
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+
+
+# Used when the tenant has no message template of the same template_type
+DEFAULT_TEMPLATES = {
+    "form_submission_notification": {
+        "subject": "New {form_name} submission from {first_name} {last_name}",
+        "body": "{first_name} {last_name} ({email|default:no email}, {phone|default:no phone}) "
+                "submitted {form_name}.\n\n{summary}"
+    },
+    "tour_confirmation": {
+        "subject": "Your tour is booked for {scheduled_at}",
+        "body": "Hi {first_name},\n\nYour tour is confirmed for {scheduled_at}. We look forward to seeing you."
+    },
+    "tour_booked_notification": {
+        "subject": "Tour booked: {first_name} {last_name} on {scheduled_at}",
+        "body": "{first_name} {last_name} ({email}, {phone|default:no phone}) booked a tour for {scheduled_at}."
+    }
+}
+
+
+class NotificationOutbox:
+    """A record and its notifications are written together; the relay turns outbox rows into queued messages"""
+
+    RELAY_SECONDS = 1.0
+    RELAY_BATCH = 500
+    # Rows written without a transaction wait this long for their source record before being dropped
+    SOURCE_GRACE_SECONDS = 60
+
+    def __init__(self, communication_kernel):
+        self.kernel = communication_kernel
+        self.db = communication_kernel.db
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.metrics = {"written": 0, "relayed": 0, "dropped": 0, "failed": 0}
+
+    # Writing
+    async def insert_with_notifications(self, tenant_id: str, collection: str, document: Dict[str, Any],
+                                        notifications: List[Dict[str, Any]]):
+        """Insert document into collection along with its notifications ({template, recipient or
+        recipient_user_id, context}); a transaction makes them atomic where the server supports one"""
+        rows = self._rows(tenant_id, collection, document["id"], notifications)
+        if not rows:
+            await self.db[collection].insert_one(document)
+            return
+        try:
+            async with await self.db.client.start_session() as session:
+                async with session.start_transaction():
+                    await self.db[collection].insert_one(document, session=session)
+                    await self.db.notification_outbox.insert_many(rows, session=session)
+            self._written(rows)
+            return
+        except OperationFailure as e:
+            # Standalone servers reject transactions (IllegalOperation); anything else is a real failure
+            if e.code != 20:
+                raise
+        document.pop("_id", None)
+
+        # Outbox first, so a crash can only leave rows behind; the relay sends them once the record exists
+        for row in rows:
+            row["source_check"] = True
+        await self.db.notification_outbox.insert_many(rows)
+        try:
+            await self.db[collection].insert_one(document)
+        except Exception:
+            await self.db.notification_outbox.delete_many({"id": {"$in": [row["id"] for row in rows]}})
+            raise
+        self._written(rows)
+
+    def _rows(self, tenant_id: str, collection: str, source_id: str,
+              notifications: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        now = datetime.utcnow()
+        rows = []
+        for notification in notifications:
+            recipient = notification.get("recipient") or notification.get("recipient_user_id")
+            if not recipient:
+                continue
+            rows.append({
+                "id": str(uuid.uuid4()),
+                "tenant_id": tenant_id,
+                "source": {"collection": collection, "id": source_id},
+                "template": notification["template"],
+                "channel": notification.get("channel", "email"),
+                "recipient": notification.get("recipient"),
+                "recipient_user_id": notification.get("recipient_user_id"),
+                "context": notification.get("context", {}),
+                # Carried onto the queued message, whose unique dedupe_key makes relaying a row twice harmless
+                "dedupe_key": f"{collection}:{source_id}:{notification['template']}:{recipient}",
+                "created_at": now
+            })
+        return rows
+
+    def _written(self, rows: List[Dict[str, Any]]):
+        self.metrics["written"] += len(rows)
+        self._wake.set()
+
+    # Lifecycle
+    async def start(self):
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                while await self.relay_once() >= self.RELAY_BATCH:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️  Notification outbox relay error: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.RELAY_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    # Relay
+    async def relay_once(self) -> int:
+        """Move one batch of outbox rows into the message queue; returns how many rows were settled"""
+        rows = await self.db.notification_outbox.find(
+            {"failed_at": {"$exists": False}}
+        ).sort("created_at", 1).to_list(self.RELAY_BATCH)
+        ready, dropped = await self._check_sources(rows)
+        messages, failed = await self._render(ready)
+        if failed:
+            await self._set_failed(failed)
+            failed_ids = {row["_id"] for row, _ in failed}
+            ready = [row for row in ready if row["_id"] not in failed_ids]
+
+        if messages:
+            duplicates = set()
+            try:
+                await self.db.message_queue.insert_many(messages, ordered=False)
+            except BulkWriteError as e:
+                # Rows relayed before a crash, or by another process, are already queued
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+                duplicates = {error["index"] for error in e.details["writeErrors"]}
+            queued = [message for index, message in enumerate(messages) if index not in duplicates]
+            await self.kernel.dispatcher.scheduler.touch_lanes(queued)
+            await self.kernel.rollups.increment(queued, "messages_total")
+        done = [row["_id"] for row in ready + dropped]
+        if done:
+            await self.db.notification_outbox.delete_many({"_id": {"$in": done}})
+        self.metrics["relayed"] += len(ready)
+        self.metrics["dropped"] += len(dropped)
+        self.metrics["failed"] += len(failed)
+        return len(done) + len(failed)
+
+    async def _set_failed(self, failed: List[tuple]):
+        """Set rows that cannot be rendered aside so they stop blocking the batch; they stay for inspection"""
+        print(f"⚠️  {len(failed)} outbox notification(s) could not be rendered: {failed[0][1]}")
+        now = datetime.utcnow()
+        await self.db.notification_outbox.bulk_write([
+            UpdateOne({"_id": row["_id"]}, {"$set": {"failed_at": now, "error": error}}) for row, error in failed
+        ], ordered=False)
+
+    async def _check_sources(self, rows: List[Dict[str, Any]]):
+        """Split rows into ready and dropped; unchecked rows whose source is still missing are left for later"""
+        unchecked: Dict[str, set] = {}
+        for row in rows:
+            if row.get("source_check"):
+                unchecked.setdefault(row["source"]["collection"], set()).add(row["source"]["id"])
+        existing = set()
+        for collection, ids in unchecked.items():
+            async for doc in self.db[collection].find({"id": {"$in": list(ids)}}, {"_id": 0, "id": 1}):
+                existing.add((collection, doc["id"]))
+
+        ready, dropped = [], []
+        cutoff = datetime.utcnow() - timedelta(seconds=self.SOURCE_GRACE_SECONDS)
+        for row in rows:
+            if not row.get("source_check") or (row["source"]["collection"], row["source"]["id"]) in existing:
+                ready.append(row)
+            elif row["created_at"] <= cutoff:
+                # The record write failed after its notifications were written
+                dropped.append(row)
+        return ready, dropped
+
+    async def _render(self, rows: List[Dict[str, Any]]):
+        """Messages for rows that render, and (row, error) for rows that do not"""
+        user_ids = list({row["recipient_user_id"] for row in rows if row.get("recipient_user_id")})
+        emails = {}
+        if user_ids:
+            async for user in self.db.users.find({"id": {"$in": user_ids}}, {"_id": 0, "id": 1, "email": 1}):
+                emails[user["id"]] = user.get("email")
+
+        templates: Dict[tuple, Dict[str, Any]] = {}
+        now = datetime.utcnow()
+        messages, failed = [], []
+        for row in rows:
+            recipient = row.get("recipient") or emails.get(row.get("recipient_user_id"))
+            if not recipient:
+                continue
+            key = (row["tenant_id"], row["template"])
+            try:
+                if key not in templates:
+                    templates[key] = await self._template(*key)
+                subject, body = self.kernel.compiled_templates.get(templates[key])
+                content = {"subject": subject.render(row["context"]), "body": body.render(row["context"])}
+            except Exception as e:
+                # One tenant's broken template must not hold up everyone else's notifications
+                failed.append((row, str(e)))
+                continue
+            messages.append({
+                "id": str(uuid.uuid4()),
+                "tenant_id": row["tenant_id"],
+                "channel": templates[key].get("channel") or row["channel"],
+                "recipient": recipient,
+                **content,
+                "source": row["source"],
+                "dedupe_key": row["dedupe_key"],
+                "priority": "transactional",
+                "status": "queued",
+                "scheduled_for": now,
+                "attempts": 0,
+                "max_attempts": 3,
+                "created_at": now
+            })
+        return messages, failed
+
+    async def _template(self, tenant_id: str, template_type: str) -> Dict[str, Any]:
+        template = await self.db.message_templates.find_one(
+            {"tenant_id": tenant_id, "template_type": template_type, "is_active": {"$ne": False}},
+            {"_id": 0, "id": 1, "subject": 1, "body": 1, "channel": 1, "format": 1, "created_at": 1, "updated_at": 1}
+        )
+        return template or {"id": f"default:{template_type}", **DEFAULT_TEMPLATES[template_type]}
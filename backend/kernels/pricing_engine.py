@@ -0,0 +1,186 @@
+"""
+Pricing Engine
+Compiles module and tenant rate rules into arrays and prices booking candidates in bulk
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import numpy as np
+
+
+MINUTES_PER_WEEK = 7 * 24 * 60
+# Day-of-year offsets of each month in a leap year, so Feb 29 has its own slot
+MONTH_OFFSETS = np.cumsum([0, 31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+ADD_ON_UNITS = ("flat", "per_hour", "per_attendee")
+# pricing_type values that never charge
+FREE_PRICING_TYPES = {"free", "none"}
+
+
+def _day_of_year(month_day: str) -> int:
+    """Convert 'MM-DD' to an index into the 366-day seasonal table"""
+    month, day = (int(part) for part in month_day.split("-"))
+    return int(MONTH_OFFSETS[month - 1]) + day - 1
+
+
+def _day_indexes(epoch_days: np.ndarray) -> np.ndarray:
+    """Indexes into the 366-day seasonal table for days counted from 1970-01-01"""
+    days = epoch_days.astype("datetime64[D]")
+    month_start = days.astype("datetime64[M]")
+    return MONTH_OFFSETS[month_start.astype(np.int64) % 12] + (
+        days - month_start.astype("datetime64[D]")
+    ).astype(np.int64)
+
+
+def _minute_of_day(value: str) -> int:
+    hours, minutes = value.split(":")[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+class RateTable:
+    """Compiled, array-backed rates for one tenant"""
+
+    def __init__(self, resources: List[Dict[str, Any]], booking_rules: Dict[str, Any],
+                 resource_types: List[Dict[str, Any]], pricing_settings: Dict[str, Any]):
+        self.currency = pricing_settings.get("currency", "USD")
+        self.cancellation_policy = booking_rules.get("cancellation_policy")
+        self.resource_ids = [resource["id"] for resource in resources]
+        self.resource_names = [resource.get("name") for resource in resources]
+        self.index = {resource_id: index for index, resource_id in enumerate(self.resource_ids)}
+
+        # Per-resource base rates and tier multipliers
+        tiers = booking_rules.get("pricing_tiers", {})
+        type_pricing = {rt["type"]: rt.get("pricing_type") for rt in resource_types}
+        default_hourly = pricing_settings.get("default_hourly_rate", 0.0)
+        self.hourly_rate = np.array(
+            [resource.get("hourly_rate") or default_hourly for resource in resources], dtype=np.float64
+        )
+        self.daily_rate = np.array(
+            [resource.get("daily_rate") or np.nan for resource in resources], dtype=np.float64
+        )
+        multipliers = []
+        for resource in resources:
+            pricing_type = resource.get("pricing_tier") or type_pricing.get(resource.get("type"))
+            multipliers.append(0.0 if pricing_type in FREE_PRICING_TYPES else tiers.get(pricing_type, 1.0))
+        self.tier_multiplier = np.array(multipliers, dtype=np.float64)
+
+        # Seasonal multiplier per day of year
+        self.seasonal = np.ones(366)
+        self.has_seasons = bool(pricing_settings.get("seasonal"))
+        for season in pricing_settings.get("seasonal", []):
+            start, end = _day_of_year(season["start"]), _day_of_year(season["end"])
+            days = np.arange(start, end + 1) if start <= end else np.r_[start:366, 0:end + 1]
+            self.seasonal[days] = season["multiplier"]
+
+        # Weekday/hour multipliers per minute of week, as a prefix sum over two weeks so
+        # the cost of any window (even one crossing Sunday midnight) is one subtraction
+        minute_multiplier = np.ones(MINUTES_PER_WEEK)
+        for rate in pricing_settings.get("time_rates", []):
+            start, end = _minute_of_day(rate["start"]), _minute_of_day(rate["end"])
+            for day in rate.get("days", range(7)):
+                minute_multiplier[day * 1440 + start:day * 1440 + end] = rate["multiplier"]
+        self.minute_prefix = np.concatenate([[0.0], np.cumsum(np.tile(minute_multiplier, 2))])
+
+        # Add-ons: enabled by the module, priced by the tenant
+        enabled = booking_rules.get("add_on_services", {})
+        self.add_ons = {}
+        for name, price in pricing_settings.get("add_ons", {}).items():
+            if enabled and not enabled.get(name):
+                continue
+            unit = price.get("unit", "flat")
+            if unit not in ADD_ON_UNITS:
+                raise ValueError(f"Unsupported add-on unit: {unit}")
+            self.add_ons[name] = (float(price["price"]), unit)
+
+    def price(self, resource_index: np.ndarray, starts: np.ndarray, durations: np.ndarray,
+              attendees: Optional[np.ndarray] = None, add_ons: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Price candidates given resource indexes, start datetime64[m] values and durations in minutes"""
+        starts = starts.astype("datetime64[m]")
+        durations = durations.astype(np.int64)
+        hours = durations / 60
+        if attendees is None:
+            attendees = np.ones(len(starts))
+
+        epoch_minutes = starts.astype(np.int64)
+        if self.has_seasons:
+            weighted_minutes, season = self._seasonal_minutes(epoch_minutes, durations)
+        else:
+            weighted_minutes, season = self._weighted_minutes(epoch_minutes, durations), 1.0
+        multiplier = self.tier_multiplier[resource_index]
+
+        base = self.hourly_rate[resource_index] * weighted_minutes / 60 * multiplier
+        # The daily cap scales with the window's average seasonal multiplier
+        daily_cap = self.daily_rate[resource_index] * np.ceil(durations / 1440) * multiplier * season
+        base = np.where(np.isnan(daily_cap), base, np.minimum(base, daily_cap))
+
+        extras = np.zeros(len(starts))
+        for name in add_ons or []:
+            if name not in self.add_ons:
+                raise ValueError(f"Add-on not available: {name}")
+            amount, unit = self.add_ons[name]
+            if unit == "flat":
+                extras += amount
+            elif unit == "per_hour":
+                extras += amount * hours
+            else:
+                extras += amount * attendees
+
+        base = np.round(base, 2)
+        extras = np.round(extras, 2)
+        return {"base_price": base, "add_ons_price": extras, "total_price": np.round(base + extras, 2)}
+
+    def _weighted_minutes(self, epoch_minutes: np.ndarray, durations: np.ndarray) -> np.ndarray:
+        """Integral of the minute-of-week multiplier over each window"""
+        # 1970-01-01 was a Thursday; shift so minute 0 of the week is Monday 00:00
+        minute_of_week = (epoch_minutes + 3 * 1440) % MINUTES_PER_WEEK
+        # Whole weeks cost the full-week integral; the remainder is one window of under a week
+        full_weeks, remainder = np.divmod(durations, MINUTES_PER_WEEK)
+        return (
+            full_weeks * self.minute_prefix[MINUTES_PER_WEEK]
+            + self.minute_prefix[minute_of_week + remainder]
+            - self.minute_prefix[minute_of_week]
+        )
+
+    def _seasonal_minutes(self, epoch_minutes: np.ndarray, durations: np.ndarray):
+        """Weighted minutes with each calendar day at its own seasonal multiplier, plus the average multiplier"""
+        ends = epoch_minutes + durations
+        first_day = epoch_minutes // 1440
+        weighted = np.zeros(len(epoch_minutes))
+        seasonal = np.zeros(len(epoch_minutes))
+        # One pass per calendar day covered by the longest window, vectorised across candidates
+        for offset in range(int((ends - first_day * 1440).max(initial=0) + 1439) // 1440):
+            day = first_day + offset
+            segment_start = np.maximum(epoch_minutes, day * 1440)
+            length = np.maximum(np.minimum(ends, (day + 1) * 1440) - segment_start, 0)
+            season = self.seasonal[_day_indexes(day)]
+            weighted += self._weighted_minutes(segment_start, length) * season
+            seasonal += length * season
+        # A zero-length window takes its start day's multiplier
+        average = np.divide(seasonal, durations, out=self.seasonal[_day_indexes(first_day)], where=durations > 0)
+        return weighted, average
+
+
+class PricingEngine:
+    """Caches compiled rate tables per tenant"""
+
+    CACHE_SECONDS = 300
+
+    def __init__(self, booking_kernel):
+        self.kernel = booking_kernel
+        self.db = booking_kernel.db
+        self._tables = {}  # tenant_id -> (compiled_at, RateTable)
+
+    async def get_rate_table(self, tenant_id: str, booking_rules: Dict[str, Any],
+                             resource_types: List[Dict[str, Any]], pricing_settings: Dict[str, Any]) -> RateTable:
+        cached = self._tables.get(tenant_id)
+        if cached and (datetime.utcnow() - cached[0]).total_seconds() < self.CACHE_SECONDS:
+            return cached[1]
+
+        resources = await self.db.resources.find(
+            {"tenant_id": tenant_id, "is_active": True},
+            {"_id": 0, "id": 1, "name": 1, "type": 1, "pricing_tier": 1, "hourly_rate": 1, "daily_rate": 1}
+        ).to_list(None)
+        table = RateTable(resources, booking_rules, resource_types, pricing_settings)
+        self._tables[tenant_id] = (datetime.utcnow(), table)
+        return table
+
+    def invalidate(self, tenant_id: str):
+        self._tables.pop(tenant_id, None)
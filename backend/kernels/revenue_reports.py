@@ -0,0 +1,242 @@
+"""
+Revenue Reports
+Server-side revenue and receivables aggregation with incrementally maintained daily rollups
+"""
+from typing import Dict, Any, Optional
+from datetime import datetime, timedelta
+from pymongo import ReplaceOne
+import numpy as np
+
+
+# Days past due -> bucket; invoices not yet due are "current"
+AGING_BUCKETS = [(30, "1_30"), (60, "31_60"), (90, "61_90")]
+AGING_OLDEST = "90_plus"
+UNPAID_STATUSES = ["sent", "overdue"]
+# All amounts are integer minor units (see kernels.money); a tenant bills in one currency
+ROLLUP_FIELDS = ("paid_revenue_minor", "paid_invoices", "payment_amount_minor", "payments")
+
+
+def _day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class RevenueReports:
+    """Revenue and receivables reports computed in MongoDB rather than in Python"""
+
+    TOP_CUSTOMERS = 20
+
+    def __init__(self, financial_kernel):
+        self.kernel = financial_kernel
+        self.db = financial_kernel.db
+
+    # Rollup maintenance
+    async def record_invoice_paid(self, tenant_id: str, invoice: Dict[str, Any], sign: int):
+        """Add (sign=1) or remove (sign=-1) a paid invoice from its day's rollup"""
+        await self._increment(tenant_id, invoice["created_at"], {
+            "paid_revenue_minor": sign * invoice.get("total_minor", 0),
+            "paid_invoices": sign
+        })
+
+    async def record_payment(self, tenant_id: str, transaction: Dict[str, Any]):
+        await self._increment(tenant_id, transaction["transaction_date"], {
+            "payment_amount_minor": transaction.get("amount_minor", 0),
+            "payments": 1
+        })
+
+    async def _increment(self, tenant_id: str, when: datetime, values: Dict[str, Any]):
+        await self.db.revenue_daily.update_one(
+            {"tenant_id": tenant_id, "date": _day(when)},
+            {"$inc": values, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def rebuild_rollups(self, tenant_id: str) -> int:
+        """Recompute every daily rollup for a tenant from invoices and payments"""
+        days = await self._raw_days(tenant_id, None, None)
+        now = datetime.utcnow()
+        operations = [
+            ReplaceOne(
+                {"tenant_id": tenant_id, "date": day},
+                {"tenant_id": tenant_id, "date": day, **values, "updated_at": now},
+                upsert=True
+            )
+            for day, values in days.items()
+        ]
+        if operations:
+            await self.db.revenue_daily.bulk_write(operations, ordered=False)
+        await self.db.revenue_daily.delete_many({"tenant_id": tenant_id, "date": {"$nin": list(days)}})
+        await self.db.revenue_rollup_state.update_one(
+            {"_id": tenant_id}, {"$set": {"built_at": now}}, upsert=True
+        )
+        return len(operations)
+
+    async def _raw_days(self, tenant_id: str, start_date: Optional[datetime],
+                        end_date: Optional[datetime]) -> Dict[datetime, Dict[str, Any]]:
+        """Per-day paid revenue and payments aggregated straight from invoices and transactions"""
+        def window(field):
+            match = {}
+            if start_date:
+                match["$gte"] = start_date
+            if end_date:
+                match["$lt"] = end_date
+            return {field: match} if match else {}
+
+        def by_day(field):
+            return {"y": {"$year": field}, "m": {"$month": field}, "d": {"$dayOfMonth": field}}
+
+        days: Dict[datetime, Dict[str, Any]] = {}
+
+        def day_values(key):
+            day = datetime(key["y"], key["m"], key["d"])
+            return days.setdefault(day, {field: 0 for field in ROLLUP_FIELDS})
+
+        async for row in self.db.invoices.aggregate([
+            {"$match": {"tenant_id": tenant_id, "status": "paid", **window("created_at")}},
+            {"$group": {"_id": by_day("$created_at"), "revenue": {"$sum": "$total_minor"}, "count": {"$sum": 1}}}
+        ]):
+            values = day_values(row["_id"])
+            values["paid_revenue_minor"] = row["revenue"]
+            values["paid_invoices"] = row["count"]
+
+        async for row in self.db.transactions.aggregate([
+            {"$match": {"tenant_id": tenant_id, "type": "payment", **window("transaction_date")}},
+            {"$group": {"_id": by_day("$transaction_date"), "amount": {"$sum": "$amount_minor"}, "count": {"$sum": 1}}}
+        ]):
+            values = day_values(row["_id"])
+            values["payment_amount_minor"] = row["amount"]
+            values["payments"] = row["count"]
+        return days
+
+    async def _daily(self, tenant_id: str, start_date: datetime, end_date: datetime) -> Dict[datetime, Dict[str, Any]]:
+        """Per-day values for [start_date, end_date): whole days from rollups, partial days from raw data"""
+        if not await self.db.revenue_rollup_state.find_one({"_id": tenant_id}):
+            await self.rebuild_rollups(tenant_id)
+
+        first_full = _day(start_date)
+        if first_full < start_date:
+            first_full += timedelta(days=1)
+        last_full = _day(end_date)
+
+        if last_full <= first_full:
+            return await self._raw_days(tenant_id, start_date, end_date)
+
+        days = {
+            rollup["date"]: {field: rollup.get(field, 0) for field in ROLLUP_FIELDS}
+            async for rollup in self.db.revenue_daily.find(
+                {"tenant_id": tenant_id, "date": {"$gte": first_full, "$lt": last_full}}, {"_id": 0}
+            )
+        }
+        for edge_start, edge_end in ((start_date, first_full), (last_full, end_date)):
+            if edge_end > edge_start:
+                days.update(await self._raw_days(tenant_id, edge_start, edge_end))
+        return days
+
+    # Reports
+    async def revenue_report(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                             group_by: str = "month") -> Dict[str, Any]:
+        """Paid revenue and payments for the period, bucketed by day, week or month"""
+        if group_by not in ("day", "week", "month"):
+            raise ValueError(f"Unsupported grouping: {group_by}")
+        # The report has always included invoices created exactly at end_date
+        end_exclusive = end_date + timedelta(microseconds=1)
+        days = await self._daily(tenant_id, start_date, end_exclusive)
+
+        # Days x fields as int64, summed into period buckets with exact integer arithmetic
+        day_keys = np.array(sorted(days), dtype="datetime64[D]")
+        values = np.array(
+            [[days[day][field] for field in ROLLUP_FIELDS] for day in sorted(days)], dtype=np.int64
+        ).reshape(len(day_keys), len(ROLLUP_FIELDS))
+        if group_by == "week":
+            # datetime64 day 0 (1970-01-01) was a Thursday; step back to Monday
+            period_keys = day_keys - (day_keys.astype(np.int64) + 3) % 7
+        elif group_by == "month":
+            period_keys = day_keys.astype("datetime64[M]").astype("datetime64[D]")
+        else:
+            period_keys = day_keys
+        periods, owner = np.unique(period_keys, return_inverse=True)
+        sums = np.zeros((len(periods), len(ROLLUP_FIELDS)), dtype=np.int64)
+        np.add.at(sums, owner, values)
+        totals = dict(zip(ROLLUP_FIELDS, values.sum(axis=0).tolist()))
+
+        total_revenue = totals["paid_revenue_minor"]
+        invoice_count = totals["paid_invoices"]
+        by_status = {
+            row["_id"]: {"count": row["count"], "amount_minor": row["amount"]}
+            async for row in self.db.invoices.aggregate([
+                {"$match": {"tenant_id": tenant_id, "created_at": {"$gte": start_date, "$lte": end_date}}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}, "amount": {"$sum": "$total_minor"}}}
+            ])
+        }
+        top_customers = [
+            {"customer_id": row["_id"], "revenue_minor": row["revenue"], "invoice_count": row["count"]}
+            async for row in self.db.invoices.aggregate([
+                {"$match": {"tenant_id": tenant_id, "status": "paid",
+                            "created_at": {"$gte": start_date, "$lte": end_date}}},
+                {"$group": {"_id": "$customer_id", "revenue": {"$sum": "$total_minor"}, "count": {"$sum": 1}}},
+                {"$sort": {"revenue": -1}},
+                {"$limit": self.TOP_CUSTOMERS}
+            ])
+        ]
+
+        return {
+            "period": {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat()
+            },
+            "total_revenue_minor": total_revenue,
+            "invoice_count": invoice_count,
+            "average_invoice_value_minor": (total_revenue + invoice_count // 2) // invoice_count if invoice_count else 0,
+            "transaction_count": totals["payments"],
+            "payment_amount_minor": totals["payment_amount_minor"],
+            "group_by": group_by,
+            "series": [
+                {"period_start": period.isoformat(), **dict(zip(ROLLUP_FIELDS, row))}
+                for period, row in zip(periods.astype(datetime).tolist(), sums.tolist())
+            ],
+            "by_status": by_status,
+            "top_customers": top_customers
+        }
+
+    async def outstanding_balance(self, tenant_id: str, as_of: Optional[datetime] = None) -> Dict[str, Any]:
+        """Unpaid invoice totals with aging buckets and the largest debtors, in one aggregation"""
+        as_of = as_of or datetime.utcnow()
+        due_date = {"$ifNull": ["$due_date", as_of]}
+        bucket = {"$switch": {
+            "branches": [{"case": {"$gte": [due_date, as_of]}, "then": "current"}] + [
+                {"case": {"$gte": [due_date, as_of - timedelta(days=days)]}, "then": name}
+                for days, name in AGING_BUCKETS
+            ],
+            "default": AGING_OLDEST
+        }}
+        result = await self.db.invoices.aggregate([
+            {"$match": {"tenant_id": tenant_id, "status": {"$in": UNPAID_STATUSES}}},
+            {"$facet": {
+                "aging": [
+                    {"$group": {"_id": bucket, "amount": {"$sum": "$total_minor"}, "count": {"$sum": 1}}}
+                ],
+                "customers": [
+                    {"$group": {"_id": "$customer_id", "amount": {"$sum": "$total_minor"}, "count": {"$sum": 1}}},
+                    {"$sort": {"amount": -1}},
+                    {"$limit": self.TOP_CUSTOMERS}
+                ]
+            }}
+        ]).to_list(1)
+        facets = result[0] if result else {"aging": [], "customers": []}
+
+        names = ["current"] + [name for _, name in AGING_BUCKETS] + [AGING_OLDEST]
+        aging = {name: {"amount_minor": 0, "count": 0} for name in names}
+        for row in facets["aging"]:
+            aging[row["_id"]] = {"amount_minor": row["amount"], "count": row["count"]}
+        overdue = [values for name, values in aging.items() if name != "current"]
+
+        return {
+            "total_outstanding_minor": sum(values["amount_minor"] for values in aging.values()),
+            "overdue_amount_minor": sum(values["amount_minor"] for values in overdue),
+            "unpaid_invoice_count": sum(values["count"] for values in aging.values()),
+            "overdue_invoice_count": sum(values["count"] for values in overdue),
+            "aging": aging,
+            "top_customers": [
+                {"customer_id": row["_id"], "amount_minor": row["amount"], "invoice_count": row["count"]}
+                for row in facets["customers"]
+            ]
+        }
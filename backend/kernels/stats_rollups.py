@@ -0,0 +1,89 @@
+"""
+Stats Rollups
+Daily per-tenant communication counters, kept current as messages and workflow runs are recorded
+"""
+from typing import Dict, Any, List, Iterable, Optional
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+
+
+COUNTERS = ("messages_total", "messages_delivered", "messages_failed", "workflows_total", "workflows_completed")
+
+
+def day_of(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+
+class StatsRollups:
+    """One communication_rollups document per (tenant, day); outcomes count toward the day the item was created"""
+
+    def __init__(self, communication_kernel):
+        self.kernel = communication_kernel
+        self.db = communication_kernel.db
+
+    # Recording
+    async def increment(self, items: Iterable[Dict[str, Any]], counter: str, amount: int = 1):
+        """Add amount to counter for each item's (tenant_id, created_at day)"""
+        totals: Dict[tuple, int] = {}
+        for item in items:
+            key = (item["tenant_id"], day_of(item.get("created_at") or datetime.utcnow()))
+            totals[key] = totals.get(key, 0) + amount
+        if not totals:
+            return
+        now = datetime.utcnow()
+        await self.db.communication_rollups.bulk_write([
+            UpdateOne(
+                {"tenant_id": tenant_id, "day": day},
+                {"$inc": {counter: count}, "$set": {"updated_at": now}},
+                upsert=True
+            )
+            for (tenant_id, day), count in totals.items()
+        ], ordered=False)
+
+    async def record_workflow_logs(self, logs: List[Dict[str, Any]]):
+        """LogSink flush hook"""
+        await self.increment(logs, "workflows_total")
+        await self.increment([log for log in logs if log.get("status") == "completed"], "workflows_completed")
+
+    # Reading
+    async def read(self, tenant_id: str, start_day: datetime, end_day: datetime) -> Dict[str, Any]:
+        """Summed counters and the daily series for [start_day, end_day]"""
+        daily = await self.db.communication_rollups.find(
+            {"tenant_id": tenant_id, "day": {"$gte": day_of(start_day), "$lte": day_of(end_day)}},
+            {"_id": 0, "day": 1, **{counter: 1 for counter in COUNTERS}}
+        ).sort("day", 1).to_list(None)
+        totals = {counter: sum(doc.get(counter, 0) for doc in daily) for counter in COUNTERS}
+        return {"totals": totals, "daily": daily}
+
+    async def rebuild(self, tenant_id: str, since: Optional[datetime] = None) -> int:
+        """Recompute a tenant's rollups from message_queue and automation_logs, e.g. for data that predates them"""
+        since = day_of(since or datetime.utcnow() - timedelta(days=366))
+        match = {"tenant_id": tenant_id, "created_at": {"$gte": since}}
+        days: Dict[datetime, Dict[str, int]] = {}
+        for collection, prefix, success in (
+            (self.db.message_queue, "messages", "delivered"),
+            (self.db.automation_logs, "workflows", "completed")
+        ):
+            async for row in collection.aggregate([
+                {"$match": match},
+                {"$group": {
+                    "_id": {"y": {"$year": "$created_at"}, "m": {"$month": "$created_at"},
+                            "d": {"$dayOfMonth": "$created_at"}, "status": "$status"},
+                    "count": {"$sum": 1}
+                }}
+            ]):
+                counts = days.setdefault(datetime(row["_id"]["y"], row["_id"]["m"], row["_id"]["d"]),
+                                         {counter: 0 for counter in COUNTERS})
+                counts[f"{prefix}_total"] += row["count"]
+                if row["_id"]["status"] == success:
+                    counts[f"{prefix}_{success}"] += row["count"]
+                elif prefix == "messages" and row["_id"]["status"] == "failed":
+                    counts["messages_failed"] += row["count"]
+
+        now = datetime.utcnow()
+        await self.db.communication_rollups.delete_many({"tenant_id": tenant_id, "day": {"$gte": since}})
+        if days:
+            await self.db.communication_rollups.insert_many([
+                {"tenant_id": tenant_id, "day": day, **counts, "updated_at": now} for day, counts in days.items()
+            ])
+        return len(days)
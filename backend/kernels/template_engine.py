@@ -0,0 +1,142 @@
+"""
+Template Engine
+Message templates compiled once into segment lists, with HTML escaping and filters
+"""
+from typing import Dict, Any, List, Optional, Tuple, Union
+from collections import OrderedDict
+import html
+import re
+
+
+# {name}, {lead.first_name}, {name|upper}, {company|default:there}; anything else in braces is literal text
+PLACEHOLDER = re.compile(r"\{([A-Za-z_][\w.]*)((?:\|\w+(?::[^{}|]*)?)*)\}")
+
+FILTERS = {
+    "upper": lambda value, arg: str(value).upper(),
+    "lower": lambda value, arg: str(value).lower(),
+    "title": lambda value, arg: str(value).title(),
+    "capitalize": lambda value, arg: str(value).capitalize(),
+    "strip": lambda value, arg: str(value).strip(),
+    "truncate": lambda value, arg: str(value)[:int(arg or 80)],
+    "default": lambda value, arg: value if value not in (None, "") else (arg or ""),
+}
+# Filters that decide escaping rather than transforming the value
+ESCAPE_FILTERS = ("escape", "raw")
+
+_MISSING = object()
+
+
+class Placeholder:
+    """One {key|filter:arg} occurrence inside a template"""
+    __slots__ = ("source", "key", "path", "filters", "escape")
+
+    def __init__(self, source: str, key: str, filters: List[Tuple[str, Optional[str]]], escape: bool):
+        self.source = source
+        self.key = key
+        self.path = key.split(".")
+        self.filters = [(FILTERS[name], arg) for name, arg in filters if name not in ESCAPE_FILTERS]
+        self.escape = escape
+
+    def render(self, context: Dict[str, Any]) -> str:
+        value = self._lookup(context)
+        if value is _MISSING:
+            if not any(function is FILTERS["default"] for function, _ in self.filters):
+                # Unknown placeholders are left as written, as the original str.replace rendering did
+                return self.source
+            value = None
+        for function, arg in self.filters:
+            # A missing or None value stays empty through text filters so a later |default still applies
+            if value is not None or function is FILTERS["default"]:
+                value = function(value, arg)
+        text = "" if value is None else str(value)
+        return html.escape(text) if self.escape else text
+
+    def _lookup(self, context: Dict[str, Any]) -> Any:
+        if self.key in context:
+            return context[self.key]
+        value = context
+        for part in self.path:
+            if not isinstance(value, dict) or part not in value:
+                return _MISSING
+            value = value[part]
+        return value
+
+
+def _parse_filters(spec: str) -> List[Tuple[str, Optional[str]]]:
+    filters = []
+    for part in spec.split("|")[1:]:
+        name, _, arg = part.partition(":")
+        if name not in FILTERS and name not in ESCAPE_FILTERS:
+            raise ValueError(f"Unknown template filter: {name}")
+        if name == "truncate" and arg and not arg.isdigit():
+            raise ValueError(f"truncate expects a length: {arg}")
+        filters.append((name, arg or None))
+    return filters
+
+
+class CompiledTemplate:
+    """A template parsed once into literal strings and placeholders"""
+    __slots__ = ("segments",)
+
+    def __init__(self, source: str, autoescape: bool = False, strict: bool = False):
+        """strict raises ValueError on an invalid filter; otherwise that placeholder is literal text,
+        as templates stored before filters existed rendered it"""
+        self.segments: List[Union[str, Placeholder]] = []
+        position = 0
+        for match in PLACEHOLDER.finditer(source or ""):
+            if match.start() > position:
+                self.segments.append(source[position:match.start()])
+            position = match.end()
+            try:
+                filters = _parse_filters(match.group(2))
+            except ValueError:
+                if strict:
+                    raise
+                self.segments.append(match.group(0))
+                continue
+            names = [name for name, _ in filters]
+            escape = "escape" in names or (autoescape and "raw" not in names)
+            self.segments.append(Placeholder(match.group(0), match.group(1), filters, escape))
+        if position < len(source or ""):
+            self.segments.append(source[position:])
+
+    def render(self, context: Dict[str, Any]) -> str:
+        return "".join(
+            segment if segment.__class__ is str else segment.render(context) for segment in self.segments
+        )
+
+
+def validate_template(template: Dict[str, Any]):
+    """Raise ValueError if the template's subject or body uses a filter that does not exist"""
+    for field in ("subject", "body"):
+        CompiledTemplate(template.get(field) or "", strict=True)
+
+
+class TemplateCache:
+    """Compiled subject/body pairs keyed by (template_id, updated_at), least recently used evicted first"""
+
+    SIZE = 1024
+
+    def __init__(self):
+        self._entries: OrderedDict = OrderedDict()
+
+    def get(self, template: Dict[str, Any]) -> Tuple[CompiledTemplate, CompiledTemplate]:
+        key = (template["id"], template.get("updated_at") or template.get("created_at"))
+        compiled = self._entries.get(key)
+        if compiled is None:
+            # HTML templates escape substituted values unless a placeholder says |raw
+            autoescape = template.get("format") == "html"
+            compiled = (
+                CompiledTemplate(template.get("subject", "")),
+                CompiledTemplate(template.get("body", ""), autoescape)
+            )
+            self._entries[key] = compiled
+            while len(self._entries) > self.SIZE:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(key)
+        return compiled
+
+    def invalidate(self, template_id: str):
+        for key in [key for key in self._entries if key[0] == template_id]:
+            del self._entries[key]
@@ -0,0 +1,95 @@
+"""
+Timer Wheel
+Hierarchical timing wheel: O(1) insert and cancel, expiry work proportional to timers that fire
+"""
+from typing import Dict, Any, List, Hashable, Tuple
+import math
+
+
+class TimerWheel:
+    """Timers keyed by id across `levels` wheels of `slots` slots; level l slots are slots**l ticks wide"""
+
+    def __init__(self, start: float, tick: float = 1.0, slots: int = 64, levels: int = 4):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.current = int(start // tick)
+        self._wheels: List[List[Dict[Hashable, Tuple[int, Any]]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._where: Dict[Hashable, Tuple[int, int]] = {}
+        self._ready: Dict[Hashable, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._where) + len(self._ready)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._where or key in self._ready
+
+    @property
+    def span(self) -> float:
+        """How far ahead (in seconds) a timer can always be placed, wherever the wheel is within its top slot"""
+        return (self.slots - 1) * self.slots ** (self.levels - 1) * self.tick
+
+    def add(self, key: Hashable, due: float, payload: Any = None) -> bool:
+        """Schedule payload at time due; False if due is beyond the wheel's span"""
+        self.remove(key)
+        due_tick = math.ceil(due / self.tick)
+        if due_tick <= self.current:
+            self._ready[key] = payload
+            return True
+        return self._place(key, due_tick, payload)
+
+    def _place(self, key: Hashable, due_tick: int, payload: Any) -> bool:
+        width = 1
+        for level in range(self.levels):
+            # Smallest level whose slot for due_tick is less than a full turn ahead of the current one
+            if due_tick // width - self.current // width < self.slots:
+                if due_tick // width == self.current // width:
+                    # Already inside the block being served: due this tick
+                    self._ready[key] = payload
+                    return True
+                slot = (due_tick // width) % self.slots
+                self._wheels[level][slot][key] = (due_tick, payload)
+                self._where[key] = (level, slot)
+                return True
+            width *= self.slots
+        return False
+
+    def remove(self, key: Hashable) -> bool:
+        if key in self._ready:
+            del self._ready[key]
+            return True
+        location = self._where.pop(key, None)
+        if location is None:
+            return False
+        level, slot = location
+        del self._wheels[level][slot][key]
+        return True
+
+    def advance(self, now: float) -> List[Tuple[Hashable, Any]]:
+        """Move the wheel to now and return (key, payload) for every timer that came due"""
+        expired = list(self._ready.items())
+        self._ready.clear()
+        target = int(now // self.tick)
+        while self.current < target:
+            self.current += 1
+            # Cascade from the widest level down so entries can fall through several levels in one tick
+            for level in range(self.levels - 1, 0, -1):
+                width = self.slots ** level
+                if self.current % width == 0:
+                    bucket = self._wheels[level][(self.current // width) % self.slots]
+                    entries = list(bucket.items())
+                    bucket.clear()
+                    for key, (due_tick, payload) in entries:
+                        del self._where[key]
+                        self._place(key, due_tick, payload)
+            bucket = self._wheels[0][self.current % self.slots]
+            for key, (due_tick, payload) in bucket.items():
+                del self._where[key]
+                expired.append((key, payload))
+            bucket.clear()
+            if self._ready:
+                expired.extend(self._ready.items())
+                self._ready.clear()
+        return expired
@@ -0,0 +1,334 @@
+"""
+Utilization Engine
+Vectorized occupancy analytics for the booking kernel
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timedelta
+import numpy as np
+from pymongo import ReplaceOne
+
+
+HOURS_PER_WEEK = 7 * 24
+WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+class UtilizationEngine:
+    """Computes occupancy from bookings and availability schedules with NumPy interval arithmetic"""
+
+    def __init__(self, booking_kernel):
+        self.kernel = booking_kernel
+        self.db = booking_kernel.db
+
+    async def compute_hourly(self, tenant_id: str, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """Available and booked minutes per resource for every hour of the window"""
+        grid_start = start_date.replace(minute=0, second=0, microsecond=0)
+        hours = int(np.ceil((end_date - grid_start).total_seconds() / 3600))
+        span = hours * 60
+        window_start = int((start_date - grid_start).total_seconds() // 60)
+        window_end = int((end_date - grid_start).total_seconds() // 60)
+
+        resources = await self.db.resources.find(
+            {"tenant_id": tenant_id, "is_active": True},
+            {"_id": 0, "id": 1, "name": 1, "type": 1}
+        ).to_list(None)
+        resource_index = {resource["id"]: index for index, resource in enumerate(resources)}
+        schedules = await self.kernel._get_schedules(list(resource_index))
+
+        # Single projected cursor over every booking touching the window
+        booking_resources, booking_starts, booking_ends = [], [], []
+        cursor = self.db.bookings.find(
+            {
+                "tenant_id": tenant_id,
+                "status": {"$in": self.kernel.ACTIVE_STATUSES},
+                "start_time": {"$lt": end_date},
+                "end_time": {"$gt": start_date}
+            },
+            {"_id": 0, "resource_id": 1, "start_time": 1, "end_time": 1}
+        )
+        async for booking in cursor:
+            index = resource_index.get(booking.get("resource_id"))
+            if index is not None:
+                booking_resources.append(index)
+                booking_starts.append(booking["start_time"])
+                booking_ends.append(booking["end_time"])
+
+        resource_count = len(resources)
+        result = {
+            "resources": resources,
+            "grid_start": grid_start,
+            "hours": hours,
+            "available": np.zeros((resource_count, hours)),
+            "booked": np.zeros((resource_count, hours)),
+            "starts": np.zeros((resource_count, hours), dtype=np.int64)
+        }
+        if not resource_count or hours <= 0:
+            return result
+
+        # Opening hours as intervals in minutes from grid_start, on one timeline per resource
+        first_day = grid_start.replace(hour=0)
+        day_count = (end_date - first_day).days + 1
+        day_offsets = np.arange(day_count) * 24 * 60 - int((grid_start - first_day).total_seconds() // 60)
+        day_weekdays = (first_day.weekday() + np.arange(day_count)) % 7
+        avail_starts, avail_ends, avail_owner = [], [], []
+        for index, resource in enumerate(resources):
+            # No schedule means no bookable time, as in BookingKernel.check_availability
+            schedule = schedules.get(resource["id"]) or {}
+            for day_of_week, windows in schedule.items():
+                offsets = day_offsets[day_weekdays == day_of_week] + index * span
+                for window_start_minute, window_end_minute in windows:
+                    avail_starts.append(offsets + window_start_minute)
+                    avail_ends.append(offsets + window_end_minute)
+                    avail_owner.append(np.full(len(offsets), index))
+
+        lower = np.arange(resource_count) * span
+        avail_starts = np.concatenate(avail_starts + [np.zeros(0, dtype=np.int64)])
+        avail_ends = np.concatenate(avail_ends + [np.zeros(0, dtype=np.int64)])
+        avail_owner = np.concatenate(avail_owner + [np.zeros(0, dtype=np.int64)])
+        avail_starts, avail_ends = self._clip(
+            avail_starts, avail_ends, lower[avail_owner] + window_start, lower[avail_owner] + window_end
+        )
+
+        owners = np.array(booking_resources, dtype=np.int64)
+        origin = np.datetime64(grid_start, "m")
+        starts = (np.array(booking_starts, dtype="datetime64[m]") - origin).astype(np.int64) + owners * span
+        ends = (np.array(booking_ends, dtype="datetime64[m]") - origin).astype(np.int64) + owners * span
+        starts_in_window = (starts >= lower[owners] + window_start) & (starts < lower[owners] + window_end)
+        book_starts, book_ends = self._clip(starts, ends, lower[owners] + window_start, lower[owners] + window_end)
+
+        # Sweep: hour marks split segments so each one falls inside a single hour
+        hour_marks = (lower[:, None] + np.arange(hours + 1) * 60).ravel()
+        positions = np.concatenate([avail_starts, avail_ends, book_starts, book_ends, hour_marks])
+        avail_delta = np.concatenate([
+            np.ones(len(avail_starts)), -np.ones(len(avail_ends)), np.zeros(2 * len(book_starts) + len(hour_marks))
+        ])
+        book_delta = np.concatenate([
+            np.zeros(2 * len(avail_starts)), np.ones(len(book_starts)), -np.ones(len(book_ends)),
+            np.zeros(len(hour_marks))
+        ])
+        order = np.argsort(positions, kind="stable")
+        positions = positions[order]
+        open_now = np.cumsum(avail_delta[order])[:-1] > 0
+        busy_now = np.cumsum(book_delta[order])[:-1] > 0
+        lengths = np.diff(positions)
+        segment_owner = positions[:-1] // span
+        segment_hour = (positions[:-1] % span) // 60
+        cells = segment_owner * hours + segment_hour
+        valid = (segment_owner < resource_count) & (lengths > 0)
+
+        cell_count = resource_count * hours
+        result["available"] = np.bincount(
+            cells[valid], weights=(lengths * open_now)[valid], minlength=cell_count
+        ).reshape(resource_count, hours)
+        result["booked"] = np.bincount(
+            cells[valid], weights=(lengths * (open_now & busy_now))[valid], minlength=cell_count
+        ).reshape(resource_count, hours)
+        start_owners = owners[starts_in_window]
+        start_cells = start_owners * hours + (starts[starts_in_window] - lower[start_owners]) // 60
+        result["starts"] = np.bincount(start_cells, minlength=cell_count).reshape(resource_count, hours)
+        return result
+
+    @staticmethod
+    def _clip(starts: np.ndarray, ends: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        """Clip intervals to bounds, dropping the ones left empty"""
+        starts = np.maximum(starts, lower)
+        ends = np.minimum(ends, upper)
+        keep = ends > starts
+        return starts[keep], ends[keep]
+
+    def _to_hour_of_week(self, hourly: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Fold per-hour arrays into per-resource hour-of-week totals"""
+        grid_start = hourly["grid_start"]
+        how_index = (grid_start.weekday() * 24 + grid_start.hour + np.arange(hourly["hours"])) % HOURS_PER_WEEK
+        totals = {}
+        for key in ("available", "booked", "starts"):
+            folded = np.zeros((len(hourly["resources"]), HOURS_PER_WEEK))
+            np.add.at(folded, (slice(None), how_index), hourly[key])
+            totals[key] = folded
+
+        return {
+            resource["id"]: {
+                "name": resource.get("name"),
+                "type": resource.get("type"),
+                "available": totals["available"][index],
+                "booked": totals["booked"][index],
+                "bookings": int(totals["starts"][index].sum())
+            }
+            for index, resource in enumerate(hourly["resources"])
+        }
+
+    # Daily Rollups
+    async def refresh_rollups(self, tenant_id: str, start_day: datetime, end_day: datetime) -> int:
+        """Recompute and persist daily rollups for [start_day, end_day)"""
+        start_day = start_day.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_day = end_day.replace(hour=0, minute=0, second=0, microsecond=0)
+        if end_day <= start_day:
+            return 0
+
+        hourly = await self.compute_hourly(tenant_id, start_day, end_day)
+        day_count = (end_day - start_day).days
+        shape = (len(hourly["resources"]), day_count, 24)
+        available = np.rint(hourly["available"].reshape(shape)).astype(np.int64)
+        booked = np.rint(hourly["booked"].reshape(shape)).astype(np.int64)
+        starts = hourly["starts"].reshape(shape).sum(axis=2)
+
+        operations = []
+        for day in range(day_count):
+            date = start_day + timedelta(days=day)
+            operations.append(ReplaceOne(
+                {"tenant_id": tenant_id, "date": date},
+                {
+                    "tenant_id": tenant_id,
+                    "date": date,
+                    "resources": [
+                        {
+                            "resource_id": resource["id"],
+                            "name": resource.get("name"),
+                            "type": resource.get("type"),
+                            "available": available[index, day].tolist(),
+                            "booked": booked[index, day].tolist(),
+                            "bookings": int(starts[index, day])
+                        }
+                        for index, resource in enumerate(hourly["resources"])
+                    ],
+                    "updated_at": datetime.utcnow()
+                },
+                upsert=True
+            ))
+        await self.db.booking_utilization_daily.bulk_write(operations, ordered=False)
+        return day_count
+
+    async def invalidate_rollups(self, tenant_id: str, windows: Optional[List[Tuple[datetime, datetime]]] = None):
+        """Drop the rollups of past days touched by changed bookings, or all of them (windows=None) when
+        opening hours change; the next report recomputes them"""
+        if windows is None:
+            await self.db.booking_utilization_daily.delete_many({"tenant_id": tenant_id})
+            return
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        days = set()
+        for start_time, end_time in windows:
+            day = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+            while day < min(end_time, today):
+                days.add(day)
+                day += timedelta(days=1)
+        if days:
+            await self.db.booking_utilization_daily.delete_many({"tenant_id": tenant_id, "date": {"$in": sorted(days)}})
+
+    async def _collect(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                       use_rollups: bool) -> Dict[str, Dict[str, Any]]:
+        """Hour-of-week totals per resource, served from rollups for complete past days"""
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        first_full = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if first_full < start_date:
+            first_full += timedelta(days=1)
+        last_full = min(end_date.replace(hour=0, minute=0, second=0, microsecond=0), today)
+
+        if not use_rollups or last_full <= first_full:
+            hourly = await self.compute_hourly(tenant_id, start_date, end_date)
+            return self._to_hour_of_week(hourly)
+
+        wanted = [first_full + timedelta(days=day) for day in range((last_full - first_full).days)]
+        rollups = await self.db.booking_utilization_daily.find(
+            {"tenant_id": tenant_id, "date": {"$gte": first_full, "$lt": last_full}},
+            {"_id": 0, "date": 1, "resources": 1}
+        ).to_list(None)
+        have = {rollup["date"] for rollup in rollups}
+        missing = [day for day in wanted if day not in have]
+        if missing:
+            await self.refresh_rollups(tenant_id, missing[0], missing[-1] + timedelta(days=1))
+            rollups = await self.db.booking_utilization_daily.find(
+                {"tenant_id": tenant_id, "date": {"$gte": first_full, "$lt": last_full}},
+                {"_id": 0, "date": 1, "resources": 1}
+            ).to_list(None)
+
+        totals = {}
+        for rollup in rollups:
+            offset = rollup["date"].weekday() * 24
+            for entry in rollup["resources"]:
+                resource = totals.setdefault(entry["resource_id"], {
+                    "name": entry.get("name"),
+                    "type": entry.get("type"),
+                    "available": np.zeros(HOURS_PER_WEEK),
+                    "booked": np.zeros(HOURS_PER_WEEK),
+                    "bookings": 0
+                })
+                resource["available"][offset:offset + 24] += entry["available"]
+                resource["booked"][offset:offset + 24] += entry["booked"]
+                resource["bookings"] += entry["bookings"]
+
+        # Partial days at either end (and anything from today onwards) come from raw bookings
+        for edge_start, edge_end in ((start_date, first_full), (last_full, end_date)):
+            if edge_end > edge_start:
+                edge = self._to_hour_of_week(await self.compute_hourly(tenant_id, edge_start, edge_end))
+                for resource_id, values in edge.items():
+                    if resource_id not in totals:
+                        totals[resource_id] = values
+                        continue
+                    totals[resource_id]["available"] = totals[resource_id]["available"] + values["available"]
+                    totals[resource_id]["booked"] = totals[resource_id]["booked"] + values["booked"]
+                    totals[resource_id]["bookings"] += values["bookings"]
+        return totals
+
+    # Reports
+    async def report(self, tenant_id: str, start_date: datetime, end_date: datetime,
+                     use_rollups: bool = True) -> Dict[str, Any]:
+        """Occupancy per resource, per resource type and per hour of week"""
+        totals = await self._collect(tenant_id, start_date, end_date, use_rollups)
+
+        by_resource = []
+        by_type = {}
+        heat_available = np.zeros(HOURS_PER_WEEK)
+        heat_booked = np.zeros(HOURS_PER_WEEK)
+        for resource_id, values in totals.items():
+            available = float(values["available"].sum())
+            booked = float(values["booked"].sum())
+            by_resource.append({
+                "resource_id": resource_id,
+                "name": values["name"],
+                "type": values["type"],
+                "bookings": values["bookings"],
+                "available_hours": round(available / 60, 2),
+                "booked_hours": round(booked / 60, 2),
+                "occupancy_percentage": self._percentage(booked, available)
+            })
+            type_totals = by_type.setdefault(values["type"] or "unspecified", [0.0, 0.0, 0])
+            type_totals[0] += available
+            type_totals[1] += booked
+            type_totals[2] += 1
+            heat_available += values["available"]
+            heat_booked += values["booked"]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            heatmap = np.where(heat_available > 0, heat_booked / heat_available * 100, 0.0)
+        total_available = float(heat_available.sum())
+        total_booked = float(heat_booked.sum())
+
+        return {
+            "total_bookings": sum(resource["bookings"] for resource in by_resource),
+            "total_resources": len(by_resource),
+            "period": {
+                "start_date": start_date.isoformat(),
+                "end_date": end_date.isoformat()
+            },
+            "available_hours": round(total_available / 60, 2),
+            "booked_hours": round(total_booked / 60, 2),
+            "occupancy_percentage": self._percentage(total_booked, total_available),
+            "by_resource": sorted(by_resource, key=lambda resource: -resource["occupancy_percentage"]),
+            "by_type": {
+                resource_type: {
+                    "resources": count,
+                    "available_hours": round(available / 60, 2),
+                    "booked_hours": round(booked / 60, 2),
+                    "occupancy_percentage": self._percentage(booked, available)
+                }
+                for resource_type, (available, booked, count) in by_type.items()
+            },
+            "heatmap": {
+                "days": WEEKDAY_NAMES,
+                "hours": list(range(24)),
+                "occupancy_percentage": np.round(heatmap.reshape(7, 24), 1).tolist()
+            }
+        }
+
+    @staticmethod
+    def _percentage(part: float, whole: float) -> float:
+        return round(part / whole * 100, 1) if whole > 0 else 0
@@ -0,0 +1,201 @@
+"""
+Workflow Router
+Per-tenant event -> workflow routing tables built from module definitions and tenant workflows
+"""
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from datetime import datetime
+import operator
+import time
+
+
+ACTION_TYPES = ("send_message", "update_status", "webhook")
+# Module recipients naming the person behind the event, and the context field holding their address.
+# Group recipients (all_members, facility_manager, ...) have no address in the event and are skipped.
+ROLE_RECIPIENTS = {role: "user_email" for role in ("client", "requester", "resident", "artist", "member", "guest")}
+# Status values update_status may write per entity; lead mirrors LeadStatus in server.py. Bookings are
+# left out because their status changes go through BookingKernel, which keeps slot guards in step.
+ENTITY_STATUSES = {
+    "lead": ("new_inquiry", "tour_scheduled", "tour_completed", "converted", "closed"),
+    "tour": ("scheduled", "completed", "cancelled", "no_show")
+}
+CONDITION_OPERATORS = {
+    "==": operator.eq, "!=": operator.ne, ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le,
+    "in": lambda value, options: value in options
+}
+
+
+class RoutingTable:
+    """One tenant's workflows grouped by trigger event"""
+    __slots__ = ("version", "checked_at", "routes")
+
+    def __init__(self, version: int, routes: Dict[str, List[Dict[str, Any]]]):
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.routes = routes
+
+
+class WorkflowRouter:
+    """Resolves an event to its workflows from memory, rebuilding a tenant's table when its version moves"""
+
+    # A cached table is trusted this long before one version read confirms it is still current
+    VERSION_CHECK_SECONDS = 5
+
+    def __init__(self, communication_kernel):
+        self.kernel = communication_kernel
+        self.db = communication_kernel.db
+        self._tables: Dict[str, RoutingTable] = {}
+        self._module_workflows: Optional[Callable[[str], Awaitable[List[Dict[str, Any]]]]] = None
+
+    def set_module_source(self, source: Callable[[str], Awaitable[List[Dict[str, Any]]]]):
+        """Provide the tenant's module workflow definitions (the platform core passes its module loader)"""
+        self._module_workflows = source
+        self._tables.clear()
+
+    async def route(self, tenant_id: str, event: str,
+                    context: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Workflows for the event whose conditions the context satisfies"""
+        table = self._tables.get(tenant_id)
+        if table is None:
+            table = await self._build(tenant_id)
+        elif time.monotonic() - table.checked_at > self.VERSION_CHECK_SECONDS:
+            version = await self._read_version(tenant_id)
+            if version != table.version:
+                table = await self._build(tenant_id)
+            else:
+                table.checked_at = time.monotonic()
+        return [
+            workflow for workflow in table.routes.get(event, [])
+            if self._matches(workflow["conditions"], context or {})
+        ]
+
+    async def bump_version(self, tenant_id: str):
+        """Mark a tenant's workflows changed, here and (within VERSION_CHECK_SECONDS) in other processes"""
+        await self.db.workflow_versions.update_one(
+            {"_id": tenant_id},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self._tables.pop(tenant_id, None)
+
+    def invalidate(self, tenant_id: Optional[str] = None):
+        """Drop cached tables, e.g. after a tenant's module is reloaded"""
+        if tenant_id is None:
+            self._tables.clear()
+        else:
+            self._tables.pop(tenant_id, None)
+
+    async def _read_version(self, tenant_id: str) -> int:
+        doc = await self.db.workflow_versions.find_one({"_id": tenant_id}, {"version": 1})
+        return doc["version"] if doc else 0
+
+    async def _build(self, tenant_id: str) -> RoutingTable:
+        # Read the version first so a change made while building forces the next check to rebuild
+        version = await self._read_version(tenant_id)
+        workflows: Dict[str, Dict[str, Any]] = {}
+        module_workflows = []
+        if self._module_workflows:
+            try:
+                module_workflows = await self._module_workflows(tenant_id) or []
+            except ValueError:
+                # Unknown tenant: only its own workflow documents apply
+                module_workflows = []
+        for workflow in module_workflows:
+            workflows[workflow["name"]] = {**workflow, "id": f"module:{workflow['name']}", "source": "module"}
+
+        # Tenant workflows override module workflows of the same name; an inactive one switches it off
+        async for workflow in self.db.workflows.find({"tenant_id": tenant_id}, {"_id": 0}):
+            key = workflow.get("name") or workflow.get("id")
+            if workflow.get("is_active", True):
+                workflows[key] = {**workflow, "source": "tenant"}
+            else:
+                workflows.pop(key, None)
+
+        # Module actions name templates by template_type; map them to this tenant's templates
+        templates = {}
+        async for template in self.db.message_templates.find(
+            {"tenant_id": tenant_id, "is_active": {"$ne": False}}, {"_id": 0, "id": 1, "template_type": 1}
+        ):
+            templates[template["id"]] = template["id"]
+            if template.get("template_type"):
+                templates.setdefault(template["template_type"], template["id"])
+
+        routes: Dict[str, List[Dict[str, Any]]] = {}
+        for workflow in workflows.values():
+            compiled = self._compile(workflow, templates)
+            if compiled and compiled["actions"]:
+                routes.setdefault(compiled["trigger_event"], []).append(compiled)
+        table = RoutingTable(version, routes)
+        self._tables[tenant_id] = table
+        return table
+
+    @classmethod
+    def _compile(cls, workflow: Dict[str, Any], templates: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Normalize the trigger and conditions and keep only actions the kernel can execute;
+        None when the conditions cannot be evaluated"""
+        trigger = workflow.get("trigger_event")
+        conditions = []
+        for condition in workflow.get("conditions") or []:
+            op = condition.get("operator", "==")
+            if op not in CONDITION_OPERATORS or not condition.get("field"):
+                print(f"⚠️  Workflow {workflow.get('name')} skipped: unsupported condition {condition}")
+                return None
+            conditions.append((condition["field"], op, condition.get("value")))
+
+        actions = []
+        for action in workflow.get("actions", []):
+            resolved = cls._resolve_action(action, templates, workflow.get("source") == "module")
+            if resolved:
+                actions.append(resolved)
+        return {
+            **workflow,
+            "trigger_event": getattr(trigger, "value", trigger),
+            "conditions": conditions,
+            "actions": actions
+        }
+
+    @staticmethod
+    def _resolve_action(action: Dict[str, Any], templates: Dict[str, str],
+                        from_module: bool) -> Optional[Dict[str, Any]]:
+        """The action as the kernel executes it, or None if it cannot run for this tenant"""
+        action_type = action.get("type")
+        if action_type == "update_status":
+            if action.get("status") not in ENTITY_STATUSES.get(action.get("entity_type"), ()):
+                return None
+            return action
+        if not from_module:
+            return action if action_type in ACTION_TYPES else None
+
+        # Module definitions are shared by every tenant: resolve their role and template names
+        if action_type == "send_message":
+            template_id = templates.get(action.get("template_id"))
+            recipient = action.get("recipient")
+            if not template_id:
+                return None
+            if recipient in ROLE_RECIPIENTS:
+                return {**action, "template_id": template_id, "recipient": None,
+                        "recipient_field": ROLE_RECIPIENTS[recipient]}
+            if recipient and "@" not in str(recipient):
+                return None
+            return {**action, "template_id": template_id}
+        if action_type == "webhook":
+            # Relative platform paths have no host to deliver to
+            return action if str(action.get("url", "")).startswith(("http://", "https://")) else None
+        return None
+
+    @staticmethod
+    def _matches(conditions: List[tuple], context: Dict[str, Any]) -> bool:
+        for field, op, value in conditions:
+            if field not in context:
+                return False
+            try:
+                if not CONDITION_OPERATORS[op](context[field], value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_tenants": len(self._tables),
+            "routes": sum(len(table.routes) for table in self._tables.values())
+        }
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Migrate stored money amounts from floats to integer minor units
+Safe to rerun: only documents that still carry the old float fields are touched
+"""
+import asyncio
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from kernels.financial_kernel import FinancialKernel
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Database connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+async def main():
+    financial_kernel = FinancialKernel(db)
+    print("💱 Migrating money fields to integer minor units...")
+    migrated = await financial_kernel.migrate_money_to_minor_units()
+    for collection_name, count in migrated.items():
+        print(f"✅ {collection_name}: {count} documents")
+    print("ℹ️  Revenue rollups were cleared and rebuild on the next report")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Message dispatcher - delivers queued emails, webhooks and notifications
+Usage: python run_message_dispatcher.py [--workers N] [--once]
+"""
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from kernels.communication_kernel import CommunicationKernel
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Database connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Deliver queued messages")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent dispatcher workers")
+    parser.add_argument("--once", action="store_true", help="Exit once nothing is due instead of polling")
+    args = parser.parse_args()
+    
+    communication_kernel = CommunicationKernel(db)
+    await communication_kernel.initialize()
+    
+    print(f"📨 Dispatching messages with {args.workers} workers...")
+    try:
+        stats = await communication_kernel.dispatch_messages(workers=args.workers, drain=args.once)
+        worker = stats["worker"]
+        print(f"✅ Delivered {worker['delivered']} ({worker['delivered_per_second']}/s), "
+              f"retrying {worker['retried']}, dead-lettered {worker['dead_lettered']}")
+        if stats["queued"]:
+            print(f"ℹ️  {stats['queued']} messages still queued, oldest due {stats['lag_seconds']}s ago")
+    finally:
+        for adapter in set((communication_kernel.dispatcher.adapters or {}).values()):
+            await adapter.close()
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Nightly subscription billing - invoices every due subscription across all tenants
+Usage: python run_subscription_billing.py [--tenant TENANT_ID] [--resume RUN_ID]
+"""
+import argparse
+import asyncio
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from kernels.financial_kernel import FinancialKernel
+
+# Load environment variables
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Database connection
+mongo_url = os.environ['MONGO_URL']
+client = AsyncIOMotorClient(mongo_url)
+db = client[os.environ['DB_NAME']]
+
+async def main():
+    parser = argparse.ArgumentParser(description="Bill due subscriptions")
+    parser.add_argument("--tenant", help="Only bill this tenant")
+    parser.add_argument("--resume", help="Resume an interrupted run by its id")
+    args = parser.parse_args()
+    
+    financial_kernel = FinancialKernel(db)
+    await financial_kernel.initialize()
+    
+    print("💳 Running subscription billing...")
+    report = await financial_kernel.run_subscription_billing(tenant_id=args.tenant, run_id=args.resume)
+    print(f"✅ Run {report['run_id']}: {report['invoices']} invoices for {report['subscriptions']} subscriptions "
+          f"in {report['elapsed_seconds']}s ({report['subscriptions_per_second']}/s)")
+    if report["already_billed"]:
+        print(f"ℹ️  {report['already_billed']} periods were already invoiced by an earlier run")
+    if report["skipped"]:
+        print(f"⚠️  {report['skipped']} subscriptions skipped (no price or unknown billing interval)")
+    if report["failed_chunks"]:
+        print(f"❌ {report['failed_chunks']} chunks failed - rerun with --resume {report['run_id']}")
+        for error in report["errors"]:
+            print(f"   {error}")
+    
+    snapshots = await financial_kernel.take_balance_snapshots()
+    print(f"📒 Snapshotted {snapshots} customer balances")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
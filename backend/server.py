@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -9,14 +9,17 @@ from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any, Union
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
 import jwt
 from passlib.context import CryptContext
 from enum import Enum
+from email.utils import format_datetime
 import json
 
 # Import the new core platform
 from claude_platform_core import initialize_platform, get_platform_core
+from kernels.communication_kernel import TriggerEvent
 
 # Import Enhanced CMS Engine
 from cms_engine.coworking_cms import CoworkingCMSEngine
@@ -246,6 +249,20 @@ class Tour(BaseModel):
     notes: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Booking Models
+class Booking(BaseModel):
+    id: str
+    tenant_id: str
+    resource_id: str
+    user_id: Optional[str] = None
+    group_id: Optional[str] = None  # Shared by bookings made together (room + equipment)
+    start_time: datetime
+    end_time: datetime
+    status: str = "confirmed"
+    attendees: int = 1
+    notes: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
 # Request/Response Models
 class TenantCreate(BaseModel):
     name: str
@@ -330,6 +347,95 @@ class TourBooking(BaseModel):
     company: Optional[str] = None
     notes: Optional[str] = None
 
+class BookingCreate(BaseModel):
+    resource_id: str
+    additional_resource_ids: List[str] = Field(default_factory=list)  # Equipment, catering, AV...
+    start_time: datetime
+    end_time: datetime
+    attendees: int = 1
+    notes: Optional[str] = None
+
+class BookingHoldCreate(BookingCreate):
+    hold_seconds: Optional[int] = None  # Capped by the booking kernel
+
+class BookingHold(BaseModel):
+    id: str
+    resource_ids: List[str]
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
+
+class BookingHoldConfirm(BaseModel):
+    attendees: Optional[int] = None
+    notes: Optional[str] = None
+
+class RecurrenceRule(BaseModel):
+    frequency: str = "weekly"  # daily, weekly, monthly
+    interval: int = 1
+    by_weekday: List[int] = Field(default_factory=list)  # 0=Monday, 6=Sunday
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+
+class RecurringBookingCreate(BookingCreate):
+    recurrence: RecurrenceRule
+
+class BookingSeriesUpdate(BaseModel):
+    from_time: datetime  # This occurrence and all following ones
+    status: Optional[str] = None
+    attendees: Optional[int] = None
+    notes: Optional[str] = None
+
+class AvailabilityWindow(BaseModel):
+    day_of_week: int  # 0=Monday, 6=Sunday
+    start_time: str  # "HH:MM"
+    end_time: str
+
+class AvailabilityScheduleBulk(BaseModel):
+    schedules: Dict[str, List[AvailabilityWindow]]  # resource_id -> weekly windows
+
+class AvailabilitySearch(BaseModel):
+    date_from: datetime
+    date_to: datetime
+    duration_minutes: int
+    resource_type: Optional[str] = None
+    resource_ids: List[str] = Field(default_factory=list)
+    step_minutes: int = 30
+    attendees: int = 1
+    add_ons: List[str] = Field(default_factory=list)
+    limit: int = 1000
+
+class QuoteItem(BaseModel):
+    resource_id: str
+    start_time: datetime
+    end_time: datetime
+
+class QuoteRequest(BaseModel):
+    items: List[QuoteItem]
+    attendees: int = 1
+    add_ons: List[str] = Field(default_factory=list)
+
+class InvoiceLineItemCreate(BaseModel):
+    description: str
+    quantity: float = 1
+    unit_price: Decimal  # Major units; stored as integer minor units
+    product_id: Optional[str] = None
+
+class InvoiceCreate(BaseModel):
+    customer_id: str
+    currency: Optional[str] = None
+    line_items: List[InvoiceLineItemCreate]
+    due_date: Optional[datetime] = None
+
+class InvoiceBatchCreate(BaseModel):
+    invoices: List[InvoiceCreate]
+
+class BroadcastCreate(BaseModel):
+    template_id: str
+    audience: str = "leads"  # leads, users
+    segment: Dict[str, Any] = Field(default_factory=dict)  # e.g. {"status": ["new_inquiry"], "created_after": "..."}
+    context: Dict[str, Any] = Field(default_factory=dict)  # Extra template variables shared by every recipient
+    scheduled_for: Optional[datetime] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -630,6 +736,12 @@ async def create_page(
     
     page = Page(**page_data.dict(), tenant_id=current_user.tenant_id)
     await db.pages.insert_one(page.dict())
+    
+    if page.status == PageStatus.PUBLISHED:
+        core = await get_platform_core(db)
+        await core.publish_event(current_user.tenant_id, TriggerEvent.PAGE_PUBLISHED, {
+            "page_id": page.id, "title": page.title, "slug": page.slug, "user_id": current_user.id
+        })
     return page
 
 @api_router.get("/cms/pages/{page_id}", response_model=Page)
@@ -756,6 +868,7 @@ async def submit_form(
         "tenant_id": form["tenant_id"],
         "email": lead_data["email"]
     })
+    core = await get_platform_core(db)
     
     if existing_lead:
         # Update existing lead
@@ -772,9 +885,20 @@ async def submit_form(
         lead = Lead(**lead_data)
         await db.leads.insert_one(lead.dict())
         lead_id = lead.id
+        await core.publish_event(form["tenant_id"], TriggerEvent.LEAD_CREATED, {
+            **lead_event_context(lead.dict()), "form_id": form_id
+        })
     
-    # Store form submission
-    await db.form_submissions.insert_one({
+    # Store form submission; staff notifications are written with it and sent in the background
+    notification_context = {
+        "form_name": form["name"],
+        "first_name": lead_data["first_name"],
+        "last_name": lead_data["last_name"],
+        "email": lead_data["email"],
+        "phone": lead_data["phone"],
+        "summary": "\n".join(f"{key}: {value}" for key, value in submission.data.items())
+    }
+    await core.get_kernel('communication').insert_with_notifications(form["tenant_id"], "form_submissions", {
         "id": str(uuid.uuid4()),
         "form_id": form_id,
         "lead_id": lead_id,
@@ -783,13 +907,26 @@ async def submit_form(
         "ip_address": request.client.host,
         "user_agent": request.headers.get("user-agent"),
         "created_at": datetime.utcnow()
-    })
-    
-    # TODO: Send notification emails to form.email_notifications
+    }, [
+        {"template": "form_submission_notification", "recipient": address, "context": notification_context}
+        for address in form.get("email_notifications", [])
+    ])
     
     return {"message": "Form submitted successfully", "lead_id": lead_id}
 
 # Lead Management Routes
+def lead_event_context(lead: Dict[str, Any]) -> Dict[str, Any]:
+    """Workflow context for lead events; user_email is the default message recipient"""
+    return {
+        "lead_id": lead["id"],
+        "user_email": lead.get("email"),
+        "first_name": lead.get("first_name"),
+        "last_name": lead.get("last_name"),
+        "company": lead.get("company"),
+        "status": lead.get("status"),
+        "source": lead.get("source")
+    }
+
 @api_router.get("/leads", response_model=List[Lead])
 async def get_leads(
     status: Optional[LeadStatus] = None,
@@ -844,11 +981,14 @@ async def update_lead(
     update_data["updated_at"] = datetime.utcnow()
     
     # Handle status changes
-    if "status" in update_data:
+    status_event = None
+    if "status" in update_data and update_data["status"] != lead.get("status"):
         if update_data["status"] == LeadStatus.CONVERTED:
             update_data["converted_at"] = datetime.utcnow()
+            status_event = TriggerEvent.LEAD_CONVERTED
         elif update_data["status"] == LeadStatus.TOUR_COMPLETED:
             update_data["tour_completed_at"] = datetime.utcnow()
+            status_event = TriggerEvent.TOUR_COMPLETED
     
     await db.leads.update_one(
         {"id": lead_id},
@@ -856,6 +996,12 @@ async def update_lead(
     )
     
     updated_lead = await db.leads.find_one({"id": lead_id})
+    if "status" in update_data and update_data["status"] != lead.get("status"):
+        core = await get_platform_core(db)
+        # Follow-ups scheduled for the lead's previous stage no longer apply
+        await core.get_kernel('communication').cancel_scheduled_actions(current_user.tenant_id, "lead", lead_id)
+        if status_event:
+            await core.publish_event(current_user.tenant_id, status_event, lead_event_context(updated_lead))
     return Lead(**updated_lead)
 
 # Tour Management Routes
@@ -907,6 +1053,7 @@ async def book_tour(tour_data: TourBooking):
         raise HTTPException(status_code=400, detail="Tour slot is fully booked")
     
     # Create or find lead
+    core = await get_platform_core(db)
     lead_id = tour_data.lead_id
     if not lead_id:
         # Create new lead from tour booking
@@ -924,6 +1071,7 @@ async def book_tour(tour_data: TourBooking):
         )
         await db.leads.insert_one(lead.dict())
         lead_id = lead.id
+        await core.publish_event(slot["tenant_id"], TriggerEvent.LEAD_CREATED, lead_event_context(lead.dict()))
     else:
         # Update existing lead
         await db.leads.update_one(
@@ -943,9 +1091,28 @@ async def book_tour(tour_data: TourBooking):
         scheduled_at=slot["date"],
         staff_user_id=slot["staff_user_id"]
     )
-    await db.tours.insert_one(tour.dict())
-    
-    # TODO: Send confirmation email to lead and notification to staff
+    # Confirmation to the lead and notification to staff are written with the tour and sent in the background
+    notification_context = {
+        "first_name": tour_data.first_name,
+        "last_name": tour_data.last_name,
+        "email": tour_data.email,
+        "phone": tour_data.phone,
+        "scheduled_at": tour.scheduled_at.strftime("%A, %B %d at %H:%M UTC")
+    }
+    await core.get_kernel('communication').insert_with_notifications(slot["tenant_id"], "tours", tour.dict(), [
+        {"template": "tour_confirmation", "recipient": tour_data.email, "context": notification_context},
+        {"template": "tour_booked_notification", "recipient_user_id": tour.staff_user_id,
+         "context": notification_context}
+    ])
+    await core.publish_event(slot["tenant_id"], TriggerEvent.TOUR_SCHEDULED, {
+        "tour_id": tour.id,
+        "lead_id": lead_id,
+        "user_email": tour_data.email,
+        "first_name": tour_data.first_name,
+        "last_name": tour_data.last_name,
+        "scheduled_at": tour.scheduled_at,
+        "staff_user_id": tour.staff_user_id
+    })
     
     return {"message": "Tour booked successfully", "tour_id": tour.id, "lead_id": lead_id}
 
@@ -956,6 +1123,529 @@ async def get_tours(
     tours = await db.tours.find({"tenant_id": current_user.tenant_id}).sort("scheduled_at", 1).to_list(1000)
     return [Tour(**tour) for tour in tours]
 
+# Booking Routes
+def to_utc_naive(value: datetime) -> datetime:
+    """Normalize request datetimes to the naive UTC values stored in MongoDB"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@api_router.get("/bookings", response_model=List[Booking])
+async def get_bookings(current_user: User = Depends(get_current_user)):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    bookings = await booking_kernel.get_bookings(current_user.tenant_id)
+    return [Booking(**booking) for booking in bookings]
+
+@api_router.post("/bookings", response_model=List[Booking])
+async def create_booking(
+    booking_data: BookingCreate,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    
+    resource_ids = [booking_data.resource_id, *booking_data.additional_resource_ids]
+    resources = await booking_kernel.get_resources(current_user.tenant_id, {"id": {"$in": resource_ids}})
+    if len(resources) != len(set(resource_ids)):
+        raise HTTPException(status_code=404, detail="Resource not found")
+    
+    booking_fields = booking_data.dict(exclude={"resource_id", "additional_resource_ids"})
+    booking_fields.update({
+        "user_id": current_user.id,
+        "start_time": to_utc_naive(booking_data.start_time),
+        "end_time": to_utc_naive(booking_data.end_time)
+    })
+    
+    try:
+        bookings = await booking_kernel.create_multi_resource_booking(
+            current_user.tenant_id, booking_fields, resource_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return [Booking(**booking) for booking in bookings]
+
+@api_router.post("/bookings/holds", response_model=BookingHold)
+async def create_booking_hold(
+    hold_data: BookingHoldCreate,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    
+    resource_ids = [hold_data.resource_id, *hold_data.additional_resource_ids]
+    resources = await booking_kernel.get_resources(current_user.tenant_id, {"id": {"$in": resource_ids}})
+    if len(resources) != len(set(resource_ids)):
+        raise HTTPException(status_code=404, detail="Resource not found")
+    
+    hold_fields = hold_data.dict(exclude={"resource_id", "additional_resource_ids", "hold_seconds"})
+    hold_fields.update({
+        "user_id": current_user.id,
+        "start_time": to_utc_naive(hold_data.start_time),
+        "end_time": to_utc_naive(hold_data.end_time)
+    })
+    
+    try:
+        hold = await booking_kernel.create_hold(
+            current_user.tenant_id, hold_fields, resource_ids, hold_data.hold_seconds
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return BookingHold(**hold)
+
+@api_router.post("/bookings/holds/{hold_id}/confirm", response_model=List[Booking])
+async def confirm_booking_hold(
+    hold_id: str,
+    confirm_data: BookingHoldConfirm,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    
+    try:
+        bookings = await booking_kernel.confirm_hold(
+            current_user.tenant_id, hold_id, confirm_data.dict(exclude_none=True)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return [Booking(**booking) for booking in bookings]
+
+@api_router.delete("/bookings/holds/{hold_id}")
+async def release_booking_hold(
+    hold_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    
+    if not await booking_kernel.release_hold(current_user.tenant_id, hold_id):
+        raise HTTPException(status_code=404, detail="Hold not found")
+    return {"message": "Hold released"}
+
+@api_router.post("/bookings/recurring")
+async def create_recurring_booking(
+    booking_data: RecurringBookingCreate,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    
+    resource_ids = [booking_data.resource_id, *booking_data.additional_resource_ids]
+    resources = await booking_kernel.get_resources(current_user.tenant_id, {"id": {"$in": resource_ids}})
+    if len(resources) != len(set(resource_ids)):
+        raise HTTPException(status_code=404, detail="Resource not found")
+    
+    rule = booking_data.recurrence.dict()
+    if rule["until"]:
+        rule["until"] = to_utc_naive(rule["until"])
+    booking_fields = booking_data.dict(exclude={"resource_id", "additional_resource_ids", "recurrence"})
+    booking_fields.update({
+        "user_id": current_user.id,
+        "start_time": to_utc_naive(booking_data.start_time),
+        "end_time": to_utc_naive(booking_data.end_time)
+    })
+    
+    try:
+        result = await booking_kernel.create_recurring_booking(
+            current_user.tenant_id, booking_fields, rule, resource_ids
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "series_id": result["series"]["id"],
+        "occurrence_count": result["series"]["occurrence_count"],
+        "booked_count": result["series"]["booked_count"],
+        "occurrences": result["occurrences"],
+        "bookings": [Booking(**booking) for booking in result["bookings"]]
+    }
+
+@api_router.post("/bookings/search")
+async def search_priced_availability(
+    search: AvailabilitySearch,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    start_date = to_utc_naive(search.date_from)
+    end_date = to_utc_naive(search.date_to)
+    if end_date <= start_date or end_date - start_date > timedelta(days=31):
+        raise HTTPException(status_code=400, detail="Search window must be between 1 minute and 31 days")
+    
+    try:
+        return await core.search_priced_availability(
+            current_user.tenant_id,
+            start_date=start_date,
+            end_date=end_date,
+            duration_minutes=search.duration_minutes,
+            resource_ids=search.resource_ids or None,
+            resource_type=search.resource_type,
+            step_minutes=search.step_minutes,
+            attendees=search.attendees,
+            add_ons=search.add_ons,
+            limit=min(search.limit, 5000)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/bookings/quote")
+async def quote_bookings(
+    quote: QuoteRequest,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    items = [
+        {
+            "resource_id": item.resource_id,
+            "start_time": to_utc_naive(item.start_time),
+            "end_time": to_utc_naive(item.end_time)
+        }
+        for item in quote.items
+    ]
+    if any(item["end_time"] <= item["start_time"] for item in items):
+        raise HTTPException(status_code=400, detail="Booking end time must be after start time")
+    
+    try:
+        return await core.quote_bookings(
+            current_user.tenant_id, items, attendees=quote.attendees, add_ons=quote.add_ons
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/bookings/utilization")
+async def get_booking_utilization(
+    date_from: datetime,
+    date_to: datetime,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    start_date = to_utc_naive(date_from)
+    end_date = to_utc_naive(date_to)
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="date_to must be after date_from")
+    
+    return await booking_kernel.get_resource_utilization(current_user.tenant_id, start_date, end_date)
+
+def calendar_feed_window(date_from: Optional[str], date_to: Optional[str]):
+    """Resolve a feed window, snapped out to whole days so repeated polls share a cache entry"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    try:
+        start_date = to_utc_naive(datetime.fromisoformat(date_from)) if date_from else today - timedelta(days=7)
+        end_date = to_utc_naive(datetime.fromisoformat(date_to)) if date_to else today + timedelta(days=90)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date_from and date_to must be ISO 8601 dates")
+    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_day = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = end_day if end_day == end_date else end_day + timedelta(days=1)
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="date_to must be after date_from")
+    if end_date - start_date > timedelta(days=400):
+        raise HTTPException(status_code=400, detail="Calendar window is limited to 400 days")
+    return start_date, end_date
+
+def calendar_feed_response(feed: Dict[str, Any], cache_control: str) -> Response:
+    headers = {
+        "ETag": feed["etag"],
+        "Last-Modified": format_datetime(feed["last_modified"].replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": cache_control
+    }
+    if feed["not_modified"]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=feed["content"], media_type=feed["media_type"], headers=headers)
+
+@api_router.get("/bookings/calendar-feed")
+async def get_booking_calendar_feed(
+    request: Request,
+    resource_id: Optional[str] = None,
+    format: str = "ics",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    start_date, end_date = calendar_feed_window(date_from, date_to)
+    
+    try:
+        feed = await booking_kernel.get_calendar_feed(
+            current_user.tenant_id, start_date, end_date, resource_id, format,
+            request.headers.get("if-none-match")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return calendar_feed_response(feed, "private, max-age=60")
+
+@api_router.get("/bookings/calendar")
+async def get_booking_calendar(
+    request: Request,
+    resource_ids: Optional[str] = None,
+    encoding: str = "json",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    start_date, end_date = calendar_feed_window(date_from, date_to)
+    
+    try:
+        spans = await booking_kernel.get_calendar_spans(
+            current_user.tenant_id, start_date, end_date,
+            resource_ids.split(",") if resource_ids else None, encoding,
+            request.headers.get("if-none-match")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return calendar_feed_response(spans, "private, max-age=60")
+
+@api_router.put("/resources/availability")
+async def set_resource_availability(
+    schedule_data: AvailabilityScheduleBulk,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    
+    resource_ids = list(schedule_data.schedules.keys())
+    owned = await db.resources.count_documents({"tenant_id": current_user.tenant_id, "id": {"$in": resource_ids}})
+    if owned != len(resource_ids):
+        raise HTTPException(status_code=404, detail="Resource not found")
+    
+    schedules = {
+        resource_id: [window.dict() for window in windows]
+        for resource_id, windows in schedule_data.schedules.items()
+    }
+    try:
+        result = await booking_kernel.set_availability_schedules(current_user.tenant_id, schedules)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"message": "Availability updated successfully", **result}
+
+@api_router.put("/bookings/series/{series_id}")
+async def update_booking_series(
+    series_id: str,
+    series_data: BookingSeriesUpdate,
+    current_user: User = Depends(get_current_user)
+):
+    core = await get_platform_core(db)
+    booking_kernel = core.get_kernel('booking')
+    
+    changes = {k: v for k, v in series_data.dict(exclude={"from_time"}).items() if v is not None}
+    if not changes:
+        raise HTTPException(status_code=400, detail="No changes provided")
+    
+    try:
+        updated = await booking_kernel.update_series(
+            current_user.tenant_id, series_id, to_utc_naive(series_data.from_time), changes
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Booking series updated successfully", "updated_count": updated}
+
+# Financial Routes
+@api_router.get("/invoices")
+async def get_invoices(
+    status: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    include_line_items: bool = True,
+    limit: int = 100,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    financial_kernel = core.get_kernel('financial')
+    
+    try:
+        return await financial_kernel.get_invoice_page(
+            current_user.tenant_id,
+            status=status,
+            date_from=to_utc_naive(date_from) if date_from else None,
+            date_to=to_utc_naive(date_to) if date_to else None,
+            after=cursor,
+            include_line_items=include_line_items,
+            limit=max(1, min(limit, 500))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.post("/invoices/batch")
+async def create_invoice_batch(
+    batch: InvoiceBatchCreate,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    financial_kernel = core.get_kernel('financial')
+    
+    invoices = []
+    for invoice in batch.invoices:
+        invoice_fields = invoice.dict(exclude_none=True)
+        invoice_fields["line_items"] = [item.dict(exclude_none=True) for item in invoice.line_items]
+        if invoice.due_date:
+            invoice_fields["due_date"] = to_utc_naive(invoice.due_date)
+        invoices.append(invoice_fields)
+    
+    try:
+        created = await financial_kernel.create_invoices(current_user.tenant_id, invoices)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    for invoice in created:
+        invoice.pop("_id", None)
+    return {"invoices": created, "count": len(created)}
+
+@api_router.post("/billing/run")
+async def run_subscription_billing(
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR]))
+):
+    core = await get_platform_core(db)
+    financial_kernel = core.get_kernel('financial')
+    # Bills the caller's tenant now; the nightly all-tenant run is backend/run_subscription_billing.py
+    return await financial_kernel.run_subscription_billing(tenant_id=current_user.tenant_id)
+
+@api_router.get("/reports/revenue")
+async def get_revenue_report(
+    date_from: datetime,
+    date_to: datetime,
+    group_by: str = "month",
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    financial_kernel = core.get_kernel('financial')
+    try:
+        return await financial_kernel.get_revenue_report(
+            current_user.tenant_id, to_utc_naive(date_from), to_utc_naive(date_to), group_by
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/reports/receivables")
+async def get_receivables_report(
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    financial_kernel = core.get_kernel('financial')
+    return await financial_kernel.get_outstanding_balance(current_user.tenant_id)
+
+@api_router.get("/customers/{customer_id}/balance")
+async def get_customer_balance(
+    customer_id: str,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    financial_kernel = core.get_kernel('financial')
+    return await financial_kernel.get_customer_balance(current_user.tenant_id, customer_id)
+
+@api_router.get("/customers/{customer_id}/statement")
+async def get_customer_statement(
+    customer_id: str,
+    date_from: datetime,
+    date_to: datetime,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    financial_kernel = core.get_kernel('financial')
+    return await financial_kernel.get_customer_statement(
+        current_user.tenant_id, customer_id, to_utc_naive(date_from), to_utc_naive(date_to)
+    )
+
+# Messaging Routes
+@api_router.get("/messages/stats")
+async def get_message_stats(
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    return await communication_kernel.get_dispatch_stats(current_user.tenant_id)
+
+@api_router.get("/messages/summary")
+async def get_message_summary(
+    days: int = 90,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    try:
+        return await communication_kernel.get_communication_summary(current_user.tenant_id, days)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/messages/dead-letters")
+async def get_dead_letters(
+    limit: int = 100,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    return await communication_kernel.get_dead_letters(current_user.tenant_id, min(max(limit, 1), 500))
+
+@api_router.post("/messages/dead-letters/{dead_letter_id}/requeue")
+async def requeue_dead_letter(
+    dead_letter_id: str,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    if not await communication_kernel.requeue_dead_letter(current_user.tenant_id, dead_letter_id):
+        raise HTTPException(status_code=404, detail="Dead letter not found")
+    return {"message": "Message requeued"}
+
+@api_router.post("/broadcasts")
+async def create_broadcast(
+    broadcast_data: BroadcastCreate,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    data = broadcast_data.dict()
+    if data["scheduled_for"]:
+        data["scheduled_for"] = to_utc_naive(data["scheduled_for"])
+    try:
+        return await communication_kernel.create_broadcast(current_user.tenant_id, data, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@api_router.get("/broadcasts")
+async def get_broadcasts(
+    limit: int = 50,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    return await communication_kernel.get_broadcasts(current_user.tenant_id, min(max(limit, 1), 200))
+
+@api_router.get("/broadcasts/{broadcast_id}")
+async def get_broadcast(
+    broadcast_id: str,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    broadcast = await communication_kernel.get_broadcast(current_user.tenant_id, broadcast_id)
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast not found")
+    return broadcast
+
+@api_router.post("/broadcasts/{broadcast_id}/{action}")
+async def update_broadcast_status(
+    broadcast_id: str,
+    action: str,
+    current_user: User = Depends(require_role([UserRole.ACCOUNT_OWNER, UserRole.ADMINISTRATOR, UserRole.PROPERTY_MANAGER]))
+):
+    core = await get_platform_core(db)
+    communication_kernel = core.get_kernel('communication')
+    try:
+        updated = await communication_kernel.update_broadcast_status(current_user.tenant_id, broadcast_id, action)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not updated:
+        raise HTTPException(status_code=409, detail=f"Broadcast cannot {action} in its current state")
+    return {"message": f"Broadcast {action} accepted"}
+
 # Dashboard and Analytics
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(
@@ -1068,6 +1758,35 @@ async def get_public_form(tenant_subdomain: str, form_id: str):
     
     return Form(**form)
 
+@api_router.get("/public/{tenant_subdomain}/calendar")
+async def get_public_calendar_feed(
+    tenant_subdomain: str,
+    request: Request,
+    resource_id: Optional[str] = None,
+    format: str = "ics",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None
+):
+    # Find tenant
+    tenant = await db.tenants.find_one({"subdomain": tenant_subdomain})
+    if not tenant:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    
+    core = await get_platform_core(db)
+    if not await core.check_feature_access(tenant["id"], "public_transparency"):
+        raise HTTPException(status_code=404, detail="Public calendar not available")
+    
+    booking_kernel = core.get_kernel('booking')
+    start_date, end_date = calendar_feed_window(date_from, date_to)
+    try:
+        feed = await booking_kernel.get_calendar_feed(
+            tenant["id"], start_date, end_date, resource_id, format,
+            request.headers.get("if-none-match")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return calendar_feed_response(feed, "public, max-age=300")
+
 # Add new core platform endpoints BEFORE including router
 @api_router.get("/platform/experience")
 async def get_tenant_experience(current_user: User = Depends(get_current_user)):
@@ -1392,4 +2111,7 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    # Let queued workflow events finish (or persist them) while the database is still reachable
+    if platform_core:
+        await platform_core.shutdown()
     client.close()
\ No newline at end of file
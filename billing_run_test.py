@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Billing Run Test
+Checks minor-unit money conversion, billing date advancement and that
+subscription billing runs are safe to repeat and to resume
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.financial_kernel import FinancialKernel
+from kernels.billing_run import advance_billing_date
+from kernels.money import to_minor, from_minor, multiply_minor
+
+
+class BillingRunTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = FinancialKernel(db)
+        self.tenant_id = f"billing-{uuid.uuid4()}"
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    def test_money(self):
+        print("\n🔍 Money conversion...")
+        self._check("Float converts as written", to_minor(0.1) + to_minor(0.2) == to_minor("0.3") == 30)
+        self._check("Half a cent rounds up", to_minor("19.995") == 2000)
+        self._check("Zero-decimal currency", to_minor("1500", "JPY") == 1500 and to_minor(1.5, "JPY") == 2)
+        self._check("Three-decimal currency", to_minor("1.2345", "KWD") == 1235)
+        self._check("Minor units convert back exactly", from_minor(1999) == Decimal("19.99"))
+        self._check("Integer quantity stays integer", multiply_minor(1999, 3) == 5997)
+        self._check("Fractional quantity rounds half up", multiply_minor(1999, "1.5") == 2999)
+        self._check("Minor units convert back with the currency exponent",
+                    from_minor(1500, "JPY") == Decimal("1500") and from_minor(5, "KWD") == Decimal("0.005"))
+
+    def test_billing_dates(self):
+        print("\n🔍 Billing date advancement...")
+        jan_31 = datetime(2030, 1, 31)
+        feb = advance_billing_date(jan_31, "monthly", 31)
+        self._check("Jan 31 bills next on Feb 28", feb == datetime(2030, 2, 28))
+        self._check("Anchor day is restored after a short month", advance_billing_date(feb, "monthly", 31) ==
+                    datetime(2030, 3, 31))
+        self._check("Quarterly crosses the year", advance_billing_date(datetime(2030, 11, 15), "quarterly") ==
+                    datetime(2031, 2, 15))
+        self._check("Leap day yearly plan", advance_billing_date(datetime(2028, 2, 29), "yearly", 29) ==
+                    datetime(2029, 2, 28))
+        self._check("Weekly plan", advance_billing_date(jan_31, "weekly") == datetime(2030, 2, 7))
+        try:
+            advance_billing_date(jan_31, "fortnightly")
+            self._check("Unknown interval rejected", False)
+        except ValueError:
+            self._check("Unknown interval rejected", True)
+
+    async def test_billing_run(self):
+        print("\n🔍 Billing runs...")
+        start = datetime(2030, 1, 31)
+        monthly = await self.kernel.create_subscription(self.tenant_id, {
+            "customer_id": "customer-1", "name": "Hot desk", "amount": "19.99", "quantity": 3, "start_date": start
+        })
+        yen = await self.kernel.create_subscription(self.tenant_id, {
+            "customer_id": "customer-2", "name": "Locker", "amount": 1500, "currency": "JPY",
+            "billing_interval": "weekly", "start_date": start
+        })
+        await self.kernel.create_subscription(self.tenant_id, {
+            "customer_id": "customer-3", "name": "Later", "amount": 10, "start_date": datetime(2030, 6, 1)
+        })
+
+        as_of = datetime(2030, 2, 1)
+        report = await self.kernel.run_subscription_billing(as_of=as_of, tenant_id=self.tenant_id)
+        self._check("Only due subscriptions billed", report["subscriptions"] == 2 and report["invoices"] == 2)
+        invoices = {
+            invoice["subscription_id"]: invoice
+            for invoice in await self.db.invoices.find({"tenant_id": self.tenant_id}).to_list(None)
+        }
+        self._check("Invoice total in minor units", invoices[monthly["id"]]["total_minor"] == 5997)
+        self._check("Invoice keeps the subscription currency",
+                    invoices[yen["id"]]["currency"] == "JPY" and invoices[yen["id"]]["total_minor"] == 1500)
+        advanced = await self.db.subscriptions.find_one({"id": monthly["id"]})
+        self._check("Monthly plan advanced to Feb 28", advanced["next_billing_date"] == datetime(2030, 2, 28))
+
+        rerun = await self.kernel.run_subscription_billing(as_of=as_of, tenant_id=self.tenant_id)
+        self._check("Rerun for the same date bills nothing", rerun["invoices"] == 0)
+
+        # A run that crashed after invoicing but before writing line items, charging or advancing the date
+        await self.db.subscriptions.update_one({"id": monthly["id"]}, {"$set": {"next_billing_date": start}})
+        await self.db.transactions.delete_many({"subscription_id": monthly["id"]})
+        await self.db.line_items.delete_many({"invoice_id": invoices[monthly["id"]]["id"]})
+        resumed = await self.kernel.run_subscription_billing(as_of=as_of, tenant_id=self.tenant_id)
+        self._check("Interrupted period is not invoiced twice",
+                    resumed["invoices"] == 0 and resumed["already_billed"] == 1)
+        self._check("Missing charge is backfilled once", await self.db.transactions.count_documents(
+            {"subscription_id": monthly["id"], "type": "subscription_charge"}) == 1)
+        line_items = await self.db.line_items.find({"invoice_id": invoices[monthly["id"]]["id"]}).to_list(None)
+        self._check("Missing line items are backfilled", len(line_items) == 1
+                    and line_items[0]["line_total_minor"] == 5997)
+        self._check("Date advanced after resuming", (await self.db.subscriptions.find_one(
+            {"id": monthly["id"]}))["next_billing_date"] == datetime(2030, 2, 28))
+
+        # The weekly plan is four periods behind by March and catches up in one run
+        later = await self.kernel.run_subscription_billing(as_of=datetime(2030, 3, 1), tenant_id=self.tenant_id)
+        self._check("Every period due by the run date billed", later["invoices"] == 5)
+        self._check("One invoice per subscription period", await self.db.invoices.count_documents(
+            {"tenant_id": self.tenant_id}) == 7)
+        self._check("Plan behind by several periods caught up", (await self.db.subscriptions.find_one(
+            {"id": yen["id"]}))["next_billing_date"] == datetime(2030, 3, 7))
+        self._check("Every invoice has its line items", len(await self.db.line_items.distinct(
+            "invoice_id", {"tenant_id": self.tenant_id})) == 7)
+
+    async def cleanup(self):
+        for collection in ("subscriptions", "invoices", "line_items", "transactions", "ledger_entries",
+                           "billing_runs"):
+            await self.db[collection].delete_many({"tenant_id": self.tenant_id})
+        await self.db.counters.delete_one({"_id": f"invoice:{self.tenant_id}"})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = BillingRunTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Billing Run Tests")
+    print("=" * 60)
+    try:
+        tester.test_money()
+        tester.test_billing_dates()
+        await tester.test_billing_run()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
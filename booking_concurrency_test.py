@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Booking Concurrency Test
+Hammers the BookingKernel commit path with concurrent attempts and verifies
+that no resource is ever double booked
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.booking_kernel import BookingKernel
+
+
+class BookingConcurrencyTester:
+    def __init__(self, db, attempts=300):
+        self.db = db
+        self.kernel = BookingKernel(db)
+        self.attempts = attempts
+        self.tenant_id = f"concurrency-{uuid.uuid4()}"
+        self.base_time = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _booking(self, resource_id, start_offset, duration):
+        start_time = self.base_time + timedelta(minutes=start_offset)
+        return {
+            "id": str(uuid.uuid4()),
+            "tenant_id": self.tenant_id,
+            "resource_id": resource_id,
+            "start_time": start_time,
+            "end_time": start_time + timedelta(minutes=duration),
+            "status": "confirmed",
+            "created_at": datetime.utcnow()
+        }
+
+    async def _attempt(self, booking_docs):
+        try:
+            await self.kernel.commit_bookings(self.tenant_id, booking_docs)
+            return True
+        except ValueError:
+            return False
+
+    async def _run(self, name, attempts):
+        """Run attempts concurrently and report throughput"""
+        print(f"\n🔍 {name} ({len(attempts)} concurrent attempts)...")
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self._attempt(docs) for docs in attempts))
+        elapsed = time.perf_counter() - started
+        print(f"   {sum(results)} committed, {len(results) - sum(results)} rejected "
+              f"in {elapsed:.2f}s ({len(results) / elapsed:.0f} attempts/s)")
+        return results
+
+    async def _double_bookings(self, resource_id):
+        """Count overlapping pairs among committed bookings for a resource"""
+        bookings = await self.db.bookings.find(
+            {"tenant_id": self.tenant_id, "resource_id": resource_id, "status": "confirmed"}
+        ).sort("start_time", 1).to_list(None)
+        overlaps = 0
+        for previous, current in zip(bookings, bookings[1:]):
+            if current["start_time"] < previous["end_time"]:
+                overlaps += 1
+        return overlaps
+
+    async def _orphan_guards(self):
+        """Count guards whose booking was never committed (a failed rollback)"""
+        booking_ids = await self.db.bookings.distinct("id", {"tenant_id": self.tenant_id})
+        return await self.db.booking_guards.count_documents(
+            {"tenant_id": self.tenant_id, "booking_id": {"$nin": booking_ids}}
+        )
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    async def test_same_slot(self):
+        """Every attempt targets the exact same slot - exactly one may win"""
+        resource_id = f"room-{uuid.uuid4()}"
+        attempts = [[self._booking(resource_id, 0, 60)] for _ in range(self.attempts)]
+        results = await self._run("Same slot contention", attempts)
+        self._check("Exactly one booking committed", sum(results) == 1)
+        self._check("No double bookings", await self._double_bookings(resource_id) == 0)
+
+    async def test_overlapping_windows(self):
+        """Random overlapping windows on one resource"""
+        resource_id = f"room-{uuid.uuid4()}"
+        attempts = [
+            [self._booking(resource_id, random.randrange(0, 8 * 60, 15), random.choice([30, 60, 90, 120]))]
+            for _ in range(self.attempts)
+        ]
+        results = await self._run("Overlapping window contention", attempts)
+        self._check("At least one booking committed", sum(results) >= 1)
+        self._check("No double bookings", await self._double_bookings(resource_id) == 0)
+
+    async def test_multi_resource(self):
+        """Room + equipment groups racing single-resource bookings for the equipment"""
+        room_id = f"room-{uuid.uuid4()}"
+        projector_id = f"projector-{uuid.uuid4()}"
+        attempts = []
+        for _ in range(self.attempts):
+            offset = random.randrange(0, 4 * 60, 15)
+            if random.random() < 0.5:
+                attempts.append([self._booking(room_id, offset, 60), self._booking(projector_id, offset, 60)])
+            else:
+                attempts.append([self._booking(projector_id, offset, 30)])
+        await self._run("Multi-resource contention", attempts)
+        self._check("No double bookings on room", await self._double_bookings(room_id) == 0)
+        self._check("No double bookings on equipment", await self._double_bookings(projector_id) == 0)
+        self._check("No guards left behind by rolled back groups", await self._orphan_guards() == 0)
+
+    async def test_back_to_back(self):
+        """Adjacent bookings: slot-aligned ones both commit, unaligned ones are rejected up front"""
+        resource_id = f"room-{uuid.uuid4()}"
+        results = await self._run("Aligned back-to-back bookings", [
+            [self._booking(resource_id, 0, 45)], [self._booking(resource_id, 45, 45)]
+        ])
+        self._check("Both aligned bookings committed", sum(results) == 2)
+
+        unaligned_id = f"room-{uuid.uuid4()}"
+        errors = []
+        for offset in (0, 50):
+            try:
+                await self.kernel.commit_bookings(self.tenant_id, [self._booking(unaligned_id, offset, 50)])
+            except ValueError as e:
+                errors.append(str(e))
+        self._check("Unaligned bookings rejected with an alignment error",
+                    len(errors) == 2 and all("boundary" in error for error in errors))
+        self._check("No guards written for unaligned bookings",
+                    await self.db.booking_guards.count_documents({"resource_id": unaligned_id}) == 0)
+
+    async def cleanup(self):
+        await self.db.bookings.delete_many({"tenant_id": self.tenant_id})
+        await self.db.booking_guards.delete_many({"tenant_id": self.tenant_id})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = BookingConcurrencyTester(db, attempts=int(os.environ.get('BOOKING_ATTEMPTS', 300)))
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Booking Concurrency Tests")
+    print("=" * 60)
+    try:
+        await tester.test_same_slot()
+        await tester.test_overlapping_windows()
+        await tester.test_multi_resource()
+        await tester.test_back_to_back()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Calendar Spans Test
+Checks the run-length encoded busy/free timelines: run layout, bookings that
+cross the weekly cache boundary, ETag revalidation and requests larger than
+the week cache
+"""
+
+import asyncio
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.booking_kernel import BookingKernel
+
+
+class CalendarSpansTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = BookingKernel(db)
+        self.tenant_id = f"spans-{uuid.uuid4()}"
+        # A Monday well in the future, so nothing else in the database overlaps
+        self.monday = datetime(2031, 3, 3)
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    async def _resources(self, count):
+        resource_ids = [f"room-{uuid.uuid4()}" for _ in range(count)]
+        await self.db.resources.insert_many([
+            {"id": resource_id, "tenant_id": self.tenant_id, "name": resource_id, "is_active": True}
+            for resource_id in resource_ids
+        ])
+        return resource_ids
+
+    async def _book(self, resource_id, start_time, end_time, status="confirmed"):
+        await self.db.bookings.insert_one({
+            "id": str(uuid.uuid4()),
+            "tenant_id": self.tenant_id,
+            "resource_id": resource_id,
+            "start_time": start_time,
+            "end_time": end_time,
+            "status": status
+        })
+        await self.kernel._touch_booking_versions(self.tenant_id, [resource_id])
+
+    async def _runs(self, start_date, end_date, resource_ids, **kwargs):
+        result = await self.kernel.get_calendar_spans(self.tenant_id, start_date, end_date, resource_ids, **kwargs)
+        return result, json.loads(result["content"])["resources"] if not result["not_modified"] else None
+
+    async def test_runs(self):
+        print("\n🔍 Run lengths...")
+        room, = await self._resources(1)
+        day = self.monday + timedelta(days=1)
+        await self._book(room, day.replace(hour=9), day.replace(hour=10))
+        await self._book(room, day.replace(hour=10), day.replace(hour=11, minute=30))
+        await self._book(room, day.replace(hour=14), day.replace(hour=15), status="cancelled")
+
+        _, runs = await self._runs(day, day + timedelta(days=1), [room])
+        self._check("Adjacent bookings merge into one busy run", runs[room] == [540, 150, 750])
+        self._check("Runs cover the whole window", sum(runs[room]) == 24 * 60)
+
+        # Sunday 22:00 to Monday 04:00 is split by the week cache and must be joined again
+        sunday = self.monday + timedelta(days=6)
+        await self._book(room, sunday.replace(hour=22), sunday + timedelta(hours=28))
+        _, runs = await self._runs(sunday, sunday + timedelta(days=2), [room])
+        self._check("Booking across the week boundary is one run", runs[room] == [22 * 60, 6 * 60, 20 * 60])
+
+    async def test_etag(self):
+        print("\n🔍 ETag revalidation...")
+        room, = await self._resources(1)
+        start, end = self.monday, self.monday + timedelta(days=7)
+        first, _ = await self._runs(start, end, [room])
+        again, _ = await self._runs(start, end, [room], if_none_match=first["etag"])
+        self._check("Unchanged calendar is not modified", again["not_modified"])
+
+        await self._book(room, start.replace(hour=9), start.replace(hour=10))
+        changed, runs = await self._runs(start, end, [room], if_none_match=first["etag"])
+        self._check("A new booking changes the ETag", not changed["not_modified"] and changed["etag"] != first["etag"])
+        self._check("A new booking shows up in the runs", runs[room][:2] == [540, 60])
+
+    async def test_larger_than_cache(self):
+        print("\n🔍 Requests larger than the week cache...")
+        self.kernel.spans.CACHE_SIZE = 64
+        resource_ids = await self._resources(20)
+        start = self.monday
+        for index, resource_id in enumerate(resource_ids):
+            day = start + timedelta(days=index * 7)
+            await self._book(resource_id, day.replace(hour=9), day.replace(hour=10))
+
+        # 20 resources x 21 weeks = 420 (resource, week) entries against a cache of 64
+        try:
+            _, runs = await self._runs(start, start + timedelta(days=140), resource_ids)
+        except KeyError:
+            runs = None
+        self._check("Request larger than the cache succeeds", runs is not None)
+        if runs is not None:
+            self._check("Every resource has its booking", all(
+                runs[resource_id][:2] == [index * 7 * 1440 + 540, 60] for index, resource_id in enumerate(resource_ids)
+            ))
+        self._check("Cache stays within its size", len(self.kernel.spans._weeks) <= 64)
+
+    async def cleanup(self):
+        resource_ids = await self.db.resources.distinct("id", {"tenant_id": self.tenant_id})
+        await self.db.resources.delete_many({"tenant_id": self.tenant_id})
+        await self.db.bookings.delete_many({"tenant_id": self.tenant_id})
+        await self.db.booking_versions.delete_many(
+            {"_id": {"$in": [f"tenant:{self.tenant_id}"] + [f"resource:{resource_id}" for resource_id in resource_ids]}}
+        )
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = CalendarSpansTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Calendar Spans Tests")
+    print("=" * 60)
+    try:
+        await tester.test_runs()
+        await tester.test_etag()
+        await tester.test_larger_than_cache()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
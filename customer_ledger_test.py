@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Customer Ledger Test
+Checks customer balances through invoice status changes and reversals,
+balance snapshots, statements and invoices created before the ledger existed
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.financial_kernel import FinancialKernel
+
+
+class CustomerLedgerTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = FinancialKernel(db)
+        self.kernel.ledger.SNAPSHOT_LAG_SECONDS = 0
+        self.tenant_id = f"ledger-{uuid.uuid4()}"
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    async def _balance(self, customer_id):
+        return (await self.kernel.get_customer_balance(self.tenant_id, customer_id))["balance_minor"]
+
+    async def _invoice(self, customer_id, unit_price):
+        return await self.kernel.create_invoice(self.tenant_id, customer_id, [
+            {"description": "Desk rental", "unit_price": unit_price, "quantity": 1}
+        ])
+
+    async def test_status_reversals(self):
+        print("\n🔍 Balances through status changes...")
+        customer = "customer-a"
+        first = await self._invoice(customer, "100.00")
+        second = await self._invoice(customer, "40.50")
+        self._check("New invoices are owed", await self._balance(customer) == 14050)
+
+        await self.kernel.update_invoice_status(first["id"], "paid")
+        self._check("Paid invoice leaves the balance", await self._balance(customer) == 4050)
+        await self.kernel.update_invoice_status(first["id"], "paid")
+        self._check("Repeating a status posts nothing", await self._balance(customer) == 4050)
+        await self.kernel.update_invoice_status(first["id"], "sent")
+        self._check("Reversing a payment puts it back", await self._balance(customer) == 14050)
+        await self.kernel.update_invoice_status(first["id"], "cancelled")
+        await self.kernel.update_invoice_status(second["id"], "paid")
+        self._check("Cancelled and paid invoices settle the account", await self._balance(customer) == 0)
+
+        await self.kernel.create_transaction(self.tenant_id, {"type": "credit", "customer_id": customer,
+                                                              "amount": "5.00"})
+        self._check("Credit without an invoice lowers the balance", await self._balance(customer) == -500)
+
+    async def test_snapshots(self):
+        print("\n🔍 Snapshots and statements...")
+        customer = "customer-b"
+        start = datetime.utcnow() - timedelta(seconds=1)
+        invoice = await self._invoice(customer, "250.00")
+        await self.kernel.update_invoice_status(invoice["id"], "paid")
+        await self.kernel.take_balance_snapshots()
+        snapshot = await self.db.ledger_snapshots.find_one({"tenant_id": self.tenant_id, "customer_id": customer})
+        self._check("Snapshot holds the settled balance", snapshot is not None and snapshot["balance_minor"] == 0)
+
+        await self.kernel.update_invoice_status(invoice["id"], "sent")
+        await self._invoice(customer, "10.00")
+        balance = await self.kernel.get_customer_balance(self.tenant_id, customer)
+        self._check("Balance is the snapshot plus newer entries",
+                    balance["balance_minor"] == 26000 and balance["entries_since_snapshot"] == 2)
+        await self.kernel.take_balance_snapshots()
+        self._check("Next snapshot builds on the previous one", await self._balance(customer) == 26000)
+
+        statement = await self.kernel.get_customer_statement(self.tenant_id, customer, start,
+                                                             datetime.utcnow() + timedelta(seconds=1))
+        self._check("Statement runs from opening to closing balance",
+                    statement["opening_balance_minor"] == 0 and statement["closing_balance_minor"] == 26000
+                    and [entry["balance_minor"] for entry in statement["entries"]] == [25000, 0, 25000, 26000])
+
+    async def test_legacy_invoices(self):
+        print("\n🔍 Invoices from before the ledger...")
+        created = datetime.utcnow() - timedelta(days=90)
+        legacy = [
+            {"id": str(uuid.uuid4()), "tenant_id": self.tenant_id, "customer_id": "customer-c", "status": status,
+             "total_amount": 80.0, "subtotal": 80.0, "tax_amount": 0.0, "created_at": created}
+            for status in ("sent", "paid", "cancelled")
+        ]
+        await self.db.invoices.insert_many(legacy)
+        migrated = await self.kernel.migrate_money_to_minor_units()
+        self._check("Migration posts opening entries", migrated["ledger_entries"] >= 5)
+        self._check("Only the unpaid invoice is owed", await self._balance("customer-c") == 8000)
+        await self.kernel.migrate_money_to_minor_units()
+        self._check("Rerunning the migration posts nothing twice", await self._balance("customer-c") == 8000)
+
+        await self.kernel.update_invoice_status(legacy[0]["id"], "paid")
+        await self.kernel.update_invoice_status(legacy[1]["id"], "sent")
+        self._check("Status changes on migrated invoices balance", await self._balance("customer-c") == 8000)
+
+        # An invoice the migration has not reached yet still gets its debit before a status credit
+        late = {"id": str(uuid.uuid4()), "tenant_id": self.tenant_id, "customer_id": "customer-d", "status": "sent",
+                "total_minor": 3000, "currency": "USD", "created_at": created}
+        await self.db.invoices.insert_one(late)
+        await self.kernel.update_invoice_status(late["id"], "paid")
+        self._check("Paying an unposted invoice does not go negative", await self._balance("customer-d") == 0)
+
+    async def cleanup(self):
+        for collection in ("invoices", "line_items", "transactions", "ledger_entries", "ledger_snapshots",
+                           "revenue_daily"):
+            await self.db[collection].delete_many({"tenant_id": self.tenant_id})
+        await self.db.counters.delete_one({"_id": f"invoice:{self.tenant_id}"})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = CustomerLedgerTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Customer Ledger Tests")
+    print("=" * 60)
+    try:
+        await tester.test_status_reversals()
+        await tester.test_snapshots()
+        await tester.test_legacy_invoices()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
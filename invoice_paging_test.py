@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Invoice Paging Test
+Checks keyset paging of invoices: pages across invoices that share a
+created_at, filters, invoices added mid-walk and malformed cursors
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.financial_kernel import FinancialKernel
+
+
+class InvoicePagingTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = FinancialKernel(db)
+        self.tenant_id = f"paging-{uuid.uuid4()}"
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    async def _create(self, count, customer_id="customer-1"):
+        # One batch shares a single created_at, so ties are broken by id alone
+        return await self.kernel.create_invoices(self.tenant_id, [
+            {"customer_id": customer_id, "line_items": [{"description": f"Desk {index}", "unit_price": "10.00"}]}
+            for index in range(count)
+        ])
+
+    async def _walk(self, limit, **kwargs):
+        pages, cursor = [], None
+        while True:
+            page = await self.kernel.get_invoice_page(self.tenant_id, after=cursor, limit=limit, **kwargs)
+            pages.append(page["invoices"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                return pages
+
+    async def test_equal_timestamps(self):
+        print("\n🔍 Pages across equal created_at values...")
+        older = await self._create(3)
+        await self.db.invoices.update_many({"id": {"$in": [invoice["id"] for invoice in older]}},
+                                           {"$set": {"created_at": datetime.utcnow() - timedelta(days=1)}})
+        newer = await self._create(7)
+        self._check("Batch shares one created_at", len({invoice["created_at"] for invoice in newer}) == 1)
+
+        pages = await self._walk(3)
+        walked = [invoice["id"] for page in pages for invoice in page]
+        expected = [invoice["id"] for invoice in sorted(
+            await self.db.invoices.find({"tenant_id": self.tenant_id}).to_list(None),
+            key=lambda invoice: (invoice["created_at"], invoice["id"]), reverse=True
+        )]
+        self._check("Page sizes", [len(page) for page in pages] == [3, 3, 3, 1])
+        self._check("Every invoice returned once, newest first", walked == expected)
+        self._check("Line items attached", all(len(invoice["line_items"]) == 1 for page in pages for invoice in page))
+
+        exact = await self._walk(10)
+        self._check("A full last page has no next cursor", [len(page) for page in exact] == [10])
+
+    async def test_filters_and_inserts(self):
+        print("\n🔍 Filters and inserts during a walk...")
+        first = await self.kernel.get_invoice_page(self.tenant_id, limit=4)
+        await self._create(2)
+        rest = await self.kernel.get_invoice_page(self.tenant_id, after=first["next_cursor"], limit=100)
+        seen = [invoice["id"] for invoice in first["invoices"] + rest["invoices"]]
+        self._check("Invoices created mid-walk do not shift later pages",
+                    len(seen) == len(set(seen)) == 10 and rest["next_cursor"] is None)
+
+        paid = [invoice["id"] for invoice in first["invoices"][:3]]
+        for invoice_id in paid:
+            await self.kernel.update_invoice_status(invoice_id, "paid")
+        pages = await self._walk(2, status="paid", include_line_items=False)
+        self._check("Status filter holds across pages",
+                    [invoice["id"] for page in pages for invoice in page] == paid
+                    and all("line_items" not in invoice for page in pages for invoice in page))
+
+        try:
+            await self.kernel.get_invoice_page(self.tenant_id, after="yesterday|abc")
+            self._check("Malformed cursor rejected", False)
+        except ValueError as e:
+            self._check("Malformed cursor rejected", str(e) == "Invalid invoice cursor")
+
+    async def cleanup(self):
+        for collection in ("invoices", "line_items", "transactions", "ledger_entries", "revenue_daily"):
+            await self.db[collection].delete_many({"tenant_id": self.tenant_id})
+        await self.db.counters.delete_one({"_id": f"invoice:{self.tenant_id}"})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = InvoicePagingTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Invoice Paging Tests")
+    print("=" * 60)
+    try:
+        await tester.test_equal_timestamps()
+        await tester.test_filters_and_inserts()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Log Sink Test
+Checks buffered log writes: batching, the timed flush, flushing on stop and
+keeping records while the collection is unavailable
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.log_sink import LogSink
+
+
+class RecordingCollection:
+    """Stands in for a motor collection; fails every insert while failing is set"""
+
+    name = "test_logs"
+
+    def __init__(self):
+        self.batches = []
+        self.failing = False
+
+    async def insert_many(self, documents, ordered=True):
+        if self.failing:
+            raise ConnectionError("database unavailable")
+        self.batches.append(list(documents))
+
+    @property
+    def written(self):
+        return [document["n"] for batch in self.batches for document in batch]
+
+
+class LogSinkTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    @staticmethod
+    def _sink(flush_ms=60000, max_batch=3):
+        collection = RecordingCollection()
+        flushed = []
+
+        async def on_flush(batch):
+            flushed.append(len(batch))
+
+        sink = LogSink(collection, on_flush=on_flush)
+        sink.FLUSH_MS = flush_ms
+        sink.MAX_BATCH = max_batch
+        return sink, collection, flushed
+
+    async def test_stop(self):
+        print("\n🔍 Flush on stop...")
+        sink, collection, flushed = self._sink()
+        await sink.start()
+        for n in range(5):
+            await sink.record({"n": n})
+        self._check("Full batches written as they fill", collection.written == [0, 1, 2])
+        self._check("Partial batch buffered while running", len(sink._buffer) == 2)
+        await sink.stop()
+        self._check("Stop writes what is still buffered", collection.written == [0, 1, 2, 3, 4]
+                    and not sink._buffer)
+        self._check("Flush hook sees every batch", flushed == [3, 2])
+        self._check("Metrics", sink.metrics["recorded"] == sink.metrics["written"] == 5
+                    and sink.metrics["flushes"] == 2)
+
+        await sink.record({"n": 5})
+        self._check("Records after stop are written straight away", collection.written[-1] == 5)
+
+    async def test_timer(self):
+        print("\n🔍 Timed flush...")
+        sink, collection, _ = self._sink(flush_ms=20)
+        await sink.start()
+        await sink.record({"n": 0})
+        self._check("Buffered until the timer fires", collection.written == [])
+        await asyncio.sleep(0.1)
+        self._check("Timer flushes a partial batch", collection.written == [0])
+        await sink.stop()
+
+    async def test_unavailable(self):
+        print("\n🔍 Collection unavailable...")
+        sink, collection, _ = self._sink()
+        sink.MAX_PENDING = 4
+        await sink.start()
+        collection.failing = True
+        for n in range(6):
+            await sink.record({"n": n})
+        await sink.stop()
+        self._check("Failed batches kept, oldest dropped past MAX_PENDING",
+                    [entry["n"] for entry in sink._buffer] == [2, 3, 4, 5] and sink.metrics["dropped"] == 2)
+
+        collection.failing = False
+        await sink.flush()
+        self._check("Kept records written in order once it is back", collection.written == [2, 3, 4, 5]
+                    and not sink._buffer)
+
+
+async def main():
+    tester = LogSinkTester()
+
+    print("🚀 Starting Log Sink Tests")
+    print("=" * 60)
+    await tester.test_stop()
+    await tester.test_timer()
+    await tester.test_unavailable()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
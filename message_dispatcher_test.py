@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Message Dispatcher Test
+Checks lease reclaim for crashed workers, that only the worker holding a claim
+can settle or dead-letter a message, what dead letters expose and lane order
+under tenant rate caps
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.channel_adapters import ChannelAdapter, PermanentDeliveryError
+from kernels.communication_kernel import CommunicationKernel
+
+
+class RecordingAdapter(ChannelAdapter):
+    """Records what it was asked to send and answers with a fixed result"""
+
+    def __init__(self, result=None):
+        self.result = result
+        self.sent = []
+
+    async def send(self, messages):
+        self.sent.extend(message["id"] for message in messages)
+        return [self.result] * len(messages)
+
+
+class MessageDispatcherTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = CommunicationKernel(db)
+        self.dispatcher = self.kernel.dispatcher
+        self.tenant_id = f"dispatch-{uuid.uuid4()}"
+        # The rate-cap test starts from empty rate windows
+        self.capped_tenant_id = f"{self.tenant_id}-capped"
+        self.other_tenant_id = f"{self.tenant_id}-other"
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    def _lane(self, priority="transactional"):
+        return {"tenant_id": self.tenant_id, "priority": priority, "rate_per_minute": 600}
+
+    async def _queue(self, tenant_id=None, **fields):
+        return await self.kernel.queue_message(tenant_id or self.tenant_id, {
+            "channel": "webhook", "url": "https://hooks.example.com/in", "payload": {}, **fields
+        })
+
+    async def _message(self, message_id):
+        return await self.db.message_queue.find_one({"id": message_id})
+
+    async def test_reclaim(self):
+        print("\n🔍 Lease reclaim...")
+        message = await self._queue()
+        claimed = await self.dispatcher.claim("crashed-worker", self._lane(), 1)
+        self._check("Claim moves the message to sending", [m["id"] for m in claimed] == [message["id"]])
+        self._check("Unexpired lease is not reclaimed", await self.dispatcher.reclaim_expired_leases() == 0)
+
+        await self.db.message_queue.update_one({"id": message["id"]},
+                                               {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+        adapter = RecordingAdapter()
+        self.dispatcher.adapters = {"webhook": adapter}
+        self.dispatcher._next_reclaim = 0.0
+        await self.dispatcher.run(workers=2, drain=True)
+        stored = await self._message(message["id"])
+        self._check("Running dispatcher reclaims and delivers the stuck message",
+                    stored["status"] == "delivered" and adapter.sent == [message["id"]] and stored["attempts"] == 2)
+
+        # Reclaims repeat on an interval rather than only at startup
+        self.dispatcher._next_reclaim = float("inf")
+        stuck = await self._queue()
+        await self.dispatcher.claim("crashed-worker", self._lane(), 1)
+        await self.db.message_queue.update_one({"id": stuck["id"]},
+                                               {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+        await self.dispatcher.run(workers=1, drain=True)
+        self._check("No reclaim before the interval is up", (await self._message(stuck["id"]))["status"] == "sending")
+        self.dispatcher._next_reclaim = 0.0
+        await self.dispatcher.run(workers=1, drain=True)
+        self._check("Reclaimed once the interval passes", (await self._message(stuck["id"]))["status"] == "delivered")
+
+    async def test_fencing(self):
+        print("\n🔍 Dead-letter fencing...")
+        message = await self._queue(signing_secret="s3cret", max_attempts=1)
+        slow, = await self.dispatcher.claim("slow-worker", self._lane(), 1)
+        # The slow worker's lease lapses and another worker takes the message over
+        await self.db.message_queue.update_one({"id": message["id"]},
+                                               {"$set": {"lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}})
+        await self.dispatcher.reclaim_expired_leases()
+        fast, = await self.dispatcher.claim("fast-worker", self._lane(), 1)
+
+        await self.dispatcher._record_outcomes("slow-worker", [(slow, PermanentDeliveryError("410 Gone"))])
+        stored = await self._message(message["id"])
+        self._check("Stale worker cannot fail the message", stored["status"] == "sending"
+                    and stored["claimed_by"] == "fast-worker")
+        self._check("Stale worker writes no dead letter",
+                    await self.db.message_dead_letters.count_documents({"tenant_id": self.tenant_id}) == 0)
+
+        await self.dispatcher._record_outcomes("fast-worker", [(fast, PermanentDeliveryError("410 Gone"))])
+        dead_letters = await self.db.message_dead_letters.find({"tenant_id": self.tenant_id}).to_list(None)
+        self._check("Claim holder dead-letters once", len(dead_letters) == 1
+                    and (await self._message(message["id"]))["status"] == "failed")
+        self._check("Dead letter does not copy the signing secret", "signing_secret" not in dead_letters[0])
+        listed = await self.kernel.dispatcher.get_dead_letters(self.tenant_id)
+        self._check("Dead-letter listing hides secrets and queue ids",
+                    listed and all("signing_secret" not in row and "queue_object_id" not in row for row in listed))
+
+        requeued = await self.dispatcher.requeue_dead_letter(self.tenant_id, dead_letters[0]["id"])
+        stored = await self._message(message["id"])
+        self._check("Requeued message keeps its secret", requeued and stored["status"] == "queued"
+                    and stored["signing_secret"] == "s3cret")
+
+    async def test_rate_cap(self):
+        print("\n🔍 Lane order under rate caps...")
+        capped = self.capped_tenant_id
+        await self.db.tenants.insert_one({"id": capped, "settings": {"message_rate_per_minute": 10}})
+        self.dispatcher.BATCH_SIZE = 5
+        bulk = [(await self._queue(capped, priority="bulk"))["id"] for _ in range(20)]
+        other = [(await self._queue(self.other_tenant_id, priority="bulk"))["id"] for _ in range(3)]
+        urgent = [(await self._queue(capped))["id"] for _ in range(2)]
+        adapter = RecordingAdapter()
+        self.dispatcher.adapters = {"webhook": adapter}
+        await self.dispatcher.run(workers=1, drain=True)
+
+        sent = [message_id for message_id in adapter.sent if message_id in bulk + urgent]
+        self._check("Transactional sent before older bulk", sent[:2] == urgent)
+        self._check("Tenant at its cap does not hold up another tenant", set(other) <= set(adapter.sent))
+        # Bulk stops at 8 of the 10 per minute, less what transactional used
+        self._check("Bulk stays inside its share of the cap", sent[2:] == bulk[:6])
+
+        # More confirmations arrive in the same minute, after bulk used up its share
+        late = [(await self._queue(capped))["id"] for _ in range(2)]
+        await self.dispatcher.run(workers=1, drain=True)
+        self._check("Transactional still sent once bulk is capped", adapter.sent[-2:] == late)
+        self._check("Capped bulk waits for the next minute", await self.db.message_queue.count_documents(
+            {"tenant_id": capped, "priority": "bulk", "status": "queued"}) == 14)
+
+    async def cleanup(self):
+        tenant_ids = {"$in": [self.tenant_id, self.capped_tenant_id, self.other_tenant_id]}
+        for collection in ("message_queue", "message_dead_letters", "message_lanes", "communication_rollups"):
+            await self.db[collection].delete_many({"tenant_id": tenant_ids})
+        await self.db.tenants.delete_many({"id": tenant_ids})
+        await self.db.message_rate_windows.delete_many({"_id": {"$regex": f"^{self.tenant_id}"}})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = MessageDispatcherTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Message Dispatcher Tests")
+    print("=" * 60)
+    try:
+        await tester.test_reclaim()
+        await tester.test_fencing()
+        await tester.test_rate_cap()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Notification Outbox Test
+Checks that outbox rows and broadcast chunks are queued exactly once: replayed
+relay batches, orphaned rows, rows that fail to render, replayed broadcast
+chunks, duplicate addresses and broadcasts paused mid-chunk
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.communication_kernel import CommunicationKernel
+
+
+class NotificationOutboxTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = CommunicationKernel(db)
+        self.tenant_id = f"outbox-{uuid.uuid4()}"
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    async def _queued(self, **query):
+        return await self.db.message_queue.find({"tenant_id": self.tenant_id, **query}, {"_id": 0}).to_list(None)
+
+    async def _relay_all(self):
+        outbox = self.kernel.notifications
+        while await outbox.relay_once() >= outbox.RELAY_BATCH:
+            pass
+
+    async def test_outbox(self):
+        print("\n🔍 Notification outbox relay...")
+        staff_id = str(uuid.uuid4())
+        await self.db.users.insert_one({"id": staff_id, "tenant_id": self.tenant_id, "email": "staff@example.com"})
+        tour_id = str(uuid.uuid4())
+        context = {"first_name": "Ada", "last_name": "Lovelace", "email": "ada@example.com",
+                   "scheduled_at": "Monday, March 03 at 10:00 UTC"}
+        await self.kernel.insert_with_notifications(self.tenant_id, "tours", {"id": tour_id, "tenant_id": self.tenant_id}, [
+            {"template": "tour_confirmation", "recipient": "ada@example.com", "context": context},
+            {"template": "tour_booked_notification", "recipient_user_id": staff_id, "context": context}
+        ])
+        rows = await self.db.notification_outbox.find({"tenant_id": self.tenant_id}).to_list(None)
+        self._check("Record and outbox rows written together",
+                    len(rows) == 2 and await self.db.tours.count_documents({"id": tour_id}) == 1)
+
+        await self._relay_all()
+        messages = {message["recipient"]: message for message in await self._queued(source={"collection": "tours",
+                                                                                          "id": tour_id})}
+        self._check("Both notifications queued", set(messages) == {"ada@example.com", "staff@example.com"})
+        self._check("Staff user resolved to their email", "staff@example.com" in messages)
+        self._check("Default template rendered",
+                    messages.get("ada@example.com", {}).get("subject") == "Your tour is booked for Monday, March 03 at 10:00 UTC")
+        self._check("Relayed rows removed", await self.db.notification_outbox.count_documents(
+            {"tenant_id": self.tenant_id}) == 0)
+
+        # A relay that crashed after queueing but before deleting its rows replays them
+        for row in rows:
+            row.pop("_id")
+        await self.db.notification_outbox.insert_many(rows)
+        await self._relay_all()
+        self._check("Replayed rows are not queued twice", len(await self._queued(source={"collection": "tours",
+                                                                                          "id": tour_id})) == 2)
+        self._check("Replayed rows removed", await self.db.notification_outbox.count_documents(
+            {"tenant_id": self.tenant_id}) == 0)
+
+    async def test_orphans(self):
+        print("\n🔍 Rows whose record was never written...")
+        outbox = self.kernel.notifications
+        missing_id = str(uuid.uuid4())
+        rows = outbox._rows(self.tenant_id, "tours", missing_id, [
+            {"template": "tour_confirmation", "recipient": "ghost@example.com", "context": {}}
+        ])
+        rows[0]["source_check"] = True
+        await self.db.notification_outbox.insert_many(rows)
+        await self._relay_all()
+        self._check("Row waits while its record may still arrive",
+                    await self.db.notification_outbox.count_documents({"tenant_id": self.tenant_id}) == 1)
+
+        await self.db.notification_outbox.update_many(
+            {"tenant_id": self.tenant_id},
+            {"$set": {"created_at": datetime.utcnow() - timedelta(seconds=outbox.SOURCE_GRACE_SECONDS + 1)}}
+        )
+        await self._relay_all()
+        self._check("Row dropped after the grace period without sending",
+                    await self.db.notification_outbox.count_documents({"tenant_id": self.tenant_id}) == 0
+                    and not await self._queued(recipient="ghost@example.com"))
+
+    async def test_failed_rows(self):
+        print("\n🔍 Rows that cannot be rendered...")
+        outbox = self.kernel.notifications
+        source_id = str(uuid.uuid4())
+        broken = outbox._rows(self.tenant_id, "tours", source_id, [
+            {"template": "no_such_template", "recipient": "broken@example.com", "context": {}}
+        ])
+        healthy = outbox._rows(self.tenant_id, "tours", source_id, [
+            {"template": "tour_confirmation", "recipient": "fine@example.com", "context": {"scheduled_at": "noon"}}
+        ])
+        # The broken row is oldest, so it heads the batch
+        broken[0]["created_at"] -= timedelta(minutes=5)
+        await self.db.notification_outbox.insert_many(broken + healthy)
+        await self._relay_all()
+        self._check("Rows behind a failing row are still queued", len(await self._queued(recipient="fine@example.com")) == 1)
+        failed = await self.db.notification_outbox.find({"tenant_id": self.tenant_id}).to_list(None)
+        self._check("Failing row is set aside with its error",
+                    len(failed) == 1 and failed[0]["id"] == broken[0]["id"] and failed[0].get("error"))
+        self._check("Failing row is not read again", await outbox.relay_once() == 0)
+        await self.db.notification_outbox.delete_many({"tenant_id": self.tenant_id})
+
+    async def test_broadcast(self):
+        print("\n🔍 Broadcast dedupe...")
+        template = await self.kernel.create_message_template(self.tenant_id, {
+            "name": "Newsletter", "channel": "email", "subject": "News for {first_name}", "body": "Hello"
+        })
+        addresses = ["a@example.com", "b@example.com", "A@Example.com ", None, "c@example.com"]
+        await self.db.leads.insert_many([
+            {"id": str(uuid.uuid4()), "tenant_id": self.tenant_id, "first_name": f"Lead {index}",
+             "email": address, "status": "new_inquiry", "created_at": datetime.utcnow()}
+            for index, address in enumerate(addresses)
+        ])
+        pipeline = self.kernel.broadcasts
+        pipeline.CHUNK_SIZE = 2
+        broadcast = await self.kernel.create_broadcast(self.tenant_id, {"template_id": template["id"],
+                                                                        "audience": "leads"})
+        await pipeline.run_next()
+        progress = await self.kernel.get_broadcast(self.tenant_id, broadcast["id"])
+        queued = await self._queued(broadcast_id=broadcast["id"])
+        self._check("Broadcast completed", progress["status"] == "completed" and progress["processed"] == 5)
+        self._check("Duplicate and missing addresses skipped",
+                    len(queued) == 3 and progress["queued"] == 3 and progress["skipped"] == 2)
+        self._check("Messages rendered per recipient",
+                    sorted(message["subject"] for message in queued) == ["News for Lead 0", "News for Lead 1",
+                                                                         "News for Lead 4"])
+
+        # Another process takes over from an old checkpoint after the lease expired
+        await self.db.broadcasts.update_one({"id": broadcast["id"]}, {
+            "$set": {"status": "running", "last_recipient": None, "processed": 0, "queued": 0, "skipped": 0,
+                     "lease_expires_at": datetime.utcnow() - timedelta(seconds=1)}
+        })
+        await pipeline.run_next()
+        progress = await self.kernel.get_broadcast(self.tenant_id, broadcast["id"])
+        self._check("Replayed chunks queue nothing new",
+                    len(await self._queued(broadcast_id=broadcast["id"])) == 3 and progress["queued"] == 0)
+
+    async def test_broadcast_pause(self):
+        print("\n🔍 Broadcast paused mid-chunk...")
+        template = await self.db.message_templates.find_one({"tenant_id": self.tenant_id, "name": "Newsletter"})
+        pipeline = self.kernel.broadcasts
+        broadcast = await self.kernel.create_broadcast(self.tenant_id, {"template_id": template["id"],
+                                                                        "audience": "leads"})
+        await self.db.broadcasts.update_one({"id": broadcast["id"]},
+                                            {"$set": {"status": "running", "lease_owner": pipeline.worker_id}})
+        running = await self.db.broadcasts.find_one({"id": broadcast["id"]})
+        first = await self.db.leads.find({"tenant_id": self.tenant_id}).sort("_id", 1).limit(2).to_list(None)
+        # The pause lands while the first chunk is being enqueued
+        await self.kernel.update_broadcast_status(self.tenant_id, broadcast["id"], "pause")
+        self._check("Chunk finished after a pause reports it", not await pipeline._enqueue_chunk(running, first))
+        progress = await self.kernel.get_broadcast(self.tenant_id, broadcast["id"])
+        self._check("Paused broadcast keeps the chunk's counts", progress["status"] == "paused"
+                    and progress["processed"] == 2 and progress["queued"] == 2)
+
+        await self.kernel.update_broadcast_status(self.tenant_id, broadcast["id"], "resume")
+        await pipeline.run_next()
+        progress = await self.kernel.get_broadcast(self.tenant_id, broadcast["id"])
+        self._check("Resume does not count the queued chunk as skipped", progress["status"] == "completed"
+                    and progress["processed"] == 5 and progress["queued"] == 3 and progress["skipped"] == 2)
+
+    async def cleanup(self):
+        for collection in ("users", "tours", "leads", "notification_outbox", "message_queue", "message_templates",
+                           "message_lanes", "communication_rollups", "broadcasts"):
+            await self.db[collection].delete_many({"tenant_id": self.tenant_id})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = NotificationOutboxTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Notification Outbox Tests")
+    print("=" * 60)
+    try:
+        await tester.test_outbox()
+        await tester.test_orphans()
+        await tester.test_failed_rows()
+        await tester.test_broadcast()
+        await tester.test_broadcast_pause()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
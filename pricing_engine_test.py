@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Pricing Engine Test
+Checks RateTable pricing against hand-computed quotes: hourly and daily rates,
+time-of-week and per-day seasonal multipliers, add-ons and windows longer than a week
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.pricing_engine import RateTable
+
+
+class PricingEngineTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    @staticmethod
+    def _table(resources=None, booking_rules=None, pricing_settings=None):
+        resources = resources or [{"id": "room", "name": "Room", "type": "meeting_room", "hourly_rate": 10.0}]
+        return RateTable(resources, booking_rules or {}, [], pricing_settings or {})
+
+    @staticmethod
+    def _quote(table, start, minutes, resource=0, **kwargs):
+        prices = table.price(
+            np.array([resource]), np.array([np.datetime64(start, "m")]), np.array([minutes]), **kwargs
+        )
+        return float(prices["total_price"][0])
+
+    def test_hourly(self):
+        print("\n🔍 Hourly pricing...")
+        table = self._table()
+        monday = datetime(2030, 1, 7, 9, 0)
+        self._check("Two hours at 10/h cost 20", self._quote(table, monday, 120) == 20.0)
+        self._check("Ninety minutes cost 15", self._quote(table, monday, 90) == 15.0)
+        self._check("Window across Sunday midnight priced in full",
+                    self._quote(table, datetime(2030, 1, 6, 23, 0), 120) == 20.0)
+
+    def test_longer_than_a_week(self):
+        print("\n🔍 Windows longer than a week...")
+        table = self._table()
+        monday = datetime(2030, 1, 7, 9, 0)
+        one_week = self._quote(table, monday, 7 * 24 * 60)
+        two_weeks = self._quote(table, monday, 14 * 24 * 60)
+        self._check("7 days at 10/h cost 1680", one_week == 1680.0)
+        self._check("14 days cost twice 7 days", two_weeks == 3360.0)
+        self._check("10 days cost 2400", self._quote(table, monday, 10 * 24 * 60) == 2400.0)
+
+        evenings = self._table(pricing_settings={"time_rates": [{"start": "18:00", "end": "22:00", "multiplier": 2.0}]})
+        # Every day has 4 double-priced hours: 168 + 28 = 196 weighted hours per week
+        self._check("Time-of-day rates apply to every week of a long window",
+                    self._quote(evenings, monday, 15 * 24 * 60) == round(196 * 10 * 15 / 7, 2))
+
+    def test_multipliers(self):
+        print("\n🔍 Multipliers, daily caps and add-ons...")
+        weekend = self._table(pricing_settings={"time_rates": [{"start": "00:00", "end": "24:00", "days": [5, 6],
+                                                                 "multiplier": 1.5}]})
+        self._check("Weekend rate applied on Saturday", self._quote(weekend, datetime(2030, 1, 12, 10, 0), 60) == 15.0)
+        self._check("Weekday unaffected", self._quote(weekend, datetime(2030, 1, 8, 10, 0), 60) == 10.0)
+
+        seasonal = self._table(pricing_settings={"seasonal": [{"start": "12-20", "end": "01-05", "multiplier": 2.0}]})
+        self._check("Season wrapping the new year applies in January",
+                    self._quote(seasonal, datetime(2030, 1, 2, 10, 0), 60) == 20.0)
+        self._check("Season does not apply outside its dates",
+                    self._quote(seasonal, datetime(2030, 2, 2, 10, 0), 60) == 10.0)
+        self._check("Each day of a booking takes its own season, entering",
+                    self._quote(seasonal, datetime(2030, 12, 19, 23, 0), 120) == 30.0)
+        self._check("Each day of a booking takes its own season, leaving",
+                    self._quote(seasonal, datetime(2030, 1, 5, 23, 0), 120) == 30.0)
+        evenings = {"time_rates": [{"start": "18:00", "end": "22:00", "multiplier": 2.0}]}
+        neutral = self._table(pricing_settings={**evenings, "seasonal": [{"start": "06-01", "end": "06-30",
+                                                                          "multiplier": 1.0}]})
+        self._check("Per-day seasonal pricing matches the weekly integral when seasons are neutral",
+                    self._quote(neutral, datetime(2030, 1, 7, 9, 30), 15 * 24 * 60 + 45) ==
+                    self._quote(self._table(pricing_settings=evenings), datetime(2030, 1, 7, 9, 30), 15 * 24 * 60 + 45))
+
+        capped = self._table(resources=[{"id": "desk", "type": "desk", "hourly_rate": 10.0, "daily_rate": 50.0}])
+        self._check("Daily rate caps a full day", self._quote(capped, datetime(2030, 1, 7, 0, 0), 24 * 60) == 50.0)
+        self._check("Short booking stays hourly", self._quote(capped, datetime(2030, 1, 7, 9, 0), 120) == 20.0)
+        seasonal_cap = self._table(resources=[{"id": "desk", "type": "desk", "hourly_rate": 10.0, "daily_rate": 50.0}],
+                                   pricing_settings={"seasonal": [{"start": "12-20", "end": "01-05", "multiplier": 2.0}]})
+        self._check("Daily cap follows the average season of the days booked",
+                    self._quote(seasonal_cap, datetime(2030, 1, 5, 0, 0), 48 * 60) == 150.0)
+
+        free = self._table(resources=[{"id": "lobby", "type": "lobby", "hourly_rate": 10.0, "pricing_tier": "free"}])
+        self._check("Free pricing tier costs nothing", self._quote(free, datetime(2030, 1, 7, 9, 0), 120) == 0.0)
+
+        add_ons = self._table(pricing_settings={"add_ons": {
+            "catering": {"price": 5.0, "unit": "per_attendee"},
+            "projector": {"price": 2.0, "unit": "per_hour"},
+            "cleaning": {"price": 15.0, "unit": "flat"}
+        }})
+        total = self._quote(add_ons, datetime(2030, 1, 7, 9, 0), 120, attendees=np.array([4]),
+                            add_ons=["catering", "projector", "cleaning"])
+        self._check("Add-ons priced per attendee, per hour and flat", total == 20.0 + 20.0 + 4.0 + 15.0)
+        try:
+            self._quote(add_ons, datetime(2030, 1, 7, 9, 0), 60, add_ons=["valet"])
+            self._check("Unknown add-on rejected", False)
+        except ValueError:
+            self._check("Unknown add-on rejected", True)
+
+
+def main():
+    tester = PricingEngineTester()
+
+    print("🚀 Starting Pricing Engine Tests")
+    print("=" * 60)
+    tester.test_hourly()
+    tester.test_longer_than_a_week()
+    tester.test_multipliers()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Recurring Booking Test
+Checks recurrence expansion and validation, series creation and the booking
+status transitions that release and re-reserve slots
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.booking_kernel import BookingKernel
+
+
+class RecurringBookingTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = BookingKernel(db)
+        self.tenant_id = f"recurring-{uuid.uuid4()}"
+        self.resource_id = f"room-{uuid.uuid4()}"
+        # A Monday, two weeks out
+        today = datetime.utcnow().replace(hour=9, minute=0, second=0, microsecond=0)
+        self.monday = today + timedelta(days=14 - today.weekday())
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    def _rejects(self, name, call):
+        try:
+            call()
+        except ValueError as e:
+            return self._check(f"{name} ({e})", True)
+        return self._check(name, False)
+
+    def _booking(self, start_time, minutes=60):
+        return {
+            "tenant_id": self.tenant_id,
+            "resource_id": self.resource_id,
+            "title": "Weekly standup",
+            "start_time": start_time,
+            "end_time": start_time + timedelta(minutes=minutes)
+        }
+
+    def test_expansion(self):
+        print("\n🔍 Recurrence expansion...")
+        start, end = self.monday, self.monday + timedelta(hours=1)
+        expand = self.kernel.expand_recurrence
+
+        daily = expand(start, end, {"frequency": "daily", "interval": 2, "count": 4})
+        self._check("Daily every other day", [occ["start_time"] for occ in daily] ==
+                    [start + timedelta(days=day) for day in (0, 2, 4, 6)])
+
+        weekly = expand(start, end, {"frequency": "weekly", "by_weekday": [0, 2], "count": 5})
+        self._check("Weekly on Monday and Wednesday",
+                    [occ["start_time"].weekday() for occ in weekly] == [0, 2, 0, 2, 0])
+        self._check("Occurrences keep the booking duration",
+                    all(occ["end_time"] - occ["start_time"] == timedelta(hours=1) for occ in weekly))
+
+        until = expand(start, end, {"frequency": "weekly", "until": start + timedelta(weeks=3)})
+        self._check("Until is inclusive", len(until) == 4)
+
+        jan_31 = datetime(2030, 1, 31, 9, 0)
+        monthly = expand(jan_31, jan_31 + timedelta(hours=1), {"frequency": "monthly", "count": 3})
+        self._check("Monthly skips months without the day",
+                    [occ["start_time"].month for occ in monthly] == [1, 3, 5])
+
+    def test_validation(self):
+        print("\n🔍 Recurrence validation...")
+        start, end = self.monday, self.monday + timedelta(hours=1)
+        expand = self.kernel.expand_recurrence
+        limit = self.kernel.MAX_SERIES_OCCURRENCES
+
+        self._rejects("Rule without count or until rejected",
+                      lambda: expand(start, end, {"frequency": "daily"}))
+        self._rejects("Until before the start rejected",
+                      lambda: expand(start, end, {"frequency": "daily", "until": start - timedelta(days=1)}))
+        self._rejects("Out of range weekday rejected",
+                      lambda: expand(start, end, {"frequency": "weekly", "by_weekday": [7], "count": 2}))
+        self._rejects("Count above the series limit rejected",
+                      lambda: expand(start, end, {"frequency": "daily", "count": limit + 1}))
+        self._rejects("Until beyond the series limit rejected",
+                      lambda: expand(start, end, {"frequency": "daily", "until": start + timedelta(days=limit + 10)}))
+        self._rejects("Unsupported frequency rejected",
+                      lambda: expand(start, end, {"frequency": "hourly", "count": 2}))
+        self._check("Count at the series limit accepted",
+                    len(expand(start, end, {"frequency": "daily", "count": limit})) == limit)
+
+    async def test_series(self):
+        print("\n🔍 Series creation and status changes...")
+        await self.kernel.set_availability_schedules(self.tenant_id, {
+            self.resource_id: [{"day_of_week": day, "start_time": "08:00", "end_time": "18:00"} for day in range(7)]
+        })
+
+        try:
+            await self.kernel.create_recurring_booking(
+                self.tenant_id, self._booking(self.monday), {"frequency": "weekly", "until": self.monday - timedelta(days=7)}
+            )
+            self._check("Empty series rejected", False)
+        except ValueError:
+            self._check("Empty series rejected", True)
+
+        # A one-off booking in week 2 conflicts with that occurrence
+        blocker = await self.kernel.create_booking(self.tenant_id, self._booking(self.monday + timedelta(weeks=1)))
+        result = await self.kernel.create_recurring_booking(
+            self.tenant_id, self._booking(self.monday), {"frequency": "weekly", "count": 4}
+        )
+        statuses = [entry["status"] for entry in result["occurrences"]]
+        self._check("Conflicting occurrence skipped, others booked",
+                    statuses == ["booked", "conflict", "booked", "booked"])
+        series_id = result["series"]["id"]
+
+        cancelled = await self.kernel.update_series(self.tenant_id, series_id, self.monday + timedelta(weeks=2),
+                                                    {"status": "cancelled"})
+        self._check("Following occurrences cancelled", cancelled == 2)
+        self._check("Cancelled occurrences released their slots", await self.db.booking_guards.count_documents(
+            {"series_id": series_id}) == len(list(self.kernel._iter_slots(self.monday, self.monday + timedelta(hours=1)))))
+
+        try:
+            await self.kernel.update_series(self.tenant_id, series_id, self.monday, {"status": "rejected"})
+            self._check("Confirmed to rejected refused", False)
+        except ValueError:
+            self._check("Confirmed to rejected refused", True)
+
+        # Someone takes week 3's slot; reconfirming the series may only restore week 4
+        await self.kernel.create_booking(self.tenant_id, self._booking(self.monday + timedelta(weeks=2)))
+        restored = await self.kernel.update_series(self.tenant_id, series_id, self.monday + timedelta(weeks=2),
+                                                   {"status": "confirmed"})
+        self._check("Reconfirming restores only free occurrences", restored == 1)
+        overlaps = await self._overlaps()
+        self._check("No double bookings after reconfirming", overlaps == 0)
+
+        # Single booking: cancel, take the slot, then try to reconfirm
+        await self.kernel.update_booking_status(blocker["id"], "cancelled")
+        retaken = await self.kernel.create_booking(self.tenant_id, self._booking(self.monday + timedelta(weeks=1)))
+        try:
+            await self.kernel.update_booking_status(blocker["id"], "confirmed")
+            self._check("Reconfirming a booking whose slot was taken refused", False)
+        except ValueError:
+            self._check("Reconfirming a booking whose slot was taken refused", True)
+        await self.kernel.update_booking_status(retaken["id"], "cancelled")
+        self._check("Reconfirming a booking whose slot is free succeeds",
+                    await self.kernel.update_booking_status(blocker["id"], "confirmed"))
+        try:
+            await self.kernel.update_booking_status(blocker["id"], "archived")
+            self._check("Unknown status refused", False)
+        except ValueError:
+            self._check("Unknown status refused", True)
+
+    async def _overlaps(self):
+        bookings = await self.db.bookings.find(
+            {"tenant_id": self.tenant_id, "resource_id": self.resource_id, "status": {"$in": ["confirmed", "pending"]}}
+        ).sort("start_time", 1).to_list(None)
+        return sum(1 for previous, current in zip(bookings, bookings[1:]) if current["start_time"] < previous["end_time"])
+
+    async def cleanup(self):
+        await self.db.bookings.delete_many({"tenant_id": self.tenant_id})
+        await self.db.booking_guards.delete_many({"tenant_id": self.tenant_id})
+        await self.db.booking_series.delete_many({"tenant_id": self.tenant_id})
+        await self.db.availability_schedules.delete_many({"tenant_id": self.tenant_id})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = RecurringBookingTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Recurring Booking Tests")
+    print("=" * 60)
+    try:
+        tester.test_expansion()
+        tester.test_validation()
+        await tester.test_series()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Revenue Rollups Test
+Checks that the daily revenue rollups kept as invoices are paid, unpaid and
+cancelled and as payments arrive match a rebuild from invoices and transactions
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.financial_kernel import FinancialKernel
+from kernels.revenue_reports import ROLLUP_FIELDS
+
+
+class RevenueRollupsTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = FinancialKernel(db)
+        self.tenant_id = f"revenue-{uuid.uuid4()}"
+        self.start = datetime(2030, 3, 1)
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    async def _invoice(self, day, hour, unit_price):
+        invoice = await self.kernel.create_invoice(self.tenant_id, "customer-1", [
+            {"description": "Office", "unit_price": unit_price, "quantity": 1}
+        ])
+        await self.db.invoices.update_one({"id": invoice["id"]}, {"$set": {
+            "created_at": self.start + timedelta(days=day, hours=hour)
+        }})
+        return invoice["id"]
+
+    async def _rollups(self):
+        # A day whose counters went back to zero is kept by the increments and dropped by a rebuild
+        return {
+            rollup["date"]: {field: rollup.get(field, 0) for field in ROLLUP_FIELDS}
+            async for rollup in self.db.revenue_daily.find({"tenant_id": self.tenant_id})
+            if any(rollup.get(field, 0) for field in ROLLUP_FIELDS)
+        }
+
+    async def _report(self, start, end, group_by="day"):
+        report = await self.kernel.get_revenue_report(self.tenant_id, start, end, group_by)
+        report["series"] = [row for row in report["series"] if any(row[field] for field in ROLLUP_FIELDS)]
+        return report
+
+    async def test_incremental(self):
+        print("\n🔍 Rollups kept as invoices and payments change...")
+        # Build the (empty) rollups first so everything after is maintained incrementally
+        await self.kernel.get_revenue_report(self.tenant_id, self.start, self.start + timedelta(days=10))
+
+        first = await self._invoice(0, 9, "100.00")
+        second = await self._invoice(0, 17, "40.50")
+        third = await self._invoice(2, 12, "75.00")
+        fourth = await self._invoice(4, 8, "12.25")
+        for invoice_id in (first, second, third, fourth):
+            await self.kernel.update_invoice_status(invoice_id, "paid")
+        await self.kernel.update_invoice_status(second, "sent")
+        await self.kernel.update_invoice_status(fourth, "cancelled")
+        await self.kernel.update_invoice_status(fourth, "paid")
+        await self.kernel.update_invoice_status(third, "paid")
+        for day, amount in ((0, "100.00"), (3, "75.00"), (3, "0.99")):
+            await self.kernel.create_transaction(self.tenant_id, {
+                "type": "payment", "customer_id": "customer-1", "amount": amount,
+                "transaction_date": self.start + timedelta(days=day, hours=15)
+            })
+
+        rollups = await self._rollups()
+        self._check("Paid revenue per day", {day.day: values["paid_revenue_minor"] for day, values in rollups.items()
+                                             if values["paid_revenue_minor"]} == {1: 10000, 3: 7500, 5: 1225})
+        self._check("Repeated and reversed statuses counted once", sum(
+            values["paid_invoices"] for values in rollups.values()) == 3)
+        self._check("Payments per day", {day.day: (values["payments"], values["payment_amount_minor"])
+                                         for day, values in rollups.items() if values["payments"]} ==
+                    {1: (1, 10000), 4: (2, 7599)})
+
+    async def test_rebuild(self):
+        print("\n🔍 Rollups against a rebuild...")
+        window = (self.start, self.start + timedelta(days=10))
+        kept, kept_report = await self._rollups(), await self._report(*window)
+        partial = (self.start + timedelta(hours=12), self.start + timedelta(days=4, hours=12))
+        kept_partial = await self._report(*partial)
+
+        await self.kernel.rebuild_revenue_rollups(self.tenant_id)
+        rebuilt = await self._rollups()
+        self._check("Daily rollups match a rebuild", kept == rebuilt)
+        rebuilt_report = await self._report(*window)
+        self._check("Report from kept rollups matches the rebuilt one", all(
+            kept_report[key] == rebuilt_report[key]
+            for key in ("total_revenue_minor", "invoice_count", "payment_amount_minor", "transaction_count", "series")
+        ))
+        self._check("Report totals", rebuilt_report["total_revenue_minor"] == 18725
+                    and rebuilt_report["payment_amount_minor"] == 17599)
+
+        # Part-days at either end of the window come from the raw collections
+        rebuilt_partial = await self._report(*partial)
+        self._check("Partial-day window matches after a rebuild", kept_partial["series"] == rebuilt_partial["series"])
+        self._check("Partial-day window leaves out the hours outside it",
+                    rebuilt_partial["total_revenue_minor"] == 7500 + 1225
+                    and rebuilt_partial["payment_amount_minor"] == 17599)
+
+    async def cleanup(self):
+        for collection in ("invoices", "line_items", "transactions", "ledger_entries", "revenue_daily"):
+            await self.db[collection].delete_many({"tenant_id": self.tenant_id})
+        await self.db.revenue_rollup_state.delete_one({"_id": self.tenant_id})
+        await self.db.counters.delete_one({"_id": f"invoice:{self.tenant_id}"})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = RevenueRollupsTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Revenue Rollups Tests")
+    print("=" * 60)
+    try:
+        await tester.test_incremental()
+        await tester.test_rebuild()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Template Engine Test
+Checks compiled message templates: placeholder lookup, filters, HTML escaping
+and the compiled template cache
+"""
+
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.template_engine import CompiledTemplate, TemplateCache, validate_template
+
+
+class TemplateEngineTester:
+    def __init__(self):
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    @staticmethod
+    def _render(source, context, autoescape=False):
+        return CompiledTemplate(source, autoescape).render(context)
+
+    def test_placeholders(self):
+        print("\n🔍 Placeholders...")
+        self._check("Plain placeholder", self._render("Hi {first_name}!", {"first_name": "Ada"}) == "Hi Ada!")
+        self._check("Dotted path", self._render("{lead.first_name}", {"lead": {"first_name": "Ada"}}) == "Ada")
+        self._check("Flat key with a dot wins over the path",
+                    self._render("{lead.name}", {"lead.name": "flat", "lead": {"name": "nested"}}) == "flat")
+        self._check("Unknown placeholder left as written", self._render("Hi {nobody}", {}) == "Hi {nobody}")
+        self._check("Non-placeholder braces are literal", self._render("{ x } {1}", {}) == "{ x } {1}")
+        self._check("None renders empty", self._render("[{company}]", {"company": None}) == "[]")
+
+    def test_filters(self):
+        print("\n🔍 Filters...")
+        context = {"name": "  ada lovelace  ", "empty": "", "none": None}
+        self._check("upper", self._render("{name|strip|upper}", context) == "ADA LOVELACE")
+        self._check("title", self._render("{name|strip|title}", context) == "Ada Lovelace")
+        self._check("capitalize", self._render("{name|strip|capitalize}", context) == "Ada lovelace")
+        self._check("truncate with a length", self._render("{name|strip|truncate:3}", context) == "ada")
+        self._check("default for missing, empty and None values",
+                    self._render("{missing|default:there} {empty|default:x} {none|default:y}", context) ==
+                    "there x y")
+        self._check("default after a text filter still applies",
+                    self._render("{missing|upper|default:there} {none|title|default:y}", context) == "there y")
+        self._check("Filter without default keeps None empty", self._render("[{none|upper}]", context) == "[]")
+        for source in ("{name|shout}", "{name|truncate:abc}"):
+            try:
+                CompiledTemplate(source, strict=True)
+                self._check(f"Invalid filter rejected when validated: {source}", False)
+            except ValueError:
+                self._check(f"Invalid filter rejected when validated: {source}", True)
+        self._check("Invalid filter left as text when rendering a stored template",
+                    self._render("Hi {name|shout} {x|y}, {first}", {"name": "Ada", "first": "ok"}) ==
+                    "Hi {name|shout} {x|y}, ok")
+        try:
+            validate_template({"subject": "Hi {first_name}", "body": "{a|b}"})
+            self._check("validate_template checks the body", False)
+        except ValueError:
+            self._check("validate_template checks the body", True)
+
+    def test_escaping(self):
+        print("\n🔍 HTML escaping...")
+        context = {"name": "<b>Ada</b> & co"}
+        self._check("Text templates are not escaped", self._render("{name}", context) == "<b>Ada</b> & co")
+        self._check("HTML templates escape values",
+                    self._render("<p>{name}</p>", context, autoescape=True) == "<p>&lt;b&gt;Ada&lt;/b&gt; &amp; co</p>")
+        self._check("raw opts out of escaping", self._render("{name|raw}", context, autoescape=True) == context["name"])
+        self._check("escape opts in for text templates", self._render("{name|escape}", context) ==
+                    "&lt;b&gt;Ada&lt;/b&gt; &amp; co")
+
+    def test_cache(self):
+        print("\n🔍 Compiled template cache...")
+        cache = TemplateCache()
+        cache.SIZE = 2
+        created = datetime(2030, 1, 1)
+        template = {"id": "t1", "subject": "Hi {name}", "body": "<p>{name}</p>", "format": "html",
+                    "created_at": created}
+        first = cache.get(template)
+        self._check("Same version compiled once", cache.get(dict(template)) is first)
+        self._check("Body of an HTML template escapes, subject does not",
+                    first[0].render({"name": "<x>"}) == "Hi <x>" and first[1].render({"name": "<x>"}) == "<p>&lt;x&gt;</p>")
+        edited = {**template, "subject": "Hello {name}", "updated_at": datetime(2030, 1, 2)}
+        self._check("An edit is a new entry", cache.get(edited)[0].render({"name": "Ada"}) == "Hello Ada")
+        cache.get({"id": "t2", "subject": "", "body": "", "created_at": created})
+        self._check("Least recently used entry evicted", len(cache._entries) == 2
+                    and ("t1", created) not in cache._entries)
+        cache.invalidate("t1")
+        self._check("Invalidate drops every version of a template", all(key[0] != "t1" for key in cache._entries))
+
+
+def main():
+    tester = TemplateEngineTester()
+
+    print("🚀 Starting Template Engine Tests")
+    print("=" * 60)
+    tester.test_placeholders()
+    tester.test_filters()
+    tester.test_escaping()
+    tester.test_cache()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Timer Wheel Test
+Checks the hierarchical timer wheel (cascading between levels, cancelling,
+span limits) and the delayed workflow actions scheduled on it
+"""
+
+import asyncio
+import math
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.communication_kernel import CommunicationKernel
+from kernels.action_scheduler import _seconds
+from kernels.timer_wheel import TimerWheel
+
+
+class TimerWheelTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = CommunicationKernel(db)
+        self.tenant_id = f"timers-{uuid.uuid4()}"
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    @staticmethod
+    def _fired_at(wheel, end):
+        """Advance one tick at a time and record the tick each key fired on"""
+        fired = {}
+        while wheel.current < end:
+            for key, _ in wheel.advance(wheel.current + 1):
+                fired[key] = wheel.current
+        return fired
+
+    def test_cascade(self):
+        print("\n🔍 Cascading between levels...")
+        # 4 slots x 3 levels: level 0 is 1 tick wide, level 1 is 4, level 2 is 16
+        wheel = TimerWheel(0, slots=4, levels=3)
+        dues = {"same-level": 3, "level-1": 7, "level-2": 37, "block-edge": 16, "last": 48}
+        for key, due in dues.items():
+            wheel.add(key, due, key)
+        self._check("Timers spread over the levels", {level for level, _ in wheel._where.values()} == {0, 1, 2})
+
+        fired = self._fired_at(wheel, 60)
+        self._check("Every timer fires on its own tick", fired == dues)
+        self._check("Wheel empty once everything fired", len(wheel) == 0 and not wheel._where)
+
+        wheel = TimerWheel(0, slots=4, levels=3)
+        wheel.add("moved", 37)
+        wheel.advance(32)
+        self._check("Timer cascaded down a level", wheel._where["moved"][0] < 2)
+        self._check("Cancelling after a cascade", wheel.remove("moved") and "moved" not in wheel)
+        self._check("Nothing fires after cancelling", self._fired_at(wheel, 60) == {})
+
+        wheel = TimerWheel(100.5, tick=0.5, slots=8, levels=2)
+        self._check("Past due timers fire on the next advance",
+                    wheel.add("late", 90) and wheel.advance(100.5) == [("late", None)])
+        wheel.add("soon", 101.2, "payload")
+        self._check("Fractional due time rounds up to the next tick",
+                    wheel.advance(101.0) == [] and wheel.advance(101.5) == [("soon", "payload")])
+
+    def test_span(self):
+        print("\n🔍 Span limits...")
+        wheel = TimerWheel(0, slots=4, levels=3)
+        self._check("Span is the distance the top level always covers", wheel.span == 48)
+        # At the last tick of a top-level slot the full span must still fit
+        wheel.advance(15)
+        self._check("Timer at the edge of the span accepted", wheel.add("edge", 15 + wheel.span))
+        self._check("Timer beyond every level rejected", not wheel.add("far", 15 + 4 ** 3))
+        self._check("Edge timer fires on time", self._fired_at(wheel, 80).get("edge") == 15 + 48)
+
+        # Randomised: every accepted timer fires on the first tick at or after its due time
+        rng = random.Random(7)
+        wheel = TimerWheel(0, slots=8, levels=3)
+        pending, late = {}, 0
+        for _ in range(2000):
+            key = rng.randrange(200)
+            due = wheel.current + rng.uniform(-2, wheel.span)
+            if wheel.add(key, due):
+                pending[key] = due
+            if pending and rng.random() < 0.1:
+                key = rng.choice(list(pending))
+                wheel.remove(key)
+                del pending[key]
+            now = wheel.current + rng.uniform(0, 20)
+            for key, _ in wheel.advance(now):
+                late += math.ceil(pending.pop(key)) > int(now)
+            late += sum(math.ceil(due) <= int(now) for due in pending.values())
+        self._check("Random schedule fires nothing early or late", late == 0 and len(wheel) == len(pending))
+
+    async def test_scheduler(self):
+        print("\n🔍 Delayed workflow actions...")
+        scheduler = self.kernel.timers
+        now = datetime.utcnow()
+        scheduler.wheel = TimerWheel(_seconds(now))
+        workflow = {"id": "follow-up", "trigger_event": "lead_created"}
+        action = {"type": "update_status", "entity_type": "lead", "status": "tour_scheduled", "delay_minutes": 30}
+        lead_id = str(uuid.uuid4())
+        await self.db.leads.insert_one({"id": lead_id, "tenant_id": self.tenant_id, "status": "new_inquiry"})
+
+        # Scheduled 40 minutes ago, so the 30 minute delay has passed
+        due, = await scheduler.schedule(self.tenant_id, workflow, [action], {"lead_id": lead_id},
+                                        now=now - timedelta(minutes=40))
+        later, = await scheduler.schedule(self.tenant_id, workflow, [{**action, "delay_minutes": 600}],
+                                          {"lead_id": lead_id})
+        loaded = await scheduler.load()
+        self._check("Only actions inside the horizon are loaded", due["id"] in scheduler.wheel
+                    and later["id"] not in scheduler.wheel and loaded >= 1)
+
+        fired = [key for key, _ in scheduler.wheel.advance(_seconds(datetime.utcnow()))]
+        self._check("Overdue action comes off the wheel", due["id"] in fired)
+        await scheduler._fire(due["id"])
+        lead = await self.db.leads.find_one({"id": lead_id})
+        stored = await self.db.scheduled_actions.find_one({"id": due["id"]})
+        self._check("Action ran and was completed", lead["status"] == "tour_scheduled"
+                    and stored["status"] == "completed")
+        await scheduler._fire(due["id"])
+        self._check("A second fire of the same timer is skipped", scheduler.metrics["skipped"] == 1)
+
+        cancelled = await scheduler.cancel(self.tenant_id, "lead", lead_id)
+        stored = await self.db.scheduled_actions.find_one({"id": later["id"]})
+        self._check("Cancelling by entity stops pending actions",
+                    cancelled == 1 and stored["status"] == "cancelled")
+
+        # A workflow for an event published before the cancel runs late, off the event bus
+        before = datetime.utcnow() - timedelta(seconds=5)
+        stale, = await scheduler.schedule(self.tenant_id, workflow, [{**action, "status": "lost"}],
+                                          {"lead_id": lead_id}, now=now - timedelta(minutes=40), triggered_at=before)
+        await scheduler._fire(stale["id"])
+        stored = await self.db.scheduled_actions.find_one({"id": stale["id"]})
+        self._check("Action from an event before the cancel is cancelled when it fires",
+                    stored["status"] == "cancelled"
+                    and (await self.db.leads.find_one({"id": lead_id}))["status"] == "tour_scheduled")
+        fresh, = await scheduler.schedule(self.tenant_id, workflow, [{**action, "status": "converted"}],
+                                          {"lead_id": lead_id}, now=now - timedelta(minutes=40),
+                                          triggered_at=datetime.utcnow())
+        await scheduler._fire(fresh["id"])
+        self._check("Action from an event after the cancel still runs",
+                    (await self.db.leads.find_one({"id": lead_id}))["status"] == "converted")
+
+    async def cleanup(self):
+        await self.db.leads.delete_many({"tenant_id": self.tenant_id})
+        await self.db.scheduled_actions.delete_many({"tenant_id": self.tenant_id})
+        await self.db.scheduled_action_cancellations.delete_many({"tenant_id": self.tenant_id})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = TimerWheelTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Timer Wheel Tests")
+    print("=" * 60)
+    try:
+        tester.test_cascade()
+        tester.test_span()
+        await tester.test_scheduler()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
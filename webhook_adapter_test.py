@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Webhook Adapter Test
+Posts to a local HTTP stub to check HMAC signatures, batching, retries on
+5xx and rate limiting, and that other 4xx replies are not retried
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.channel_adapters import DeliveryError, PermanentDeliveryError, WebhookAdapter
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers by path: /ok 200, /gone 410, /down 503, /flaky 503 then 200, /busy 429 then 200"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        received = self.server.received
+        received.append({"path": self.path, "headers": dict(self.headers), "body": body})
+        attempt = sum(1 for request in received if request["headers"].get("X-Webhook-Id") ==
+                      self.headers.get("X-Webhook-Id"))
+        if attempt == 1 and self.path in ("/flaky", "/busy"):
+            status = 503 if self.path == "/flaky" else 429
+        else:
+            status = {"/gone": 410, "/down": 503}.get(self.path, 200)
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookAdapterTester:
+    def __init__(self, url):
+        self.url = url
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    @staticmethod
+    def _adapter(secret="shared"):
+        adapter = WebhookAdapter(secret)
+        adapter.RETRY_BASE_SECONDS = 0.01
+        return adapter
+
+    @staticmethod
+    def _signed(request, secret):
+        timestamp = request["headers"]["X-Webhook-Timestamp"]
+        digest = hmac.new(secret.encode(), timestamp.encode() + b"." + request["body"], hashlib.sha256).hexdigest()
+        return request["headers"].get("X-Webhook-Signature") == f"sha256={digest}"
+
+    async def test_signatures(self, received):
+        print("\n🔍 Signatures...")
+        adapter = self._adapter()
+        results = await adapter.send([
+            {"id": "m1", "url": f"{self.url}/ok", "payload": {"n": 1}},
+            {"id": "m2", "url": f"{self.url}/ok", "payload": {"n": 2}, "signing_secret": "own"}
+        ])
+        by_id = {request["headers"]["X-Webhook-Id"]: request for request in received}
+        self._check("Both delivered", results == [None, None] and len(received) == 2)
+        self._check("Body is the payload", json.loads(by_id["m1"]["body"]) == {"n": 1})
+        self._check("Signed with the adapter secret", self._signed(by_id["m1"], "shared"))
+        self._check("Message secret overrides the adapter secret", self._signed(by_id["m2"], "own")
+                    and not self._signed(by_id["m2"], "shared"))
+
+        received.clear()
+        await self._adapter(None).send([{"id": "m3", "url": f"{self.url}/ok", "payload": {}}])
+        self._check("Unsigned without a secret", "X-Webhook-Signature" not in received[0]["headers"])
+        results = await adapter.send([{"id": "m4", "url": "not a url", "payload": {}}])
+        self._check("Invalid url fails permanently without a request",
+                    isinstance(results[0], PermanentDeliveryError) and len(received) == 1)
+        await adapter.close()
+
+    async def test_batching(self, received):
+        print("\n🔍 Batching...")
+        adapter = self._adapter()
+        adapter.MAX_BATCH_EVENTS = 2
+        messages = [{"id": f"b{index}", "url": f"{self.url}/ok", "payload": {"n": index}, "batch": True}
+                    for index in range(3)]
+        messages.append({"id": "single", "url": f"{self.url}/ok", "payload": {}})
+        results = await adapter.send(messages)
+        batches = [json.loads(request["body"])["events"] for request in received
+                   if request["headers"]["X-Webhook-Id"] != "single"]
+        self._check("All messages delivered", results == [None] * 4)
+        self._check("Batch messages share requests up to the batch size",
+                    sorted(len(events) for events in batches) == [1, 2] and len(received) == 3)
+        self._check("Events keep their ids and payloads", sorted(
+            (event["id"], event["payload"]["n"]) for events in batches for event in events
+        ) == [("b0", 0), ("b1", 1), ("b2", 2)])
+        self._check("Batch request is signed", all(self._signed(request, "shared") for request in received))
+        self._check("Events counted once delivered", adapter.metrics["events"] == 4)
+        await adapter.close()
+
+    async def test_retries(self, received):
+        print("\n🔍 Retries...")
+        adapter = self._adapter()
+        results = await adapter.send([
+            {"id": "flaky", "url": f"{self.url}/flaky", "payload": {}},
+            {"id": "busy", "url": f"{self.url}/busy", "payload": {}},
+            {"id": "gone", "url": f"{self.url}/gone", "payload": {}},
+            {"id": "down", "url": f"{self.url}/down", "payload": {}}
+        ])
+        attempts = {}
+        for request in received:
+            attempts[request["path"]] = attempts.get(request["path"], 0) + 1
+        self._check("5xx retried until it succeeds", results[0] is None and attempts["/flaky"] == 2)
+        self._check("429 retried after Retry-After", results[1] is None and attempts["/busy"] == 2)
+        self._check("Other 4xx fails permanently without a retry",
+                    isinstance(results[2], PermanentDeliveryError) and attempts["/gone"] == 1)
+        self._check("Lasting 5xx returned as retryable after every attempt",
+                    type(results[3]) is DeliveryError and attempts["/down"] == adapter.ATTEMPTS)
+        self._check("Retries counted", adapter.metrics["retries"] == 2 + adapter.ATTEMPTS - 1)
+        await adapter.close()
+
+
+async def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.received = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    tester = WebhookAdapterTester(f"http://127.0.0.1:{server.server_address[1]}")
+
+    print("🚀 Starting Webhook Adapter Tests")
+    print("=" * 60)
+    try:
+        for test in (tester.test_signatures, tester.test_batching, tester.test_retries):
+            server.received.clear()
+            await test(server.received)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
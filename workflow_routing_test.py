@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Workflow Routing Test
+Runs module and tenant workflows through the CommunicationKernel routing table:
+conditions, role recipients, template lookup by type, status validation and
+version-based invalidation
+"""
+
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).parent / "backend"))
+from kernels.communication_kernel import CommunicationKernel
+from modules.government_module import GovernmentModule
+from modules.hotel_module import HotelModule
+
+
+class WorkflowRoutingTester:
+    def __init__(self, db):
+        self.db = db
+        self.kernel = CommunicationKernel(db)
+        self.tenant_id = f"routing-{uuid.uuid4()}"
+        self.modules = {}
+        self.kernel.router.set_module_source(self._module_workflows)
+        self.tests_run = 0
+        self.tests_passed = 0
+
+    async def _module_workflows(self, tenant_id):
+        return self.modules[tenant_id].get_active_workflows()
+
+    def _use_module(self, module_class):
+        self.modules[self.tenant_id] = module_class({"id": self.tenant_id, "name": "Routing test", "settings": {},
+                                                       "industry_module": module_class.__name__.replace("Module", "").lower()})
+        self.kernel.router.invalidate(self.tenant_id)
+
+    def _check(self, name, condition):
+        self.tests_run += 1
+        if condition:
+            self.tests_passed += 1
+            print(f"✅ {name}")
+        else:
+            print(f"❌ {name}")
+        return condition
+
+    async def _new_lead(self):
+        lead_id = str(uuid.uuid4())
+        await self.db.leads.insert_one({"id": lead_id, "tenant_id": self.tenant_id, "status": "new_inquiry"})
+        return lead_id
+
+    async def _messages(self):
+        return await self.db.message_queue.find({"tenant_id": self.tenant_id}, {"_id": 0}).to_list(None)
+
+    async def test_conditions_and_resolution(self):
+        print("\n🔍 Government module on lead_created...")
+        self._use_module(GovernmentModule)
+        context = {"user_email": "requester@example.com", "first_name": "Ada"}
+
+        lead_id = await self._new_lead()
+        await self.kernel.trigger_event(self.tenant_id, "lead_created", {**context, "lead_id": lead_id,
+                                                                          "event_type": "meeting"})
+        self._check("Workflow skipped when its condition does not match", await self._messages() == [])
+
+        # Without an insurance_requirements template the send action cannot run, leaving nothing to route
+        routed = await self.kernel.router.route(self.tenant_id, "lead_created", {"event_type": "private_event"})
+        self._check("Unresolvable template drops the action", routed == [])
+
+        await self.kernel.create_message_template(self.tenant_id, {
+            "name": "Insurance", "template_type": "insurance_requirements", "channel": "email",
+            "subject": "Insurance for {first_name}", "body": "Please send your certificate."
+        })
+        await self.kernel.trigger_event(self.tenant_id, "lead_created", {**context, "lead_id": lead_id,
+                                                                          "event_type": "private_event"})
+        messages = await self._messages()
+        self._check("Template found by type after it is created", len(messages) == 1)
+        self._check("Requester role resolves to the event's address",
+                    bool(messages) and messages[0]["recipient"] == "requester@example.com")
+        self._check("Template rendered with the event context",
+                    bool(messages) and messages[0]["subject"] == "Insurance for Ada")
+        lead = await self.db.leads.find_one({"id": lead_id})
+        self._check("Status outside LeadStatus is not written", lead["status"] == "new_inquiry")
+
+        # booking_created: unknown template, facility_manager recipient and a status bookings do not have
+        routed = await self.kernel.router.route(self.tenant_id, "booking_created", {})
+        self._check("Workflow with no resolvable actions is not routed", routed == [])
+
+    async def test_operators(self):
+        print("\n🔍 Condition operators...")
+        self._use_module(HotelModule)
+        await self.kernel.create_message_template(self.tenant_id, {
+            "name": "VIP", "template_type": "vip_welcome", "channel": "email", "subject": "Welcome", "body": "Hi"
+        })
+        route = self.kernel.router.route
+        self._check("Greater-than matches", len(await route(self.tenant_id, "high_value_booking",
+                                                           {"booking_value": 6000})) == 1)
+        self._check("Greater-than rejects", await route(self.tenant_id, "high_value_booking",
+                                                       {"booking_value": 4000}) == [])
+        self._check("Missing field does not match", await route(self.tenant_id, "high_value_booking", {}) == [])
+        self._check("Incomparable value does not match", await route(self.tenant_id, "high_value_booking",
+                                                                    {"booking_value": "lots"}) == [])
+        vip = (await route(self.tenant_id, "high_value_booking", {"booking_value": 6000}))[0]
+        self._check("Only the resolvable action is kept",
+                    [action["template_id"] for action in vip["actions"]] ==
+                    [(await self.db.message_templates.find_one({"tenant_id": self.tenant_id,
+                                                                "template_type": "vip_welcome"}))["id"]])
+
+    async def test_tenant_workflows(self):
+        print("\n🔍 Tenant workflows...")
+        self._use_module(GovernmentModule)
+        lead_id = await self._new_lead()
+        await self.kernel.create_workflow(self.tenant_id, {
+            "name": "convert_on_tour", "trigger_event": "tour_completed",
+            "actions": [
+                {"type": "update_status", "entity_type": "lead", "status": "converted"},
+                {"type": "update_status", "entity_type": "lead", "status": "awaiting_documentation"}
+            ]
+        })
+        workflows = await self.kernel.router.route(self.tenant_id, "tour_completed", {})
+        self._check("Invalid status action dropped from tenant workflow",
+                    len(workflows) == 1 and len(workflows[0]["actions"]) == 1)
+        await self.kernel.trigger_event(self.tenant_id, "tour_completed", {"lead_id": lead_id})
+        self._check("Valid status written", (await self.db.leads.find_one({"id": lead_id}))["status"] == "converted")
+
+        # A tenant workflow with a module workflow's name replaces it; an inactive one switches it off
+        await self.kernel.create_workflow(self.tenant_id, {
+            "name": "insurance_verification", "trigger_event": "lead_created", "is_active": False, "actions": []
+        })
+        self._check("Inactive tenant workflow disables the module one", await self.kernel.router.route(
+            self.tenant_id, "lead_created", {"event_type": "private_event"}) == [])
+
+    async def cleanup(self):
+        for collection in ("leads", "message_queue", "message_templates", "workflows", "automation_logs",
+                           "message_lanes", "communication_rollups", "scheduled_actions"):
+            await self.db[collection].delete_many({"tenant_id": self.tenant_id})
+        await self.db.workflow_versions.delete_one({"_id": self.tenant_id})
+
+
+async def main():
+    mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+
+    tester = WorkflowRoutingTester(db)
+    await tester.kernel.initialize()
+
+    print("🚀 Starting Workflow Routing Tests")
+    print("=" * 60)
+    try:
+        await tester.test_conditions_and_resolution()
+        await tester.test_operators()
+        await tester.test_tenant_workflows()
+    finally:
+        await tester.cleanup()
+        client.close()
+
+    print(f"\n📊 Tests passed: {tester.tests_passed}/{tester.tests_run}")
+    return 0 if tester.tests_passed == tester.tests_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))